@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+AI_CACHE_ENABLED = os.environ.get('AI_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+AI_CACHE_PATH = os.environ.get('AI_CACHE_PATH') or os.path.join(tempfile.gettempdir(), 'optai-ai-cache.sqlite3')
+AI_CACHE_TTL = int(os.environ.get('AI_CACHE_TTL', 7 * 24 * 3600))
+AI_CACHE_MAX_BYTES = int(os.environ.get('AI_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+EVICT_EVERY = 50  # Stores between two eviction passes (per process)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ai_response (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_ai_response_last_used_at ON ai_response (last_used_at);
+CREATE TABLE IF NOT EXISTS ai_cache_counter (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+COUNTERS = ('hits', 'misses', 'bypasses', 'stores', 'evictions')
+
+def make_key(model, system_prompt, user_prompt, lang_code=None, max_tokens=None, json_mode=False):
+    """Content address of a chat completion request: any byte of difference gives a new key."""
+    payload = json.dumps([model, system_prompt, user_prompt, lang_code, max_tokens, json_mode], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class AICache:
+    """
+    SQLite cache of DeepSeek responses, shared by the worker processes of a host.
+
+    Entries expire after `ttl` seconds; once the stored responses exceed `max_bytes`, the least
+    recently used ones are evicted. Hit/miss/bypass counters are kept in the same file so they
+    add up across processes. Cache errors are logged and treated as misses: the AI call goes on.
+    """
+
+    def __init__(self, path=AI_CACHE_PATH, ttl=AI_CACHE_TTL, max_bytes=AI_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._stores = 0
+        self._stores_lock = threading.Lock()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self):
+        """One connection per thread (and per process: sqlite connections must not cross a fork)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, conn, name):
+        conn.execute("INSERT INTO ai_cache_counter (name, value) VALUES (?, 1) "
+                     "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,))
+
+    def get(self, key):
+        """Return the cached response text, or None."""
+        try:
+            conn = self._connection()
+            row = conn.execute("SELECT response, created_at FROM ai_response WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    conn.execute("DELETE FROM ai_response WHERE key = ?", (key,))
+                self._count(conn, 'misses')
+                return None
+            conn.execute("UPDATE ai_response SET last_used_at = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self._count(conn, 'hits')
+            return row[0]
+        except sqlite3.Error as e:
+            logger.warning(f"AI cache lookup failed: {str(e)}")
+            return None
+
+    def set(self, key, model, response):
+        try:
+            conn = self._connection()
+            now = time.time()
+            conn.execute("INSERT OR REPLACE INTO ai_response (key, model, response, size, created_at, last_used_at, hits) "
+                         "VALUES (?, ?, ?, ?, ?, ?, 0)", (key, model, response, len(response.encode('utf-8')), now, now))
+            self._count(conn, 'stores')
+        except sqlite3.Error as e:
+            logger.warning(f"AI cache store failed: {str(e)}")
+            return
+        with self._stores_lock:
+            self._stores += 1
+            evict_now = self._stores % EVICT_EVERY == 1
+        if evict_now:
+            self.evict()
+
+    def record_bypass(self):
+        try:
+            self._count(self._connection(), 'bypasses')
+        except sqlite3.Error as e:
+            logger.warning(f"AI cache counter update failed: {str(e)}")
+
+    def evict(self):
+        """Delete expired entries, then least recently used ones until the cache fits in max_bytes."""
+        try:
+            conn = self._connection()
+            evicted = conn.execute("DELETE FROM ai_response WHERE created_at < ?", (time.time() - self.ttl,)).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM ai_response").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                cutoff = conn.execute(
+                    "SELECT last_used_at FROM (SELECT last_used_at, SUM(size) OVER (ORDER BY last_used_at) AS running "
+                    "FROM ai_response) WHERE running >= ? ORDER BY last_used_at LIMIT 1", (excess,)).fetchone()
+                if cutoff:
+                    evicted += conn.execute("DELETE FROM ai_response WHERE last_used_at <= ?", (cutoff[0],)).rowcount
+            if evicted:
+                conn.execute("INSERT INTO ai_cache_counter (name, value) VALUES ('evictions', ?) "
+                             "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (evicted,))
+                logger.info(f"AI cache: evicted {evicted} responses.")
+        except sqlite3.Error as e:
+            logger.warning(f"AI cache eviction failed: {str(e)}")
+
+    def stats(self):
+        """Counters plus current entry count and size."""
+        try:
+            conn = self._connection()
+            stats = {name: 0 for name in COUNTERS}
+            stats.update(dict(conn.execute("SELECT name, value FROM ai_cache_counter").fetchall()))
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ai_response").fetchone()
+            stats['entries'] = entries
+            stats['bytes'] = size
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else None
+            return stats
+        except sqlite3.Error as e:
+            logger.warning(f"AI cache stats failed: {str(e)}")
+            return None
+
+_ai_cache = None
+_ai_cache_lock = threading.Lock()
+
+def get_ai_cache():
+    """Return the process-wide AICache, or None if it is disabled or cannot be opened."""
+    global _ai_cache
+    if not AI_CACHE_ENABLED:
+        return None
+    with _ai_cache_lock:
+        if _ai_cache is None:
+            try:
+                _ai_cache = AICache()
+            except sqlite3.Error as e:
+                logger.error(f"AI cache disabled: cannot open {AI_CACHE_PATH}: {str(e)}")
+                return None
+        return _ai_cache
@@ -1,58 +1,267 @@
 import os
 import json
 import logging
-from openai import OpenAI
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from ai_cache import get_ai_cache, make_key
 
 # Migration to DeepSeek AI - using deepseek-chat model
 # DeepSeek provides cost-effective AI with good performance
 
 logger = logging.getLogger(__name__)
 
-# Initialize DeepSeek client (compatible with OpenAI API)
+# DeepSeek client (compatible with OpenAI API), created on first use: the openai package takes
+# about half a second to import, which every worker would otherwise pay at boot
 DEEPSEEK_API_KEY = os.environ.get("DEEPSEEK_API_KEY")
-openai = None
-try:
-    if DEEPSEEK_API_KEY:
-        openai = OpenAI(
-            api_key=DEEPSEEK_API_KEY,
-            base_url="https://api.deepseek.com"
-        )
-        logger.info("DeepSeek client initialized successfully")
-    else:
-        logger.warning("DEEPSEEK_API_KEY not set. AI features will be disabled.")
-except Exception as e:
-    logger.error(f"Error initializing DeepSeek client: {str(e)}", exc_info=True)
+if not DEEPSEEK_API_KEY:
+    logger.warning("DEEPSEEK_API_KEY not set. AI features will be disabled.")
+_client = None
+_client_failed = False
+_client_lock = threading.Lock()
+
+def get_ai_client():
+    """The DeepSeek client, or None without DEEPSEEK_API_KEY (or if it cannot be created)."""
+    global _client, _client_failed
+    if _client is None and DEEPSEEK_API_KEY and not _client_failed:
+        with _client_lock:
+            if _client is None and not _client_failed:
+                try:
+                    from openai import OpenAI
+                    _client = OpenAI(
+                        api_key=DEEPSEEK_API_KEY,
+                        base_url="https://api.deepseek.com"
+                    )
+                    logger.info("DeepSeek client initialized successfully")
+                except Exception as e:
+                    _client_failed = True
+                    logger.error(f"Error initializing DeepSeek client: {str(e)}", exc_info=True)
+    return _client
+
+DEEPSEEK_MODEL = "deepseek-chat"
+# Bump whenever the get_seo_recommendations prompt changes: stored recommendations of older versions are regenerated
+RECOMMENDATIONS_PROMPT_VERSION = 1
+
+class AIUsage:
+    """DeepSeek calls and tokens metered by metered_ai_usage() (cache hits cost nothing and are not counted)."""
+
+    def __init__(self):
+        self.calls = 0
+        self.tokens = 0
 
-def get_seo_recommendations(url, analysis_type, analysis_details, lang_code='en'):
+    def add(self, calls, tokens):
+        self.calls += calls
+        self.tokens += tokens
+
+_current_usage = ContextVar('ai_usage', default=None)
+
+@contextmanager
+def metered_ai_usage():
     """
-    Get AI-powered SEO recommendations based on analysis results
+    Meter the DeepSeek calls made inside the block (in this thread or greenlet): yields an AIUsage,
+    which the caller charges to a user (usage.record_ai_usage).
     """
-    if not openai:
-        logger.warning("DeepSeek client not initialized. Returning fallback recommendations.")
-        # ... (code de fallback inchangé)
+    previous = _current_usage.get()
+    usage = AIUsage()
+    _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        # set() rather than reset(token): the block may span the yields of a streamed response
+        _current_usage.set(previous)
+
+def current_ai_usage():
+    """AIUsage of the enclosing metered_ai_usage() block, or None."""
+    return _current_usage.get()
+
+def _meter(response_usage):
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.add(1, getattr(response_usage, 'total_tokens', None) or 0)
+
+def _chat_completion(system_prompt, user_prompt, max_tokens, lang_code=None, json_mode=False, use_cache=True):
+    """
+    Single DeepSeek chat completion, memoized in the AI response cache.
+
+    Identical (model, system prompt, user prompt, lang, max_tokens, json_mode) requests are answered
+    from the cache. use_cache=False skips the lookup but still stores the fresh response.
+    In json_mode the response is only cached once it parses as JSON.
+
+    Returns:
+    - The response text
+    """
+    cache = get_ai_cache()
+    key = make_key(DEEPSEEK_MODEL, system_prompt, user_prompt, lang_code, max_tokens, json_mode)
+    if cache:
+        if use_cache:
+            cached = cache.get(key)
+            if cached is not None:
+                logger.info(f"AI cache hit ({key[:12]})")
+                return cached
+        else:
+            cache.record_bypass()
+
+    options = {'response_format': {"type": "json_object"}} if json_mode else {}
+    response = get_ai_client().chat.completions.create(
+        model=DEEPSEEK_MODEL,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        max_tokens=max_tokens,
+        **options
+    )
+    _meter(getattr(response, 'usage', None))
+    content = response.choices[0].message.content
+    if json_mode:
+        json.loads(content)  # Never cache a response the caller cannot use
+    if cache:
+        cache.set(key, DEEPSEEK_MODEL, content)
+    return content
+
+def _chat_completion_stream(system_prompt, user_prompt, max_tokens, lang_code=None, json_mode=False, use_cache=True):
+    """
+    Streaming variant of _chat_completion: generator of the response text deltas, as DeepSeek produces them.
+
+    A cached response is yielded whole, in one delta. The complete response is stored in the AI response
+    cache once the stream ends (in json_mode, only if it parses as JSON, otherwise ValueError is raised
+    after the last delta). A stream closed before its end is not cached.
+    """
+    cache = get_ai_cache()
+    key = make_key(DEEPSEEK_MODEL, system_prompt, user_prompt, lang_code, max_tokens, json_mode)
+    if cache:
+        if use_cache:
+            cached = cache.get(key)
+            if cached is not None:
+                logger.info(f"AI cache hit ({key[:12]})")
+                yield cached
+                return
+        else:
+            cache.record_bypass()
+
+    options = {'response_format': {"type": "json_object"}} if json_mode else {}
+    stream = get_ai_client().chat.completions.create(
+        model=DEEPSEEK_MODEL,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        max_tokens=max_tokens,
+        stream=True,
+        stream_options={"include_usage": True},  # Token counts come in a last chunk without choices
+        **options
+    )
+    chunks = []
+    response_usage = None
+    try:
+        for chunk in stream:
+            if getattr(chunk, 'usage', None):
+                response_usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                chunks.append(delta)
+                yield delta
+    finally:
+        stream.close()  # Releases the HTTP connection if the consumer stopped early
+        _meter(response_usage)
+    content = ''.join(chunks)
+    if json_mode:
+        json.loads(content)
+    if cache:
+        cache.set(key, DEEPSEEK_MODEL, content)
+
+def ai_client_configured():
+    return get_ai_client() is not None
+
+class AIRecommendationError(Exception):
+    """Raised by get_seo_recommendations(raise_errors=True) instead of returning a fallback."""
+    pass
+
+def fallback_recommendations(lang_code='en', api_key_missing=False):
+    """Placeholder recommendations shown when the AI cannot answer (never persisted)."""
+    if api_key_missing:
         if lang_code == 'fr':
             return {
                 "summary": "Les recommandations propulsées par l'IA nécessitent une clé API DeepSeek.",
                 "priorities": ["Corriger les erreurs techniques", "Améliorer les balises méta", "Améliorer le contenu"],
                 "recommendations": [{"title": "Clé API requise", "description": "...", "steps": ["..."]}]
             }
-        else:
-            return {
-                "summary": "AI-powered recommendations require a DeepSeek API key.",
-                "priorities": ["Fix technical errors", "Improve meta tags", "Enhance content"],
-                "recommendations": [{"title": "API Key Required", "description": "...", "steps": ["..."]}]
-            }
+        return {
+            "summary": "AI-powered recommendations require a DeepSeek API key.",
+            "priorities": ["Fix technical errors", "Improve meta tags", "Enhance content"],
+            "recommendations": [{"title": "API Key Required", "description": "...", "steps": ["..."]}]
+        }
+    if lang_code == 'fr':
+        return {"summary": "Impossible de générer des recommandations IA pour le moment.", "recommendations": [{"title": "Erreur Système", "description": "..."}]}
+    return {"summary": "Unable to generate AI recommendations at this time.", "recommendations": [{"title": "System Error", "description": "..."}]}
+
+def get_seo_recommendations(url, analysis_type, analysis_details, lang_code='en', use_cache=True, raise_errors=False):
+    """
+    Get AI-powered SEO recommendations based on analysis results
+
+    use_cache=False forces a new DeepSeek call (the AI response cache is refreshed with it).
+    raise_errors=True raises AIRecommendationError instead of returning fallback recommendations,
+    for callers that store the result.
+    """
+    if not ai_client_configured():
+        logger.warning("DeepSeek client not initialized. Returning fallback recommendations.")
+        if raise_errors:
+            raise AIRecommendationError("DeepSeek client not initialized (DEEPSEEK_API_KEY missing).")
+        return fallback_recommendations(lang_code, api_key_missing=True)
 
     try:
         logger.debug(f"get_seo_recommendations called for URL: {url}, Type: {analysis_type}")
-        # Utiliser json.dumps pour logger les dictionnaires de manière lisible
-        logger.debug(f"Raw analysis_details: {json.dumps(analysis_details, indent=2, ensure_ascii=False)}")
-        
-        analysis_text = format_analysis_for_ai(url, analysis_type, analysis_details)
-        logger.debug(f"Formatted analysis_text for AI: \n{analysis_text}")
+        system_prompt, prompt = _recommendations_prompts(url, analysis_type, analysis_details, lang_code)
+        logger.info(f"Sending request to DeepSeek API for URL: {url}")
+        ai_response_content = _chat_completion(
+            system_prompt,
+            prompt,
+            max_tokens=1500, # Augmenté pour des recommandations plus complètes
+            lang_code=lang_code,
+            json_mode=True,
+            use_cache=use_cache
+        )
+        logger.debug(f"Raw AI response content for {url}: {ai_response_content}")
+        result = json.loads(ai_response_content)
+        logger.info(f"Successfully received and parsed AI recommendations for URL: {url}")
+        return result
         
-        language_instruction = "in French" if lang_code == 'fr' else "in English"
-        prompt = f"""
+    except Exception as e:
+        logger.error(f"Error getting AI recommendations for URL {url}: {str(e)}", exc_info=True)
+        if raise_errors:
+            raise AIRecommendationError(str(e)) from e
+        return fallback_recommendations(lang_code)
+
+def stream_seo_recommendations(url, analysis_type, analysis_details, lang_code='en', use_cache=True):
+    """
+    Streaming variant of get_seo_recommendations: generator of the raw JSON text deltas.
+
+    Same prompt and same AI cache entry as get_seo_recommendations. Any failure, including a
+    response that does not parse once complete, raises AIRecommendationError.
+    """
+    if not ai_client_configured():
+        raise AIRecommendationError("DeepSeek client not initialized (DEEPSEEK_API_KEY missing).")
+    try:
+        system_prompt, prompt = _recommendations_prompts(url, analysis_type, analysis_details, lang_code)
+        logger.info(f"Streaming request to DeepSeek API for URL: {url}")
+        yield from _chat_completion_stream(system_prompt, prompt, max_tokens=1500, lang_code=lang_code,
+                                           json_mode=True, use_cache=use_cache)
+    except Exception as e:
+        logger.error(f"Error streaming AI recommendations for URL {url}: {str(e)}", exc_info=True)
+        raise AIRecommendationError(str(e)) from e
+
+def _recommendations_prompts(url, analysis_type, analysis_details, lang_code):
+    """System and user prompts of the recommendations request."""
+    # Utiliser json.dumps pour logger les dictionnaires de manière lisible
+    logger.debug(f"Raw analysis_details: {json.dumps(analysis_details, indent=2, ensure_ascii=False)}")
+    
+    analysis_text = format_analysis_for_ai(url, analysis_type, analysis_details)
+    logger.debug(f"Formatted analysis_text for AI: \n{analysis_text}")
+    
+    language_instruction = "in French" if lang_code == 'fr' else "in English"
+    prompt = f"""
         You are an expert SEO consultant analyzing the following website: {url}
         Here is the SEO analysis data:
         {analysis_text}
@@ -67,62 +276,40 @@ def get_seo_recommendations(url, analysis_type, analysis_details, lang_code='en'
         - recommendations: Array of objects with 'title', 'description', and 'steps' (array of specific steps)
         - insights: Additional expert insights
         """
-        
-        logger.info(f"Sending request to DeepSeek API for URL: {url}")
-        response = openai.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": f"You are an expert SEO analyst providing clear, actionable advice {language_instruction}."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"},
-            max_tokens=1500 # Augmenté pour des recommandations plus complètes
-        )
-        
-        ai_response_content = response.choices[0].message.content
-        logger.debug(f"Raw AI response content for {url}: {ai_response_content}")
-        result = json.loads(ai_response_content)
-        logger.info(f"Successfully received and parsed AI recommendations for URL: {url}")
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error getting AI recommendations for URL {url}: {str(e)}", exc_info=True)
-        # ... (code de fallback en cas d'erreur inchangé)
-        if lang_code == 'fr':
-            return {"summary": "Impossible de générer des recommandations IA pour le moment.", "recommendations": [{"title": "Erreur Système", "description": "..."}]}
-        else:
-            return {"summary": "Unable to generate AI recommendations at this time.", "recommendations": [{"title": "System Error", "description": "..."}]}
+    return f"You are an expert SEO analyst providing clear, actionable advice {language_instruction}.", prompt
+
+
+CHAT_SYSTEM_PROMPT = ("You are Opty-bot, the SEO assistant of Opt-AI. Answer questions about SEO and about the "
+                      "user's website analyses concisely, with concrete and actionable advice. "
+                      "Answer in the language of the user's message.")
 
+def _chat_user_prompt(user_query, context):
+    return f"Analysis context: {context}\n\nQuestion: {user_query}" if context else user_query
 
-def get_chat_response(user_query, context=None):
-    if not openai:
-        # ... (inchangé)
+def get_chat_response(user_query, context=None, lang_code=None, use_cache=True):
+    if not ai_client_configured():
         return "I'm sorry, but I need a DeepSeek API key..."
     try:
-        # ... (inchangé)
-        response = openai.chat.completions.create(
-            model="deepseek-chat",
-            # ... (messages inchangés)
-        )
-        return response.choices[0].message.content
+        return _chat_completion(CHAT_SYSTEM_PROMPT, _chat_user_prompt(user_query, context), max_tokens=800,
+                                lang_code=lang_code, use_cache=use_cache)
     except Exception as e:
         logger.error(f"Error getting chat response: {str(e)}", exc_info=True)
         return "I'm sorry, I'm having trouble..."
 
-def analyze_content_semantics(text, keywords=None):
-    if not openai:
-        # ... (inchangé)
-        return {"relevance_score": 50, "depth_assessment": "AI-powered semantic analysis requires a DeepSeek API key."}
+def stream_chat_response(user_query, context=None, lang_code=None, use_cache=True):
+    """
+    Streaming variant of get_chat_response: generator of the reply text deltas.
+    Errors end the stream with the same apology get_chat_response returns.
+    """
+    if not ai_client_configured():
+        yield "I'm sorry, but I need a DeepSeek API key..."
+        return
     try:
-        # ... (inchangé)
-        response = openai.chat.completions.create(
-            model="deepseek-chat",
-            # ... (messages inchangés)
-        )
-        return json.loads(response.choices[0].message.content)
+        yield from _chat_completion_stream(CHAT_SYSTEM_PROMPT, _chat_user_prompt(user_query, context), max_tokens=800,
+                                           lang_code=lang_code, use_cache=use_cache)
     except Exception as e:
-        logger.error(f"Error analyzing content semantics: {str(e)}", exc_info=True)
-        return {"relevance_score": 50, "depth_assessment": "Unable to analyze content depth..."}
+        logger.error(f"Error streaming chat response: {str(e)}", exc_info=True)
+        yield "I'm sorry, I'm having trouble..."
 
 def format_analysis_for_ai(url, analysis_type, analysis_details):
     sections = []
@@ -0,0 +1,83 @@
+import json
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Détails d'une analyse (un relevé par composant noté) stockés en un seul blob dans analysis.details_data, au lieu
+# d'une ligne analysis_detail chacun : un octet de version du format, puis la liste JSON compressée par zlib.
+# Enregistrer une analyse n'insère plus de lignes de détails, et le rapport les lit avec la ligne de l'analyse.
+# Ce module n'importe pas l'application : la migration 0003 l'utilise pour convertir les anciennes lignes.
+DETAILS_FORMAT_VERSION = 1
+DETAILS_COMPRESSION_LEVEL = 6
+TEXT_FIELDS = ('category', 'component', 'status', 'score', 'description', 'recommendation')
+
+class Finding:
+    """
+    One detail of an analysis. It has the attributes of the former AnalysisDetail rows, which the report
+    template (detail|finding("description")), the API and the AI prompts read.
+    """
+
+    __slots__ = ('category', 'component', 'status', 'score', 'description', 'recommendation', 'message_code', 'params')
+
+    def __init__(self, category, component, status='info', score=0, description='', recommendation='',
+                 message_code=None, params=None):
+        self.category = category
+        self.component = component
+        self.status = status
+        self.score = score
+        self.description = description
+        self.recommendation = recommendation
+        self.message_code = message_code  # Key of the texts in the 'findings' translation catalogs
+        self.params = params or {}  # Values of the {placeholders} of those texts
+
+    def __repr__(self):
+        return f"<Finding {self.category}.{self.component} {self.status} {self.score}>"
+
+    def to_dict(self):
+        entry = {field: getattr(self, field) for field in TEXT_FIELDS}
+        if self.message_code:
+            entry['code'] = self.message_code
+        if self.params:
+            entry['params'] = self.params
+        return entry
+
+    @classmethod
+    def from_dict(cls, entry):
+        return cls(entry['category'], entry['component'], entry.get('status', 'info'), entry.get('score', 0),
+                   entry.get('description'), entry.get('recommendation'), entry.get('code'), entry.get('params'))
+
+def encode_details(findings):
+    """Blob of a list of Findings (format DETAILS_FORMAT_VERSION)."""
+    payload = json.dumps([finding.to_dict() for finding in findings], ensure_ascii=False, separators=(',', ':'))
+    return bytes([DETAILS_FORMAT_VERSION]) + zlib.compress(payload.encode('utf-8'), DETAILS_COMPRESSION_LEVEL)
+
+def decode_details(data):
+    """
+    Findings of a blob written by encode_details (an empty list for None).
+
+    Raises ValueError if the blob has an unknown format version.
+    """
+    if not data:
+        return []
+    version = data[0]
+    if version != DETAILS_FORMAT_VERSION:
+        raise ValueError(f"Unknown analysis details format version {version}")
+    return [Finding.from_dict(entry) for entry in json.loads(zlib.decompress(data[1:]))]
+
+def findings_from_results(seo_results):
+    """Findings of seo_analyzer results ({'details': {category: {component: finding}}}), malformed entries skipped."""
+    findings = []
+    for category, items in seo_results.get('details', {}).items():
+        if not isinstance(items, dict):  # S'assurer que items est un dictionnaire
+            logger.warning(f"Skipping malformed items for category {category}: {items}")
+            continue
+        for component, item_details in items.items():
+            if not isinstance(item_details, dict):  # S'assurer que item_details est un dictionnaire
+                logger.warning(f"Skipping malformed item_details for component {component} in category {category}: {item_details}")
+                continue
+            # Code + paramètres : le rapport est rendu dans la langue du lecteur (translation.render_finding)
+            findings.append(Finding(category, component, item_details.get('status', 'info'), item_details.get('score', 0),
+                                    item_details.get('description', ''), item_details.get('recommendation', ''),
+                                    item_details.get('code'), item_details.get('params')))
+    return findings
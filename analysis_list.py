@@ -0,0 +1,151 @@
+import json
+import base64
+import binascii
+from datetime import datetime, time as dt_time
+from sqlalchemy import select, and_, or_
+from app import db
+from models import Analysis
+
+# Liste paginée des analyses d'un utilisateur (/api/analyses) : pagination par curseur sur (created_at, id),
+# servie par l'index ix_analysis_user_created, et seules les colonnes demandées sont lues.
+ANALYSES_PAGE_SIZE = 50
+ANALYSES_MAX_PAGE_SIZE = 500
+
+# Fields of ?fields=, and the score fields that default to 0 when not computed yet
+LIST_FIELDS = {
+    'id': Analysis.id,
+    'url': Analysis.url,
+    'analysis_type': Analysis.analysis_type,
+    'created_at': Analysis.created_at,
+    'meta_score': Analysis.meta_score,
+    'content_score': Analysis.content_score,
+    'technical_score': Analysis.technical_score,
+    'overall_score': Analysis.overall_score,
+}
+SCORE_FIELDS = {'meta_score', 'content_score', 'technical_score', 'overall_score'}
+
+class AnalysisQueryError(ValueError):
+    """Invalid /api/analyses query parameter (unknown field, bad cursor, bad date...)."""
+    pass
+
+def encode_cursor(created_at, analysis_id):
+    """Opaque cursor of the position after a row."""
+    raw = json.dumps([created_at.isoformat(), analysis_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, analysis_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(analysis_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise AnalysisQueryError('Invalid cursor.')
+
+def _parse_int(args, name, minimum=None, maximum=None):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        raise AnalysisQueryError(f"{name} must be an integer.")
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        raise AnalysisQueryError(f"{name} must be between {minimum} and {maximum}.")
+    return value
+
+def _parse_date(args, name, end_of_day=False):
+    """ISO date or datetime; a bare date given as an upper bound includes that whole day."""
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise AnalysisQueryError(f"{name} must be an ISO date (YYYY-MM-DD) or datetime.")
+    if end_of_day and len(value) == 10:
+        parsed = datetime.combine(parsed.date(), dt_time.max)
+    return parsed.replace(tzinfo=None)
+
+def parse_analysis_query(args):
+    """
+    Options of a /api/analyses request.
+
+    Parameters:
+    - args: Query string (request.args): limit, cursor, fields (comma-separated), url_prefix,
+      type (comma-separated analysis types), created_from, created_to, min_score, max_score
+
+    Returns:
+    - dict of the parsed options
+
+    Raises AnalysisQueryError.
+    """
+    fields = [field.strip() for field in args.get('fields', '').split(',') if field.strip()] or list(LIST_FIELDS)
+    unknown = [field for field in fields if field not in LIST_FIELDS]
+    if unknown:
+        raise AnalysisQueryError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(LIST_FIELDS)}.")
+    cursor = args.get('cursor')
+    limit = _parse_int(args, 'limit', 1, ANALYSES_MAX_PAGE_SIZE)
+    return {
+        'fields': list(dict.fromkeys(fields)),
+        'limit': limit or ANALYSES_PAGE_SIZE,
+        'after': decode_cursor(cursor) if cursor else None,
+        'url_prefix': args.get('url_prefix') or None,
+        'types': [t.strip() for t in args.get('type', '').split(',') if t.strip()],
+        'created_from': _parse_date(args, 'created_from'),
+        'created_to': _parse_date(args, 'created_to', end_of_day=True),
+        'min_score': _parse_int(args, 'min_score', 0, 100),
+        'max_score': _parse_int(args, 'max_score', 0, 100),
+    }
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def list_analyses(user_id, options):
+    """
+    One page of a user's analyses, newest first.
+
+    Returns:
+    - {'analyses': [{field: value}], 'next_cursor': cursor of the next page or None}
+    """
+    conditions = [Analysis.user_id == user_id]
+    if options['url_prefix']:
+        conditions.append(Analysis.url.like(_escape_like(options['url_prefix']) + '%', escape='\\'))
+    if options['types']:
+        conditions.append(Analysis.analysis_type.in_(options['types']))
+    if options['created_from']:
+        conditions.append(Analysis.created_at >= options['created_from'])
+    if options['created_to']:
+        conditions.append(Analysis.created_at <= options['created_to'])
+    if options['min_score'] is not None:
+        conditions.append(Analysis.overall_score >= options['min_score'])
+    if options['max_score'] is not None:
+        conditions.append(Analysis.overall_score <= options['max_score'])
+    if options['after']:
+        created_at, analysis_id = options['after']
+        conditions.append(or_(Analysis.created_at < created_at,
+                              and_(Analysis.created_at == created_at, Analysis.id < analysis_id)))
+
+    # created_at and id are always read: they make the cursor
+    columns = [Analysis.created_at, Analysis.id] + [LIST_FIELDS[field] for field in options['fields']
+                                                    if field not in ('created_at', 'id')]
+    # One extra row tells whether there is a next page
+    rows = db.session.execute(
+        select(*columns).where(*conditions)
+        .order_by(Analysis.created_at.desc(), Analysis.id.desc()).limit(options['limit'] + 1)).all()
+    has_more = len(rows) > options['limit']
+    rows = rows[:options['limit']]
+
+    analyses = []
+    for row in rows:
+        values = row._mapping
+        item = {}
+        for field in options['fields']:
+            value = values[LIST_FIELDS[field]]
+            if field == 'created_at':
+                value = value.isoformat()
+            elif field in SCORE_FIELDS:
+                value = value or 0
+            item[field] = value
+        analyses.append(item)
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+    return {'analyses': analyses, 'next_cursor': next_cursor}
@@ -0,0 +1,117 @@
+import os
+import sys
+import logging
+from datetime import date, timedelta
+from sqlalchemy import select, func, delete, insert, literal_column
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from models import Analysis, AnalysisRollup
+
+logger = logging.getLogger(__name__)
+
+# Statistiques du tableau de bord et du profil calculées en SQL (COUNT / AVG / GROUP BY semaine).
+# Avec ANALYSIS_STATS_ROLLUP=true, elles sont lues dans la table analysis_rollup (une ligne par utilisateur et
+# par semaine, mise à jour à chaque analyse enregistrée) : le coût ne dépend plus de la taille de l'historique.
+# Lancer `python analysis_stats.py rebuild` avant de l'activer sur une base existante.
+ANALYSIS_STATS_ROLLUP = os.environ.get('ANALYSIS_STATS_ROLLUP', 'false').lower() in ('1', 'true', 'yes')
+
+def week_start(moment):
+    """Sunday starting the week of a datetime or date (weeks of strftime('%U'), as shown by the profile chart)."""
+    day = moment.date() if hasattr(moment, 'date') else moment
+    return day - timedelta(days=(day.weekday() + 1) % 7)
+
+def _week_expression():
+    """SQL expression of the Sunday starting the week of Analysis.created_at."""
+    if db.engine.dialect.name == 'postgresql':
+        # date_trunc weeks start on Monday: shift by one day to get Sunday weeks. Literal SQL, so that
+        # the GROUP BY expression is identical to the selected one (bound parameters would differ)
+        return literal_column("date(date_trunc('week', analysis.created_at + interval '1 day') - interval '1 day')")
+    # SQLite: back 6 days, then forward to the next Sunday (the same day if it is one)
+    return func.date(Analysis.created_at, '-6 days', 'weekday 0')
+
+def _upsert(values):
+    """INSERT an analysis_rollup row, or add its counts to the existing one."""
+    dialect = db.engine.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        stmt = (postgresql if dialect == 'postgresql' else sqlite).insert(AnalysisRollup).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AnalysisRollup.user_id, AnalysisRollup.week_start],
+            set_={'analyses': AnalysisRollup.analyses + stmt.excluded.analyses,
+                  'score_sum': AnalysisRollup.score_sum + stmt.excluded.score_sum})
+        db.session.execute(stmt)
+        return
+    rollup = db.session.get(AnalysisRollup, (values['user_id'], values['week_start']), with_for_update=True)
+    if rollup is None:
+        db.session.add(AnalysisRollup(**values))
+    else:
+        rollup.analyses += values['analyses']
+        rollup.score_sum += values['score_sum']
+
+def record_analysis(analysis):
+    """Count a saved analysis in the rollup of its user and week (same transaction: the caller commits)."""
+    if analysis.user_id is None:
+        return
+    _upsert({'user_id': analysis.user_id, 'week_start': week_start(analysis.created_at),
+             'analyses': 1, 'score_sum': analysis.overall_score or 0})
+
+def dashboard_totals(user_id):
+    """(number of analyses, average overall score) of a user. Analyses still pending (no score yet) are not counted."""
+    if ANALYSIS_STATS_ROLLUP:
+        count, total = db.session.execute(
+            select(func.coalesce(func.sum(AnalysisRollup.analyses), 0), func.coalesce(func.sum(AnalysisRollup.score_sum), 0))
+            .where(AnalysisRollup.user_id == user_id)).one()
+        return count, (total / count if count else 0)
+    count, average = db.session.execute(
+        select(func.count(), func.avg(Analysis.overall_score))
+        .where(Analysis.user_id == user_id, Analysis.overall_score.isnot(None))).one()
+    return count, float(average or 0)
+
+def weekly_stats(user_id, start_date):
+    """
+    Analyses per week since start_date (the rollup counts the whole week of start_date).
+
+    Returns:
+    - [(Sunday date, number of analyses, average overall score)], oldest week first
+    """
+    if ANALYSIS_STATS_ROLLUP:
+        rows = db.session.execute(
+            select(AnalysisRollup.week_start, AnalysisRollup.analyses, AnalysisRollup.score_sum)
+            .where(AnalysisRollup.user_id == user_id, AnalysisRollup.week_start >= week_start(start_date))
+            .order_by(AnalysisRollup.week_start)).all()
+        return [(week, count, total / count if count else 0) for week, count, total in rows]
+    week = _week_expression().label('week')
+    rows = db.session.execute(
+        select(week, func.count(), func.avg(Analysis.overall_score))
+        .where(Analysis.user_id == user_id, Analysis.created_at >= start_date, Analysis.overall_score.isnot(None))
+        .group_by(week).order_by(week)).all()
+    return [(week_start(_as_date(week)), count, float(average or 0)) for week, count, average in rows]
+
+def _as_date(value):
+    # SQLite returns date() as an ISO string
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+def rebuild_rollup():
+    """Recompute analysis_rollup from the analysis table. Returns the number of rollup rows."""
+    week = _week_expression().label('week')
+    rows = db.session.execute(
+        select(Analysis.user_id, week, func.count(), func.coalesce(func.sum(func.coalesce(Analysis.overall_score, 0)), 0))
+        .where(Analysis.user_id.isnot(None), Analysis.overall_score.isnot(None))
+        .group_by(Analysis.user_id, week)).all()
+    db.session.execute(delete(AnalysisRollup))
+    if rows:
+        db.session.execute(insert(AnalysisRollup), [
+            {'user_id': user_id, 'week_start': week_start(_as_date(week)), 'analyses': count, 'score_sum': total}
+            for user_id, week, count, total in rows])
+    db.session.commit()
+    logger.info(f"Rebuilt analysis_rollup: {len(rows)} user-weeks")
+    return len(rows)
+
+if __name__ == '__main__':
+    # python analysis_stats.py rebuild : recalcule analysis_rollup depuis l'historique
+    if sys.argv[1:] != ['rebuild']:
+        print("Usage: python analysis_stats.py rebuild")
+        raise SystemExit(2)
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        print(f"{rebuild_rollup()} user-weeks in analysis_rollup")
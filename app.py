@@ -21,66 +21,86 @@ logging.basicConfig(stream=sys.stdout, level=numeric_level,
 logger = logging.getLogger(__name__)
 logger.info(f"Logging level set to {logging.getLevelName(logger.getEffectiveLevel())}")
 
-from env_validator import validate_environment
-if not validate_environment():
-    logger.error("Environment validation failed. Please check your Railway environment variables.")
-
 class Base(DeclarativeBase):
     pass
 
+# Extensions sans application : create_app() les attache. Les modules importent `from app import db`.
 db = SQLAlchemy(model_class=Base)
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+jwt = JWTManager()
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'
 
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"pool_recycle": 300, "pool_pre_ping": True}
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["JWT_SECRET_KEY"] = os.environ.get("SESSION_SECRET")
-app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1)
-app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(days=30)
+# sync | gevent (see gunicorn.conf.py): gevent workers serve many requests at once and need a bigger pool
+SERVER_MODE = os.environ.get("SERVER_MODE", "sync").lower()
 
-db.init_app(app)
-jwt = JWTManager(app)
+@login_manager.user_loader
+def load_user(user_id):
+    from models import User
+    return db.session.get(User, int(user_id))
 
-allowed_origins = [
-    os.environ.get("DOMAIN", "https://opt-ai.up.railway.app"),
-    "http://localhost:5000", "http://127.0.0.1:5000" 
-]
-CORS(app, resources={
-    r"/api/*": {"origins": allowed_origins},
-    r"/payment/*": {"origins": allowed_origins},
-    r"/auth/*": {"origins": allowed_origins}
-}, supports_credentials=True)
+def create_app():
+    """
+    Build the Flask application: configuration, extensions, blueprints and error handlers.
 
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'auth.login'
+    Nothing here touches the database schema: the migrations are a separate step (`python schema.py
+    upgrade`, run once by gunicorn.conf.py before the workers start). Heavy clients (DeepSeek, Stripe)
+    are created on first use.
+    """
+    from env_validator import validate_environment
+    if not validate_environment():
+        logger.error("Environment validation failed. Please check your Railway environment variables.")
 
-with app.app_context():
-    import models
-    db.create_all()
-    import translation
-    translation.init_app(app)
-    
-    from routes import api_bp
-    from auth import auth_bp
-    from chatbot import chatbot_bp # Assurez-vous que chatbot_bp est importé
-    from payment import payment_bp
-    from health import health_bp
-    from main_routes import main as main_bp
-    
-    app.register_blueprint(api_bp, url_prefix='/api')
-    app.register_blueprint(auth_bp, url_prefix='/auth')
-    # CORRECTION : Enregistrer chatbot_bp sous /api pour que la route /chatbot devienne /api/chatbot
-    app.register_blueprint(chatbot_bp, url_prefix='/api') 
-    app.register_blueprint(payment_bp, url_prefix='/payment')
-    app.register_blueprint(health_bp) 
-    app.register_blueprint(main_bp)
-    
-    @login_manager.user_loader
-    def load_user(user_id):
-        return models.User.query.get(int(user_id))
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET")
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
+    engine_options = {"pool_recycle": 300, "pool_pre_ping": True}
+    if not (os.environ.get("DATABASE_URL") or "").startswith("sqlite"):
+        engine_options["pool_size"] = int(os.environ.get("DB_POOL_SIZE", 20 if SERVER_MODE == "gevent" else 5))
+        engine_options["max_overflow"] = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["JWT_SECRET_KEY"] = os.environ.get("SESSION_SECRET")
+    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1)
+    app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(days=30)
+
+    db.init_app(app)
+    jwt.init_app(app)
+
+    allowed_origins = [
+        os.environ.get("DOMAIN", "https://opt-ai.up.railway.app"),
+        "http://localhost:5000", "http://127.0.0.1:5000" 
+    ]
+    CORS(app, resources={
+        r"/api/*": {"origins": allowed_origins},
+        r"/payment/*": {"origins": allowed_origins},
+        r"/auth/*": {"origins": allowed_origins}
+    }, supports_credentials=True)
+
+    login_manager.init_app(app)
+
+    with app.app_context():
+        import models  # noqa: F401
+        import translation
+        translation.init_app(app)
+        import metrics
+        metrics.init_app(app)
+        
+        from routes import api_bp
+        from auth import auth_bp
+        from chatbot import chatbot_bp # Assurez-vous que chatbot_bp est importé
+        from payment import payment_bp
+        from health import health_bp
+        from main_routes import main as main_bp
+        
+        app.register_blueprint(api_bp, url_prefix='/api')
+        app.register_blueprint(auth_bp, url_prefix='/auth')
+        # CORRECTION : Enregistrer chatbot_bp sous /api pour que la route /chatbot devienne /api/chatbot
+        app.register_blueprint(chatbot_bp, url_prefix='/api') 
+        app.register_blueprint(payment_bp, url_prefix='/payment')
+        app.register_blueprint(health_bp) 
+        app.register_blueprint(main_bp)
 
     @app.errorhandler(500)
     def handle_500(e):
@@ -94,3 +114,5 @@ with app.app_context():
     @app.errorhandler(405)
     def handle_405(e):
         return jsonify({"error": "Method not allowed", "message": "The method is not allowed for the requested URL."}), 405
+
+    return app
@@ -0,0 +1,334 @@
+import os
+import csv
+import io
+import time
+import logging
+import threading
+from collections import defaultdict
+from itertools import zip_longest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+from flask import current_app
+from sqlalchemy import insert, func
+from app import db
+from models import Analysis, AnalysisJob, AnalysisBatch, AnalysisBatchItem
+from jobs import JOB_EXECUTOR, JOB_STALE_AFTER, FINISHED_JOB_STATES, run_job
+from page_cache import normalize_url
+from usage import reserve_analyses
+
+logger = logging.getLogger(__name__)
+
+# Bulk analyses (enterprise): one batch = up to BATCH_MAX_URLS jobs run by a batch runner that
+# bounds the total concurrency and spaces out requests to a same host.
+BATCH_MAX_URLS = int(os.environ.get('BATCH_MAX_URLS', 500))
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', 8))  # Analyses in flight per batch
+BATCH_PER_HOST = int(os.environ.get('BATCH_PER_HOST', 2))  # Analyses in flight per host, all batches of the process
+BATCH_HOST_DELAY = float(os.environ.get('BATCH_HOST_DELAY', 1.0))  # Minimum seconds between two fetches started on a host
+BATCH_RUNNERS = int(os.environ.get('BATCH_RUNNERS', 2))  # Thread mode: batches run at once per process (the others wait queued)
+
+_runner_slots = threading.BoundedSemaphore(BATCH_RUNNERS)
+
+class BatchInputError(ValueError):
+    """Invalid batch submission (no URL, too many URLs, bad CSV...)."""
+    pass
+
+class HostLimiter:
+    """
+    Per-host politeness: at most `per_host` analyses of a host at once, and at least `delay`
+    seconds between two analyses started on it. Shared by every batch runner and crawl of the process.
+
+    A host is only tracked while an analysis holds or waits for one of its slots, or while its spacing
+    is running: the hosts are user-supplied, the state must not grow with every host ever analyzed.
+    """
+
+    def __init__(self, per_host=BATCH_PER_HOST, delay=BATCH_HOST_DELAY):
+        self.per_host = per_host
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._users = {}  # host -> analyses holding or waiting for a slot
+        self._next_start = {}
+
+    def acquire(self, host, delay=None):
+        """Wait for a slot on host; delay (e.g. a robots.txt Crawl-delay) may lengthen the spacing."""
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.BoundedSemaphore(self.per_host))
+            self._users[host] = self._users.get(host, 0) + 1
+        semaphore.acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + max(self.delay, delay or 0)
+        if start > now:
+            time.sleep(start - now)
+
+    def release(self, host):
+        with self._lock:
+            self._semaphores[host].release()
+            self._users[host] -= 1
+            if self._users[host]:
+                return
+            del self._users[host]
+            del self._semaphores[host]
+            # Hôtes inactifs dont l'espacement est écoulé : plus rien à retenir
+            now = time.monotonic()
+            for idle_host in [idle_host for idle_host, start in self._next_start.items()
+                              if start <= now and idle_host not in self._users]:
+                del self._next_start[idle_host]
+
+_host_limiter = HostLimiter()
+
+def parse_batch_urls(data=None, csv_file=None):
+    """
+    URLs of a batch submission, in order and without duplicates.
+
+    Parameters:
+    - data: JSON body, {"urls": [...]}
+    - csv_file: Uploaded CSV file; the 'url' column if there is a header, else the first column
+
+    Raises BatchInputError.
+    """
+    if csv_file is not None:
+        try:
+            text = csv_file.read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise BatchInputError('The CSV file must be UTF-8 encoded.')
+        rows = [row for row in csv.reader(io.StringIO(text)) if row and row[0].strip()]
+        column = 0
+        if rows and 'url' in [cell.strip().lower() for cell in rows[0]]:
+            column = [cell.strip().lower() for cell in rows[0]].index('url')
+            rows = rows[1:]
+        raw_urls = [row[column] if column < len(row) else '' for row in rows]
+    else:
+        raw_urls = (data or {}).get('urls')
+        if not isinstance(raw_urls, list):
+            raise BatchInputError("'urls' must be a list of URLs.")
+
+    urls, seen, invalid = [], set(), []
+    for raw_url in raw_urls:
+        url = str(raw_url).strip()
+        if not url:
+            continue
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname or len(url) > 255:
+            invalid.append(url)
+            continue
+        key = normalize_url(url)
+        if key not in seen:
+            seen.add(key)
+            urls.append(url)
+    if invalid:
+        raise BatchInputError(f"Invalid URLs (http/https, 255 characters max): {', '.join(invalid[:5])}"
+                              + (f" and {len(invalid) - 5} more" if len(invalid) > 5 else ''))
+    if not urls:
+        raise BatchInputError('No URL to analyze.')
+    if len(urls) > BATCH_MAX_URLS:
+        raise BatchInputError(f"A batch is limited to {BATCH_MAX_URLS} URLs ({len(urls)} given).")
+    return urls
+
+def create_batch(user_id, urls, analysis_type):
+    """
+    Create a batch with one Analysis, AnalysisJob and AnalysisBatchItem per URL (three bulk
+    INSERTs, not one per row), then start its runner.
+
+    AI recommendations are not queued for batch analyses: they are generated when a report is opened.
+    The analyses are counted in the user's usage counter in the same transaction.
+
+    Returns:
+    - The AnalysisBatch (committed, status 'queued')
+    """
+    now = datetime.utcnow()
+    reserve_analyses(user_id, len(urls))
+    batch = AnalysisBatch(user_id=user_id, analysis_type=analysis_type, status='queued', total=len(urls))
+    db.session.add(batch)
+    db.session.flush()
+
+    analysis_ids = db.session.scalars(
+        insert(Analysis).returning(Analysis.id, sort_by_parameter_order=True),
+        [{'url': url, 'analysis_type': analysis_type, 'user_id': user_id, 'created_at': now} for url in urls]
+    ).all()
+    job_ids = db.session.scalars(
+        insert(AnalysisJob).returning(AnalysisJob.id, sort_by_parameter_order=True),
+        [{'analysis_id': analysis_id, 'user_id': user_id, 'url': url, 'analysis_type': analysis_type,
+          'status': 'queued', 'created_at': now} for url, analysis_id in zip(urls, analysis_ids)]
+    ).all()
+    db.session.execute(
+        insert(AnalysisBatchItem),
+        [{'batch_id': batch.id, 'job_id': job_id, 'position': position, 'url': url}
+         for position, (url, job_id) in enumerate(zip(urls, job_ids))]
+    )
+    db.session.commit()
+    logger.info(f"Queued batch {batch.id} of {len(urls)} URLs (type: {analysis_type}) for user {user_id}")
+
+    if JOB_EXECUTOR == 'thread':
+        start_batch_runner(batch.id)
+    return batch
+
+def start_batch_runner(batch_id=None):
+    """
+    Thread mode: start a runner thread if this process runs fewer than BATCH_RUNNERS. It runs batch_id,
+    then the other queued batches. Without a free slot the batch stays queued: a runner of this or
+    another process takes it when done, or the sweep of jobs.resume_unfinished_work does.
+
+    Returns:
+    - True if a runner was started
+    """
+    if not _runner_slots.acquire(blocking=False):
+        logger.info(f"All {BATCH_RUNNERS} batch runners of this process are busy: batch {batch_id} waits in the queue")
+        return False
+    app = current_app._get_current_object()
+    threading.Thread(target=_batch_runner, args=(app, batch_id), daemon=True,
+                     name=f'analysis-batch-{batch_id or "next"}').start()
+    return True
+
+def _batch_runner(app, batch_id):
+    try:
+        with app.app_context():
+            try:
+                claimed = batch_id is None
+                if claimed:
+                    batch_id = claim_next_batch()
+                while batch_id is not None:
+                    try:
+                        run_batch(batch_id, claimed=claimed)
+                    except Exception as e:
+                        logger.error(f"Batch {batch_id} failed: {str(e)}", exc_info=True)
+                        db.session.rollback()
+                    batch_id, claimed = claim_next_batch(), True
+            finally:
+                db.session.remove()
+    finally:
+        _runner_slots.release()
+
+def _claim_batch(batch_id):
+    """Atomically mark a queued batch as running. Returns False if another runner already took it."""
+    claimed = AnalysisBatch.query.filter(
+        AnalysisBatch.id == batch_id,
+        AnalysisBatch.status == 'queued'
+    ).update({'status': 'running', 'started_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+def run_batch(batch_id, claimed=False):
+    """Run the queued jobs of a batch, BATCH_CONCURRENCY at a time, with per-host politeness."""
+    if not claimed and not _claim_batch(batch_id):
+        logger.info(f"Batch {batch_id} already claimed by another runner, skipping.")
+        return
+
+    pending = db.session.execute(
+        db.select(AnalysisJob.id, AnalysisJob.url)
+        .join(AnalysisBatchItem, AnalysisBatchItem.job_id == AnalysisJob.id)
+        .where(AnalysisBatchItem.batch_id == batch_id, AnalysisJob.status == 'queued')
+        .order_by(AnalysisBatchItem.position)
+    ).all()
+    db.session.commit()
+    app = current_app._get_current_object()
+    logger.info(f"Running batch {batch_id}: {len(pending)} jobs, {BATCH_CONCURRENCY} at a time")
+
+    def run_one(job_id, url):
+        host = (urlsplit(url).hostname or '').lower()
+        _host_limiter.acquire(host)
+        try:
+            with app.app_context():
+                try:
+                    run_job(job_id)
+                except Exception as e:
+                    logger.error(f"Batch {batch_id}: job {job_id} crashed: {str(e)}", exc_info=True)
+                finally:
+                    db.session.remove()
+        finally:
+            _host_limiter.release(host)
+
+    # Round-robin over hosts: the pool works on several sites instead of queueing behind one host's limit
+    by_host = defaultdict(list)
+    for job_id, url in pending:
+        by_host[(urlsplit(url).hostname or '').lower()].append((job_id, url))
+    interleaved = [job for jobs in zip_longest(*by_host.values()) for job in jobs if job]
+
+    with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix=f'batch-{batch_id}') as pool:
+        for job_id, url in interleaved:
+            pool.submit(run_one, job_id, url)
+
+    batch = db.session.get(AnalysisBatch, batch_id)
+    batch.status = 'done'
+    batch.finished_at = datetime.utcnow()
+    db.session.commit()
+    logger.info(f"Batch {batch_id} done.")
+
+def claim_next_batch():
+    """Claim the oldest queued batch for an external worker. Returns its ID or None."""
+    query = AnalysisBatch.query.filter(AnalysisBatch.status == 'queued').order_by(AnalysisBatch.created_at)
+    if db.engine.dialect.name == 'postgresql':
+        query = query.with_for_update(skip_locked=True)
+    batch = query.first()
+    if not batch:
+        db.session.rollback()
+        return None
+    batch.status = 'running'
+    batch.started_at = datetime.utcnow()
+    db.session.commit()
+    return batch.id
+
+def requeue_stale_batches():
+    """
+    Put back running batches whose runner died (no job of theirs started for JOB_STALE_AFTER seconds
+    while some are unfinished). Their remaining queued jobs are run by the next runner.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_AFTER)
+    recent_start = db.select(AnalysisBatchItem.batch_id).join(AnalysisJob, AnalysisBatchItem.job_id == AnalysisJob.id) \
+        .where(AnalysisJob.started_at >= cutoff)
+    unfinished = db.select(AnalysisBatchItem.batch_id).join(AnalysisJob, AnalysisBatchItem.job_id == AnalysisJob.id) \
+        .where(AnalysisJob.status.notin_(FINISHED_JOB_STATES))
+    requeued = AnalysisBatch.query.filter(
+        AnalysisBatch.status == 'running',
+        AnalysisBatch.started_at < cutoff,
+        AnalysisBatch.id.notin_(recent_start),
+        AnalysisBatch.id.in_(unfinished)
+    ).update({'status': 'queued', 'started_at': None}, synchronize_session=False)
+    db.session.commit()
+    if requeued:
+        logger.warning(f"Requeued {requeued} stale analysis batches.")
+    return requeued
+
+def batch_to_dict(batch, include_results=True):
+    """Aggregate progress of a batch, and one result per URL (in submission order)."""
+    counts = dict(db.session.execute(
+        db.select(AnalysisJob.status, func.count())
+        .join(AnalysisBatchItem, AnalysisBatchItem.job_id == AnalysisJob.id)
+        .where(AnalysisBatchItem.batch_id == batch.id)
+        .group_by(AnalysisJob.status)
+    ).all())
+    finished = sum(counts.get(status, 0) for status in FINISHED_JOB_STATES)
+    result = {
+        'id': batch.id,
+        'analysis_type': batch.analysis_type,
+        'status': batch.status,
+        'total': batch.total,
+        'progress': {
+            'queued': counts.get('queued', 0),
+            'running': batch.total - finished - counts.get('queued', 0),
+            'done': counts.get('done', 0),
+            'failed': counts.get('failed', 0),
+            'percent': round(100 * finished / batch.total, 1) if batch.total else 100.0
+        },
+        'created_at': batch.created_at.isoformat() if batch.created_at else None,
+        'finished_at': batch.finished_at.isoformat() if batch.finished_at else None
+    }
+    if include_results:
+        rows = db.session.execute(
+            db.select(AnalysisBatchItem.url, AnalysisJob.id, AnalysisJob.status, AnalysisJob.error, Analysis.id,
+                      Analysis.overall_score, Analysis.meta_score, Analysis.content_score, Analysis.technical_score)
+            .join(AnalysisJob, AnalysisBatchItem.job_id == AnalysisJob.id)
+            .outerjoin(Analysis, AnalysisJob.analysis_id == Analysis.id)
+            .where(AnalysisBatchItem.batch_id == batch.id)
+            .order_by(AnalysisBatchItem.position)
+        ).all()
+        result['results'] = [{
+            'url': url, 'job_id': job_id, 'status': status, 'error': error, 'analysis_id': analysis_id,
+            'scores': {'overall': overall, 'meta': meta, 'content': content, 'technical': technical}
+            if status == 'done' else None
+        } for url, job_id, status, error, analysis_id, overall, meta, content, technical in rows]
+        scores = [item['scores']['overall'] for item in result['results'] if item['scores'] and item['scores']['overall'] is not None]
+        result['average_score'] = round(sum(scores) / len(scores), 1) if scores else None
+    return result
@@ -0,0 +1,792 @@
+#!/usr/bin/env python3
+"""
+Benchmarks des chemins critiques d'Opt-AI.
+
+Usage:
+    python benchmark.py parse [--corpus DIR] [--repeat N]
+    python benchmark.py backends [--corpus DIR] [--repeat N]
+    python benchmark.py parity [--corpus DIR] [--chunk-size N [N ...]]
+    python benchmark.py fetch URL [URL ...] [--repeat N]
+    python benchmark.py load [--modes sync,gevent] [--concurrency N] [--requests N] [--delay S] [--target URL]
+    python benchmark.py semantic [--pages N] [--concurrency N] [--latency S]
+    python benchmark.py indexes [--analyses N] [--users N] [--repeat N] [--database-url URL]
+    python benchmark.py boot [--repeat N] [--target-ms MS] [--top N]
+    python benchmark.py details [--analyses N] [--repeat N]
+
+    parse : temps de parsing + notation par page, comparant les multiples parcours
+            BeautifulSoup de l'ancien code (find/find_all par analyseur) à l'extracteur
+            en une passe (page_features.extract_features). DIR contient des pages HTML
+            sauvegardées (*.html) ; sans DIR, un corpus synthétique est généré.
+
+    backends : temps et pic mémoire (tracemalloc) de parse_features() pour chaque backend
+               ('html.parser', 'lxml', 'stream').
+
+    parity : vérifie sur le corpus que le tokenizer en flux ('stream') produit exactement les
+             mêmes relevés, le même texte de contenu (content_text, word_count, après extraction du
+             contenu principal) et les mêmes scores que le mode arbre 'html.parser' (code de sortie 1
+             sinon). Les écarts de 'lxml', qui répare le HTML invalide différemment, sont
+             seulement signalés. Le flux est aussi lu par morceaux de chaque --chunk-size caractères.
+             En CI : `python benchmark.py parity --corpus fixtures/parity --chunk-size 1 7 17 4096`
+             (pages réelles et cas limites : balises non fermées, </p> dans un <script>, entités
+             coupées entre deux morceaux, <meta charset>).
+
+    fetch : récupère chaque URL N fois avec un requests.get nu (nouvelle connexion TCP+TLS à
+            chaque appel) puis avec fetcher.fetch_page (session keep-alive partagée), et affiche
+            les temps médians DNS / connect / TLS / TTFB / download de la couche fetch.
+
+    load : capacité en requêtes concurrentes de gunicorn selon SERVER_MODE. Pour chaque mode,
+           lance `gunicorn -c gunicorn.conf.py benchmark:load_app` : chaque requête récupère,
+           via fetcher.fetch_page, une page d'un serveur local qui met --delay secondes à
+           répondre (comme un site client ou DeepSeek lent). Envoie --requests requêtes avec
+           --concurrency clients et affiche débit, latences p50/p95/max et erreurs.
+           Avec --target URL, charge plutôt un serveur déjà lancé.
+
+    semantic : requêtes DeepSeek de l'analyse sémantique (analyses 'deep') de --pages pages lancées
+               par --concurrency analyses simultanées, contre une API simulée qui met --latency
+               secondes à répondre : une requête par page (et par morceau) contre les requêtes
+               groupées de SemanticBatcher. Affiche le nombre de requêtes, les tokens d'entrée
+               estimés (consignes répétées comprises) et la durée totale.
+
+    indexes : remplit une base jetable (SQLite dans un dossier temporaire, ou --database-url, qui
+              doit être vide) avec --analyses analyses, leurs détails, jobs et abonnements, puis
+              mesure les requêtes fréquentes (historique, quota, rapport, file des jobs, webhooks
+              Stripe) sans les index (schéma de db.create_all() d'origine) puis après la migration
+              des index (0002) : plan d'exécution et latence médiane de chaque requête.
+
+    boot : temps de démarrage d'un worker, `python -X importtime -c "from main import app"` (imports et
+           create_app()) lancé --repeat fois contre une base SQLite vide. Affiche la médiane, les modules
+           les plus coûteux et vérifie que les clients lourds (openai, stripe, bs4, alembic) ne sont pas
+           importés au démarrage. Code de sortie 1 si la médiane dépasse --target-ms ou si l'un d'eux l'est.
+
+    details : stockage des détails d'analyse dans une base SQLite jetable. Enregistre --analyses analyses
+              (détails produits par les analyseurs sur des pages synthétiques) en lignes analysis_detail
+              (schéma 0002), applique la migration 0003 qui les convertit en blobs, puis les enregistre en
+              blobs : instructions SQL et lignes écrites par analyse, temps d'écriture et de lecture
+              médians, taille de la base après VACUUM et durée de la conversion.
+"""
+
+import os
+import sys
+import glob
+import time
+import random
+import argparse
+import logging
+import tracemalloc
+from statistics import median
+
+logging.disable(logging.CRITICAL)  # Les analyseurs loggent beaucoup, ce n'est pas ce qu'on mesure
+
+def _synthetic_page(blocks, seed):
+    """Build an e-commerce-like page with navigation, product cards and a footer."""
+    rng = random.Random(seed)
+    words = ['seo', 'product', 'price', 'shipping', 'quality', 'review', 'customer', 'fast', 'free', 'best']
+    def sentence(n):
+        return ' '.join(rng.choice(words) for _ in range(n))
+    parts = [
+        '<!DOCTYPE html><html><head><title>Synthetic store page</title>',
+        '<meta name="description" content="A synthetic page used to benchmark the SEO analyzers on large documents.">',
+        '<meta name="viewport" content="width=device-width, initial-scale=1">',
+        '<meta property="og:title" content="Synthetic"><link rel="canonical" href="https://example.com/">',
+        '</head><body><nav><ul>' + ''.join(f'<li><a href="/c/{i}">{sentence(2)}</a></li>' for i in range(50)) + '</ul></nav>',
+        '<h1>Synthetic store</h1>'
+    ]
+    for i in range(blocks):
+        alt = f' alt="{sentence(2)}"' if i % 3 else ''  # One image in three without alt text
+        parts.append(f'<div class="card"><h2>{sentence(3)}</h2><h3>{sentence(2)}</h3>'
+                     f'<img src="/img/{i}.jpg"{alt}>'
+                     f'<p>{sentence(40)} <b>{sentence(3)}</b> {sentence(20)}</p><span class="price">{i}.99</span></div>')
+    parts.append('<footer><p>' + sentence(30) + '</p></footer></body></html>')
+    return ''.join(parts)
+
+def load_corpus(corpus_dir):
+    """
+    Return [(name, html)] from a directory of saved pages, or a synthetic corpus.
+
+    Saved pages are decoded like fetched ones (fetcher.detect_encoding: BOM, <meta charset>, detection).
+    """
+    if corpus_dir:
+        from fetcher import detect_encoding
+        pages = []
+        for path in sorted(glob.glob(os.path.join(corpus_dir, '*.html')) + glob.glob(os.path.join(corpus_dir, '*.htm'))):
+            with open(path, 'rb') as f:
+                content = f.read()
+            encoding, _ = detect_encoding(content, None)
+            pages.append((os.path.basename(path), content.decode(encoding or 'utf-8', errors='replace')))
+        if not pages:
+            sys.exit(f"No *.html files found in {corpus_dir}")
+        return pages
+    return [(f'synthetic-{blocks}', _synthetic_page(blocks, blocks)) for blocks in (20, 200, 2000, 8000)]
+
+def _legacy_lookups(soup):
+    """The tree lookups analyze_meta_tags/analyze_content/analyze_technical used to make, one walk each."""
+    soup.title
+    soup.find('meta', attrs={'name': 'description'})
+    soup.find('meta', attrs={'name': 'keywords'})
+    soup.find('meta', property='og:title')
+    soup.find('meta', property='og:description')
+    soup.find('meta', property='og:image')
+    soup.find_all('h1')
+    for i in range(1, 7):
+        soup.find_all(f'h{i}')
+    ' '.join(p.get_text(separator=' ', strip=True) for p in soup.find_all('p'))
+    soup.find_all('img')
+    soup.find('meta', attrs={'name': 'viewport'})
+    soup.find('link', rel='canonical')
+    # Deep analyses walked the paragraphs a second time for the semantic text
+    ' '.join(p.get_text(separator=' ', strip=True) for p in soup.find_all('p') if p.get_text(strip=True))
+
+def _score(features):
+    from seo_analyzer import analyze_meta_tags, analyze_content, analyze_technical
+    results = {'scores': {}, 'details': {'meta': {}, 'content': {}, 'technical': {}}}
+    analyze_meta_tags(features, results)
+    analyze_content(features, results)
+    analyze_technical(features, 'https://example.com/', results)
+    features.paragraph_text
+    return results
+
+def _timed(func, repeat):
+    """Median wall time of func() over repeat runs, in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return median(samples)
+
+def bench_parse(args):
+    from bs4 import BeautifulSoup
+    from page_features import extract_features
+
+    pages = load_corpus(args.corpus)
+    print(f"{'page':<28}{'size KB':>9}{'parse ms':>10}{'legacy walks':>14}{'1-pass+score':>14}{'walk speedup':>14}")
+    totals = {'parse': 0.0, 'legacy': 0.0, 'single': 0.0}
+    for name, html in pages:
+        soup = BeautifulSoup(html, 'html.parser')
+        parse_ms = _timed(lambda: BeautifulSoup(html, 'html.parser'), args.repeat)
+        legacy_ms = _timed(lambda: _legacy_lookups(soup), args.repeat)
+        single_ms = _timed(lambda: _score(extract_features(soup)), args.repeat)
+        totals['parse'] += parse_ms
+        totals['legacy'] += legacy_ms
+        totals['single'] += single_ms
+        print(f"{name[:27]:<28}{len(html.encode('utf-8')) / 1024:>9.0f}{parse_ms:>10.1f}{legacy_ms:>14.1f}{single_ms:>14.1f}{legacy_ms / single_ms:>13.1f}x")
+    print(f"{'TOTAL parse+score':<28}{'':>9}{'':>10}{totals['parse'] + totals['legacy']:>14.1f}{totals['parse'] + totals['single']:>14.1f}"
+          f"{(totals['parse'] + totals['legacy']) / (totals['parse'] + totals['single']):>13.2f}x")
+
+def _peak_memory_kb(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+def bench_backends(args):
+    from page_features import parse_features
+
+    backends = ('html.parser', 'lxml', 'stream')
+    pages = load_corpus(args.corpus)
+    print(f"{'page':<28}{'size KB':>9}" + ''.join(f"{backend + ' ms':>16}{'peak KB':>10}" for backend in backends))
+    for name, html in pages:
+        row = f"{name[:27]:<28}{len(html.encode('utf-8')) / 1024:>9.0f}"
+        for backend in backends:
+            elapsed_ms = _timed(lambda: _score(parse_features(html, backend)[0]), args.repeat)
+            peak_kb = _peak_memory_kb(lambda: parse_features(html, backend))
+            row += f"{elapsed_ms:>16.1f}{peak_kb:>10.0f}"
+        print(row)
+
+def _diff_keys(left, right):
+    return sorted(key for key in left if left[key] != right.get(key))
+
+def _content_keys(features):
+    return {'content_text': features.content_text, 'word_count': features.word_count}
+
+def check_parity(args):
+    from page_features import parse_features, StreamingFeatureParser
+    from content_extraction import extract_main_text
+
+    pages = load_corpus(args.corpus)
+    failures = 0
+    for name, html in pages:
+        # Comme analyze_url : contenu principal extrait après le parsing, quel que soit le backend
+        main_text = extract_main_text(html)
+        reference = parse_features(html, 'html.parser')[0]
+        reference.main_text = main_text
+        reference_results = _score(reference)
+
+        # Feed the stream parser in small chunks too: tokens and entities split across chunks must not change anything
+        candidates = [('stream', parse_features(html, 'stream')[0])]
+        for chunk_size in args.chunk_size:
+            parser = StreamingFeatureParser()
+            for start in range(0, len(html), chunk_size):
+                parser.feed(html[start:start + chunk_size])
+            candidates.append((f'stream/{chunk_size}', parser.close()))
+        candidates.append(('lxml', parse_features(html, 'lxml')[0]))
+
+        for backend, features in candidates:
+            features.main_text = main_text
+            feature_diff = _diff_keys(reference.to_dict(), features.to_dict())
+            feature_diff += _diff_keys(_content_keys(reference), _content_keys(features))
+            results = _score(features)
+            score_diff = _diff_keys(reference_results['scores'], results['scores'])
+            if not feature_diff and results == reference_results:
+                continue
+            if backend == 'lxml':
+                print(f"[info] {name}: lxml differs from html.parser (features: {feature_diff}, scores: {score_diff})")
+            else:
+                failures += 1
+                print(f"[FAIL] {name}: {backend} differs from html.parser (features: {feature_diff}, scores: {score_diff})")
+    print(f"{len(pages)} pages checked, {failures} parity failures.")
+    if failures:
+        sys.exit(1)
+
+def bench_fetch(args):
+    import requests
+    from fetcher import fetch_page, DEFAULT_HEADERS
+
+    phases = ('dns', 'connect', 'tls', 'ttfb', 'download', 'total')
+    print(f"{'url':<40}{'bare get ms':>13}" + ''.join(f"{phase:>10}" for phase in phases) + f"{'reused':>8}")
+    for url in args.urls:
+        bare_ms = _timed(lambda: requests.get(url, headers=DEFAULT_HEADERS, timeout=20).content, args.repeat)
+        fetch_page(url)  # Warm the pool: the runs below measure the keep-alive path
+        results = [fetch_page(url) for _ in range(args.repeat)]
+        row = f"{url[:39]:<40}{bare_ms:>13.1f}"
+        row += ''.join(f"{median(result.timings[phase] for result in results):>10.1f}" for phase in phases)
+        row += f"{sum(result.timings['reused_connection'] for result in results):>5}/{args.repeat}"
+        print(row)
+
+def load_app(environ, start_response):
+    """WSGI app run by the load benchmark: one slow outbound fetch per request, like an analysis."""
+    from fetcher import fetch_page
+    page = fetch_page(os.environ['LOAD_UPSTREAM_URL'])
+    body = f"{page.status_code} {page.size}\n".encode()
+    start_response('200 OK', [('Content-Type', 'text/plain'), ('Content-Length', str(len(body)))])
+    return [body]
+
+def _slow_upstream(delay):
+    """Local HTTP server answering every GET after `delay` seconds. Returns (server, url)."""
+    import threading
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    page = _synthetic_page(20, 0).encode()
+
+    class SlowHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(page)))
+            self.end_headers()
+            self.wfile.write(page)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowHandler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+def _free_port():
+    import socket
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _wait_for_port(port, timeout):
+    import socket
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def _run_load(url, concurrency, total, timeout):
+    """Send `total` GETs with `concurrency` client threads. Returns (wall seconds, latencies ms, errors)."""
+    import threading
+    import requests
+    from concurrent.futures import ThreadPoolExecutor
+
+    local = threading.local()
+
+    def one(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            session.get(url, timeout=timeout).raise_for_status()
+        except requests.RequestException:
+            return None
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    wall = time.perf_counter() - start
+    latencies = sorted(result for result in results if result is not None)
+    return wall, latencies, total - len(latencies)
+
+def _print_load_row(label, wall, latencies, errors):
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else float('nan')
+    print(f"{label:<10}{len(latencies) / wall:>10.1f}{percentile(0.5):>10.0f}{percentile(0.95):>10.0f}"
+          f"{(latencies[-1] if latencies else float('nan')):>10.0f}{errors:>8}{wall:>9.1f}")
+
+def bench_load(args):
+    import subprocess
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent clients, upstream delay {args.delay}s")
+    print(f"{'mode':<10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'errors':>8}{'wall s':>9}")
+    if args.target:
+        _print_load_row('target', *_run_load(args.target, args.concurrency, args.requests, args.timeout))
+        return
+
+    upstream, upstream_url = _slow_upstream(args.delay)
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        for mode in args.modes.split(','):
+            port = _free_port()
+            env = dict(os.environ, SERVER_MODE=mode, PORT=str(port), WEB_CONCURRENCY=str(args.workers),
+                       LOAD_UPSTREAM_URL=upstream_url, FETCH_POOL_PER_HOST=str(args.concurrency),
+                       DB_MIGRATE_ON_START='false')
+            server = subprocess.Popen(['gunicorn', '-c', 'gunicorn.conf.py', 'benchmark:load_app'], cwd=here, env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                if not _wait_for_port(port, 30):
+                    print(f"{mode:<10}gunicorn did not start")
+                    continue
+                _print_load_row(mode, *_run_load(f"http://127.0.0.1:{port}/", args.concurrency, args.requests, args.timeout))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+    finally:
+        upstream.shutdown()
+
+class _FakeDeepSeek:
+    """OpenAI-compatible stand-in for the semantic benchmark: answers every item of a packed prompt after `latency` seconds."""
+
+    def __init__(self, latency):
+        import threading
+        self.latency = latency
+        self.requests = 0
+        self.input_tokens = 0
+        self._lock = threading.Lock()
+        self.chat = self
+        self.completions = self
+
+    def create(self, model, messages, max_tokens, **options):
+        import json
+        from types import SimpleNamespace
+        from semantic import estimate_tokens
+        prompt = messages[-1]['content']
+        with self._lock:
+            self.requests += 1
+            self.input_tokens += sum(estimate_tokens(message['content']) for message in messages)
+        time.sleep(self.latency)
+        items = prompt.count('\n=== ITEM ')
+        content = json.dumps({'results': [{'id': item_id, 'relevance_score': 70, 'main_topics': ['seo'],
+                                           'depth_assessment': 'Synthetic.'} for item_id in range(1, items + 1)]})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def bench_semantic(args):
+    os.environ['AI_CACHE_ENABLED'] = 'false'  # Every run must reach the (fake) API
+    from concurrent.futures import ThreadPoolExecutor
+    import ai_integration
+    import semantic
+    from page_features import parse_features
+    from content_extraction import extract_main_text
+
+    rng = random.Random(0)
+    texts = []
+    for seed in range(args.pages):
+        html = _synthetic_page(rng.choice((3, 10, 30, 300)), seed)
+        features = parse_features(html)[0]
+        features.main_text = extract_main_text(html)
+        texts.append(features.content_text)
+    print(f"{args.pages} pages ({sum(semantic.estimate_tokens(text) for text in texts)} tokens of main content), "
+          f"{args.concurrency} concurrent analyses, API latency {args.latency}s")
+    print(f"{'mode':<12}{'requests':>10}{'input tok':>12}{'wall s':>9}")
+
+    modes = [('per-page', semantic.SemanticBatcher(window=0, max_items=1)), ('packed', semantic.SemanticBatcher())]
+    for label, batcher in modes:
+        fake = ai_integration._client = _FakeDeepSeek(args.latency)
+        semantic._batcher = batcher
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(semantic.analyze_page_semantics, texts))
+        wall = time.perf_counter() - start
+        failed = sum(1 for result in results if 'chunks' not in result)
+        print(f"{label:<12}{fake.requests:>10}{fake.input_tokens:>12}{wall:>9.1f}" + (f"  ({failed} failed)" if failed else ''))
+
+def _legacy_detail_table():
+    """analysis_detail, the table of one row per detail that migration 0003 replaced with analysis.details_data."""
+    from sqlalchemy import table, column, Integer, String, Text
+    return table('analysis_detail', column('id', Integer), column('analysis_id', Integer), column('category', String),
+                 column('component', String), column('status', String), column('score', Integer),
+                 column('description', Text), column('recommendation', Text), column('message_code', String),
+                 column('message_params', Text))
+
+def _seed_database(db, models, analyses, users):
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    chunk = 50_000
+
+    def bulk(model, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == chunk:
+                db.session.execute(insert(model), batch)
+                batch = []
+        if batch:
+            db.session.execute(insert(model), batch)
+        db.session.commit()
+
+    bulk(models.User, ({'id': user_id, 'username': f'user{user_id}', 'email': f'user{user_id}@example.com',
+                        'subscription_status': 'free', 'entitlements_version': 0} for user_id in range(1, users + 1)))
+    bulk(models.Subscription, ({'user_id': user_id, 'stripe_subscription_id': f'sub_{user_id}',
+                                'plan': rng.choice(('free', 'basic', 'premium', 'enterprise')), 'status': 'active'}
+                               for user_id in range(1, users + 1)))
+    bulk(models.Analysis, ({'id': analysis_id, 'url': f'https://site{analysis_id % 5000}.example.com/page{analysis_id}',
+                            'analysis_type': 'partial', 'user_id': rng.randint(1, users),
+                            'created_at': now - timedelta(seconds=rng.randint(0, 365 * 86400)),
+                            'overall_score': rng.randint(0, 100)} for analysis_id in range(1, analyses + 1)))
+    # Ten details for each of the most recent tenth of the analyses, one job per analysis (the last ones queued)
+    detailed = max(1, analyses // 10)
+    bulk(_legacy_detail_table(), ({'analysis_id': analyses - index // 10, 'category': 'meta', 'component': f'c{index % 10}',
+                                  'status': 'good', 'score': 100} for index in range(detailed * 10)))
+    bulk(models.AnalysisJob, ({'analysis_id': analysis_id, 'user_id': 1, 'url': 'https://example.com/',
+                               'analysis_type': 'partial', 'status': 'queued' if analysis_id > analyses - 20 else 'done',
+                               'created_at': now - timedelta(seconds=analyses - analysis_id)}
+                              for analysis_id in range(1, analyses + 1)))
+
+def _hot_queries(db, models, analyses, users):
+    """[(name, statement builder taking a random.Random)] of the frequent queries, in the shape the code runs them."""
+    from datetime import datetime
+    from sqlalchemy import select, func
+    Analysis, AnalysisJob, Subscription = models.Analysis, models.AnalysisJob, models.Subscription
+    analysis_detail = _legacy_detail_table()
+    month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    recent = max(1, analyses // 10)
+    return [
+        ('history page', lambda rng: select(Analysis.created_at, Analysis.id, Analysis.url, Analysis.overall_score)
+            .where(Analysis.user_id == rng.randint(1, users))
+            .order_by(Analysis.created_at.desc(), Analysis.id.desc()).limit(51)),
+        ('monthly count', lambda rng: select(func.count()).select_from(Analysis)
+            .where(Analysis.user_id == rng.randint(1, users), Analysis.created_at >= month_start)),
+        ('dashboard totals', lambda rng: select(func.count(), func.avg(Analysis.overall_score))
+            .where(Analysis.user_id == rng.randint(1, users))),
+        ('report details', lambda rng: select(analysis_detail)
+            .where(analysis_detail.c.analysis_id == analyses - rng.randrange(recent))),
+        ('job of analysis', lambda rng: select(AnalysisJob.id, AnalysisJob.status)
+            .where(AnalysisJob.analysis_id == rng.randint(1, analyses))),
+        ('claim next job', lambda rng: select(AnalysisJob.id)
+            .where(AnalysisJob.status == 'queued', AnalysisJob.started_at.is_(None))
+            .order_by(AnalysisJob.created_at).limit(1)),
+        ('stripe webhook', lambda rng: select(Subscription)
+            .where(Subscription.stripe_subscription_id == f'sub_{rng.randint(1, users)}')),
+        ('user subscription', lambda rng: select(Subscription).where(Subscription.user_id == rng.randint(1, users))),
+    ]
+
+def _query_plan(db, statement):
+    compiled = statement.compile(dialect=db.engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup) if compiled.positional else compiled.params
+    if db.engine.dialect.name == 'sqlite':
+        rows = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled.string}", params).all()
+        return [row[-1] for row in rows]
+    rows = db.session.connection().exec_driver_sql(f"EXPLAIN {compiled.string}", params).all()
+    return [row[0] for row in rows]
+
+def _measure_queries(db, queries, repeat):
+    """{name: (median ms, plan lines)}."""
+    results = {}
+    for name, build in queries:
+        rng = random.Random(1)
+        timings = []
+        for _ in range(repeat):
+            statement = build(rng)
+            start = time.perf_counter()
+            db.session.execute(statement).all()
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = (median(timings), _query_plan(db, build(random.Random(1))))
+        db.session.rollback()
+    return results
+
+def bench_indexes(args):
+    import tempfile
+    from sqlalchemy import text
+    scratch = None
+    if not args.database_url:
+        scratch = tempfile.mkdtemp(prefix='optai-indexes-')
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+    os.environ.setdefault('SESSION_SECRET', 'benchmark')
+    from app import create_app, db
+    import models
+    from schema import upgrade_database
+
+    app = create_app()
+    with app.app_context():
+        if db.inspect(db.engine).get_table_names():
+            raise SystemExit(f"{os.environ['DATABASE_URL']} is not empty: use a scratch database.")
+        # Before: the schema as db.create_all() used to make it, without the analysis index either
+        upgrade_database('0001')
+        with db.engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_analysis_user_created"))
+        start = time.perf_counter()
+        _seed_database(db, models, args.analyses, args.users)
+        print(f"Seeded {args.analyses} analyses for {args.users} users in {time.perf_counter() - start:.0f}s "
+              f"({db.engine.dialect.name})")
+        with db.engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        queries = _hot_queries(db, models, args.analyses, args.users)
+        before = _measure_queries(db, queries, args.repeat)
+
+        start = time.perf_counter()
+        with db.engine.begin() as conn:
+            next(index for index in models.Analysis.__table__.indexes if index.name == 'ix_analysis_user_created').create(conn)
+        upgrade_database('0002')
+        with db.engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        print(f"Indexes (migrations to 0002): {time.perf_counter() - start:.1f}s")
+        after = _measure_queries(db, queries, args.repeat)
+        db.session.remove()
+        db.engine.dispose()
+
+    print(f"\n{'query':<20}{'before ms':>11}{'after ms':>10}{'speedup':>9}")
+    for name, _ in queries:
+        (before_ms, _), (after_ms, _) = before[name], after[name]
+        print(f"{name:<20}{before_ms:>11.2f}{after_ms:>10.2f}{before_ms / after_ms if after_ms else 0:>8.0f}x")
+    for name, _ in queries:
+        print(f"\n{name}\n  before: " + "\n          ".join(before[name][1]) + "\n  after:  " + "\n          ".join(after[name][1]))
+    if scratch:
+        import shutil
+        shutil.rmtree(scratch, ignore_errors=True)
+
+def _detail_rows(analysis_id, findings):
+    import json
+    return [{'analysis_id': analysis_id, 'category': finding.category, 'component': finding.component,
+             'status': finding.status, 'score': finding.score, 'description': finding.description,
+             'recommendation': finding.recommendation, 'message_code': finding.message_code,
+             'message_params': json.dumps(finding.params, ensure_ascii=False) if finding.params else None}
+            for finding in findings]
+
+def _measure_storage(db, path, save, load, analyses, repeat):
+    """Save every analysis with save(analysis_id), then load(analysis_id) `repeat` random ones. Returns a dict of measures."""
+    from sqlalchemy import event, text
+    counts = {'statements': 0, 'rows': 0}
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counts['statements'] += 1
+        counts['rows'] += len(parameters) if executemany else 1
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    write_ms = []
+    for analysis_id in range(1, analyses + 1):
+        start = time.perf_counter()
+        save(analysis_id)
+        db.session.commit()
+        write_ms.append((time.perf_counter() - start) * 1000)
+    event.remove(db.engine, 'before_cursor_execute', count)
+    rng = random.Random(0)
+    read_ms = _timed(lambda: load(rng.randint(1, analyses)), repeat)
+    db.session.commit()
+    with db.engine.connect() as conn:
+        conn.execution_options(isolation_level='AUTOCOMMIT').execute(text("VACUUM"))
+    return {'write_ms': median(write_ms), 'statements': counts['statements'] / analyses,
+            'rows': counts['rows'] / analyses, 'read_ms': read_ms, 'size_mb': os.path.getsize(path) / 1e6}
+
+def bench_details(args):
+    import json
+    import shutil
+    import tempfile
+    from sqlalchemy import insert, update, select
+    scratch = tempfile.mkdtemp(prefix='optai-details-')
+    path = os.path.join(scratch, 'bench.db')
+    os.environ['DATABASE_URL'] = f"sqlite:///{path}"
+    os.environ.setdefault('SESSION_SECRET', 'benchmark')
+    from app import create_app, db
+    from models import User, Analysis
+    from schema import upgrade_database
+    from page_features import parse_features
+    from analysis_details import Finding, findings_from_results, encode_details, decode_details
+
+    # Résultats réels des analyseurs sur quelques pages, répartis entre les analyses
+    variants = []
+    for seed in range(8):
+        results = _score(parse_features(_synthetic_page(20 + seed * 10, seed))[0])
+        variants.append((results['scores'], findings_from_results(results)))
+    legacy = _legacy_detail_table()
+
+    def scores(analysis_id):
+        values = variants[analysis_id % len(variants)][0]
+        return {'meta_score': values.get('meta', 0), 'content_score': values.get('content', 0),
+                'technical_score': values.get('technical', 0), 'overall_score': values.get('overall', 0)}
+
+    def save_rows(analysis_id):
+        db.session.execute(update(Analysis.__table__).where(Analysis.id == analysis_id).values(**scores(analysis_id)))
+        db.session.execute(insert(legacy), _detail_rows(analysis_id, variants[analysis_id % len(variants)][1]))
+
+    def load_rows(analysis_id):
+        return [Finding(row.category, row.component, row.status, row.score, row.description, row.recommendation,
+                        row.message_code, json.loads(row.message_params) if row.message_params else None)
+                for row in db.session.execute(select(legacy).where(legacy.c.analysis_id == analysis_id))]
+
+    def save_blob(analysis_id):
+        db.session.execute(update(Analysis.__table__).where(Analysis.id == analysis_id).values(
+            details_data=encode_details(variants[analysis_id % len(variants)][1]), **scores(analysis_id)))
+
+    def load_blob(analysis_id):
+        return decode_details(db.session.execute(select(Analysis.details_data).where(Analysis.id == analysis_id)).scalar())
+
+    app = create_app()
+    try:
+        with app.app_context():
+            upgrade_database('0002')
+            db.session.execute(insert(User.__table__), [{'id': 1, 'username': 'bench', 'email': 'bench@example.com',
+                                                        'entitlements_version': 0}])
+            db.session.execute(insert(Analysis.__table__), [
+                {'id': analysis_id, 'url': f'https://example.com/page{analysis_id}', 'analysis_type': 'partial',
+                 'user_id': 1} for analysis_id in range(1, args.analyses + 1)])
+            db.session.commit()
+            per_analysis = sum(len(findings) for _, findings in variants) / len(variants)
+            print(f"{args.analyses} analyses, {per_analysis:.1f} details each (SQLite)")
+
+            rows = _measure_storage(db, path, save_rows, load_rows, args.analyses, args.repeat)
+            start = time.perf_counter()
+            upgrade_database()
+            migration_s = time.perf_counter() - start
+            blob = _measure_storage(db, path, save_blob, load_blob, args.analyses, args.repeat)
+            db.session.remove()
+            db.engine.dispose()
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    print(f"\n{'':<28}{'rows':>10}{'blob':>10}")
+    for label, key, fmt in (('statements per analysis', 'statements', '.1f'), ('rows written per analysis', 'rows', '.1f'),
+                            ('write ms (median)', 'write_ms', '.3f'), ('read ms (median)', 'read_ms', '.3f'),
+                            ('database MB (VACUUM)', 'size_mb', '.2f')):
+        print(f"{label:<28}{rows[key]:>10{fmt}}{blob[key]:>10{fmt}}")
+    print(f"\nMigration 0003 (rows to blobs): {migration_s:.1f}s, {args.analyses / migration_s:.0f} analyses/s")
+
+BOOT_DEFERRED_MODULES = ('openai', 'stripe', 'bs4', 'alembic')  # Imported on first use, not at boot
+
+def _import_profile(code, env):
+    """Run `python -X importtime -c code`. Returns {module: cumulative µs} (first import of each module)."""
+    import subprocess
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], env=env, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise SystemExit(f"`{code}` failed:\n{result.stderr[-2000:]}")
+    profile = {}
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package" (the application logs go to stderr too)
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        profile.setdefault(name.strip(), int(cumulative))
+    return profile
+
+def bench_boot(args):
+    import tempfile
+    scratch = tempfile.mkdtemp(prefix='optai-boot-')
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(scratch, 'boot.db')}", LOG_LEVEL='ERROR')
+    env.setdefault('SESSION_SECRET', 'benchmark')
+    try:
+        profiles = [_import_profile('from main import app', env) for _ in range(args.repeat)]
+        deferred = _import_profile(f"import {', '.join(BOOT_DEFERRED_MODULES)}", env)
+    finally:
+        import shutil
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    boot_ms = median(profile['main'] for profile in profiles) / 1000
+    profile = profiles[-1]
+    print(f"Boot (imports + create_app): median {boot_ms:.0f} ms over {args.repeat} runs, target {args.target_ms:.0f} ms")
+    print(f"\n{'module':<40}{'cumulative ms':>14}")
+    top_level = [name for name in profile if '.' not in name and name != 'main']
+    for name in sorted(top_level, key=profile.get, reverse=True)[:args.top]:
+        print(f"{name:<40}{profile[name] / 1000:>14.1f}")
+
+    print(f"\n{'deferred module':<40}{'import ms':>14}{'at boot':>9}")
+    loaded = [name for name in BOOT_DEFERRED_MODULES if name in profile]
+    for name in BOOT_DEFERRED_MODULES:
+        print(f"{name:<40}{deferred.get(name, 0) / 1000:>14.1f}{'yes' if name in profile else 'no':>9}")
+
+    if loaded:
+        print(f"\nFAIL: imported at boot: {', '.join(loaded)}")
+    if boot_ms > args.target_ms:
+        print(f"\nFAIL: boot takes {boot_ms:.0f} ms, over the {args.target_ms:.0f} ms target")
+    if loaded or boot_ms > args.target_ms:
+        raise SystemExit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Opt-AI benchmarks")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parse_parser = subparsers.add_parser('parse', help='HTML parse + scoring time per page')
+    parse_parser.add_argument('--corpus', help='Directory of saved HTML pages (*.html)')
+    parse_parser.add_argument('--repeat', type=int, default=5, help='Runs per page (median is reported)')
+    parse_parser.set_defaults(func=bench_parse)
+
+    backends_parser = subparsers.add_parser('backends', help='Time and peak memory of each parser backend')
+    backends_parser.add_argument('--corpus', help='Directory of saved HTML pages (*.html)')
+    backends_parser.add_argument('--repeat', type=int, default=5, help='Runs per page (median is reported)')
+    backends_parser.set_defaults(func=bench_backends)
+
+    parity_parser = subparsers.add_parser('parity', help='Check that the streaming backend scores exactly like html.parser')
+    parity_parser.add_argument('--corpus', help='Directory of saved HTML pages (*.html)')
+    parity_parser.add_argument('--chunk-size', type=int, nargs='+', default=[17], help='Chunk sizes of the chunked stream runs')
+    parity_parser.set_defaults(func=check_parity)
+
+    fetch_parser = subparsers.add_parser('fetch', help='Bare requests.get versus the pooled fetch layer')
+    fetch_parser.add_argument('urls', nargs='+', help='URLs to fetch')
+    fetch_parser.add_argument('--repeat', type=int, default=5, help='Fetches per URL (median is reported)')
+    fetch_parser.set_defaults(func=bench_fetch)
+
+    load_parser = subparsers.add_parser('load', help='Concurrent request capacity of the sync and gevent server modes')
+    load_parser.add_argument('--modes', default='sync,gevent', help='Comma-separated SERVER_MODE values to compare')
+    load_parser.add_argument('--workers', type=int, default=2, help='gunicorn workers (WEB_CONCURRENCY)')
+    load_parser.add_argument('--concurrency', type=int, default=100, help='Concurrent client connections')
+    load_parser.add_argument('--requests', type=int, default=200, help='Total requests per mode')
+    load_parser.add_argument('--delay', type=float, default=0.5, help='Upstream response time in seconds')
+    load_parser.add_argument('--timeout', type=float, default=120, help='Client timeout per request in seconds')
+    load_parser.add_argument('--target', help='Load an already running server at this URL instead')
+    load_parser.set_defaults(func=bench_load)
+
+    semantic_parser = subparsers.add_parser('semantic', help='DeepSeek requests of deep analyses, one per page versus packed')
+    semantic_parser.add_argument('--pages', type=int, default=40, help='Pages analyzed')
+    semantic_parser.add_argument('--concurrency', type=int, default=8, help='Concurrent analyses')
+    semantic_parser.add_argument('--latency', type=float, default=1.0, help='Simulated API response time in seconds')
+    semantic_parser.set_defaults(func=bench_semantic)
+
+    indexes_parser = subparsers.add_parser('indexes', help='Plans and latencies of the frequent queries, before and after the indexes')
+    indexes_parser.add_argument('--analyses', type=int, default=1_000_000, help='Analyses seeded')
+    indexes_parser.add_argument('--users', type=int, default=1000, help='Users (each with a subscription)')
+    indexes_parser.add_argument('--repeat', type=int, default=20, help='Runs per query (median is reported)')
+    indexes_parser.add_argument('--database-url', help='Empty scratch database (default: a temporary SQLite file)')
+    indexes_parser.set_defaults(func=bench_indexes)
+
+    boot_parser = subparsers.add_parser('boot', help='Import-time profile of the application boot, against a target')
+    boot_parser.add_argument('--repeat', type=int, default=5, help='Boots measured (median is reported)')
+    boot_parser.add_argument('--target-ms', type=float, default=1000, help='Maximum median boot time in ms')
+    boot_parser.add_argument('--top', type=int, default=15, help='Top-level modules listed by cumulative import time')
+    boot_parser.set_defaults(func=bench_boot)
+
+    details_parser = subparsers.add_parser('details', help='Analysis details as one row each versus one blob per analysis')
+    details_parser.add_argument('--analyses', type=int, default=2000, help='Analyses saved in each storage mode')
+    details_parser.add_argument('--repeat', type=int, default=200, help='Reads measured (median is reported)')
+    details_parser.set_defaults(func=bench_details)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 import os
 import logging
 import requests # Ajout de l'import requests
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_login import login_required, current_user
-from utils import requires_subscription # Importation du décorateur
+from utils import requires_subscription, release_db_connection # Importation du décorateur
 from models import Analysis
+from ai_integration import ai_client_configured, get_chat_response, stream_chat_response, metered_ai_usage
+from streaming import SSE_HEADERS, sse_event, sse_comment
+from metrics import stage_timer
+from translation import get_locale
+from usage import record_ai_usage
+from app import db
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -19,14 +25,94 @@ OPTY_BOT_WEBHOOK_URL = os.environ.get(
 )
 # Optionnel : Ajouter un header d'authentification si votre webhook le requiert
 OPTY_BOT_WEBHOOK_AUTH_TOKEN = os.environ.get("OPTY_BOT_WEBHOOK_AUTH_TOKEN", None)
+# 'webhook' (défaut) : réponses du webhook Opty-bot ; 'deepseek' : réponses DeepSeek, diffusées en streaming
+OPTY_BOT_BACKEND = os.environ.get("OPTY_BOT_BACKEND", "webhook").lower()
 
 
+def _analysis_context(analysis_id):
+    """Short description of an analysis of the current user, given to Opty-bot as context (or None)."""
+    if not analysis_id:
+        return None
+    analysis_context = None
+    try:
+        analysis_id_int = int(analysis_id)
+        analysis = Analysis.query.filter_by(id=analysis_id_int, user_id=current_user.id).first()
+        if analysis:
+            analysis_context = f"Analysis of {analysis.url} (type: {analysis.analysis_type}) with overall score: {analysis.overall_score}/100. "
+            scores = []
+            if analysis.meta_score is not None: scores.append(f"Meta score: {analysis.meta_score}/100")
+            if analysis.content_score is not None: scores.append(f"Content score: {analysis.content_score}/100")
+            if analysis.technical_score is not None: scores.append(f"Technical score: {analysis.technical_score}/100")
+            if scores: analysis_context += " ".join(scores)
+            
+            details = analysis.details[:5]
+            if details:
+                analysis_context += " Key issues: "
+                issues = [f"{d.component} ({d.status})" for d in details if d.status in ['warning', 'error']]
+                if issues: analysis_context += ", ".join(issues[:3])
+        else:
+            logger.warning(f"Chatbot: Analysis ID {analysis_id} not found for user {current_user.id}")
+    except ValueError:
+        logger.warning(f"Chatbot: Invalid Analysis ID format: {analysis_id}")
+    except Exception as e:
+        logger.error(f"Chatbot: Error fetching analysis context for ID {analysis_id}: {str(e)}", exc_info=True)
+    return analysis_context
+
+def _webhook_reply(user_message, analysis_context):
+    """Forward a message to the Opty-bot webhook and return its reply (or an apology)."""
+    # Préparer le payload pour le webhook externe
+    payload = {
+        "user_message": user_message,
+        "user_id": current_user.id,
+        "username": current_user.username,
+        "email": current_user.email, # Peut être utile pour le webhook
+        "analysis_context": analysis_context,
+        "session_id": request.cookies.get('session') # Exemple d'envoi d'ID de session
+    }
+    
+    headers = {"Content-Type": "application/json"}
+    if OPTY_BOT_WEBHOOK_AUTH_TOKEN:
+        headers["Authorization"] = f"Bearer {OPTY_BOT_WEBHOOK_AUTH_TOKEN}"
+
+    logger.info(f"Chatbot: Forwarding message from user {payload['user_id']} to webhook: {OPTY_BOT_WEBHOOK_URL}")
+    logger.debug(f"Chatbot: Payload for webhook: {payload}")
+    release_db_connection()  # Up to 45 s of waiting: do not hold a pooled DB connection meanwhile
+
+    try:
+        # CORRIGÉ : Timeout augmenté à 45 secondes
+        with stage_timer('chatbot_webhook'):
+            webhook_response = requests.post(OPTY_BOT_WEBHOOK_URL, json=payload, headers=headers, timeout=45) 
+            webhook_response.raise_for_status() # Lève une exception pour les codes d'erreur HTTP (4xx ou 5xx)
+        
+        response_data = webhook_response.json()
+        # CORRIGÉ : Lire la réponse depuis la clé "output"
+        final_response = response_data.get("output", "Désolé, je n'ai pas pu obtenir de réponse claire du service externe (clé 'output' attendue).")
+        logger.info(f"Chatbot: Received response from webhook for user {payload['user_id']}")
+        
+    except requests.exceptions.Timeout:
+        logger.error(f"Chatbot: Timeout calling Opty-bot webhook at {OPTY_BOT_WEBHOOK_URL} after 45 seconds.")
+        final_response = "Désolé, le service Opty-bot met trop de temps à répondre (délai de 45s dépassé)."
+    except requests.exceptions.HTTPError as e:
+        logger.error(f"Chatbot: HTTPError {e.response.status_code} calling Opty-bot webhook. Response: {e.response.text}")
+        final_response = f"Désolé, une erreur de communication ({e.response.status_code}) avec le service Opty-bot s'est produite."
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Chatbot: Error calling Opty-bot webhook: {str(e)}", exc_info=True)
+        final_response = "Désolé, une erreur technique m'empêche de contacter Opty-bot pour le moment."
+    except ValueError as e: # Erreur de parsing JSON de la réponse du webhook
+        logger.error(f"Chatbot: Error parsing Opty-bot webhook JSON response: {str(e)}", exc_info=True)
+        final_response = "Désolé, j'ai reçu une réponse inattendue de la part d'Opty-bot."
+    return final_response
+
+def _use_deepseek():
+    return OPTY_BOT_BACKEND == 'deepseek' and ai_client_configured()
+
 @chatbot_bp.route('/chatbot', methods=['POST']) 
 @login_required
 @requires_subscription(['premium', 'enterprise'], is_api_route=True) # Restriction d'accès pour API
 def chatbot_route():
     """
-    Chat API endpoint that forwards requests to an external Opty-bot webhook.
+    Chat API endpoint that forwards requests to an external Opty-bot webhook
+    (or answers with DeepSeek when OPTY_BOT_BACKEND=deepseek).
     """
     try:
         data = request.json
@@ -35,73 +121,15 @@ def chatbot_route():
             return jsonify({'error': 'Missing message parameter'}), 400
         
         user_message = data['message']
-        analysis_id = request.args.get('analysis_id') 
-        analysis_context = None
-        
-        if analysis_id:
-            try:
-                analysis_id_int = int(analysis_id)
-                analysis = Analysis.query.filter_by(id=analysis_id_int, user_id=current_user.id).first()
-                if analysis:
-                    analysis_context = f"Analysis of {analysis.url} (type: {analysis.analysis_type}) with overall score: {analysis.overall_score}/100. "
-                    scores = []
-                    if analysis.meta_score is not None: scores.append(f"Meta score: {analysis.meta_score}/100")
-                    if analysis.content_score is not None: scores.append(f"Content score: {analysis.content_score}/100")
-                    if analysis.technical_score is not None: scores.append(f"Technical score: {analysis.technical_score}/100")
-                    if scores: analysis_context += " ".join(scores)
-                    
-                    details = analysis.details.limit(5).all()
-                    if details:
-                        analysis_context += " Key issues: "
-                        issues = [f"{d.component} ({d.status})" for d in details if d.status in ['warning', 'error']]
-                        if issues: analysis_context += ", ".join(issues[:3])
-                else:
-                    logger.warning(f"Chatbot: Analysis ID {analysis_id} not found for user {current_user.id}")
-            except ValueError:
-                logger.warning(f"Chatbot: Invalid Analysis ID format: {analysis_id}")
-            except Exception as e:
-                logger.error(f"Chatbot: Error fetching analysis context for ID {analysis_id}: {str(e)}", exc_info=True)
-
-        # Préparer le payload pour le webhook externe
-        payload = {
-            "user_message": user_message,
-            "user_id": current_user.id,
-            "username": current_user.username,
-            "email": current_user.email, # Peut être utile pour le webhook
-            "analysis_context": analysis_context,
-            "session_id": request.cookies.get('session') # Exemple d'envoi d'ID de session
-        }
-        
-        headers = {"Content-Type": "application/json"}
-        if OPTY_BOT_WEBHOOK_AUTH_TOKEN:
-            headers["Authorization"] = f"Bearer {OPTY_BOT_WEBHOOK_AUTH_TOKEN}"
-
-        logger.info(f"Chatbot: Forwarding message from user {current_user.id} to webhook: {OPTY_BOT_WEBHOOK_URL}")
-        logger.debug(f"Chatbot: Payload for webhook: {payload}")
-
-        try:
-            # CORRIGÉ : Timeout augmenté à 45 secondes
-            webhook_response = requests.post(OPTY_BOT_WEBHOOK_URL, json=payload, headers=headers, timeout=45) 
-            webhook_response.raise_for_status() # Lève une exception pour les codes d'erreur HTTP (4xx ou 5xx)
-            
-            response_data = webhook_response.json()
-            # CORRIGÉ : Lire la réponse depuis la clé "output"
-            final_response = response_data.get("output", "Désolé, je n'ai pas pu obtenir de réponse claire du service externe (clé 'output' attendue).")
-            logger.info(f"Chatbot: Received response from webhook for user {current_user.id}")
-            
-        except requests.exceptions.Timeout:
-            logger.error(f"Chatbot: Timeout calling Opty-bot webhook at {OPTY_BOT_WEBHOOK_URL} after 45 seconds.")
-            final_response = "Désolé, le service Opty-bot met trop de temps à répondre (délai de 45s dépassé)."
-        except requests.exceptions.HTTPError as e:
-            logger.error(f"Chatbot: HTTPError {e.response.status_code} calling Opty-bot webhook. Response: {e.response.text}")
-            final_response = f"Désolé, une erreur de communication ({e.response.status_code}) avec le service Opty-bot s'est produite."
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Chatbot: Error calling Opty-bot webhook: {str(e)}", exc_info=True)
-            final_response = "Désolé, une erreur technique m'empêche de contacter Opty-bot pour le moment."
-        except ValueError as e: # Erreur de parsing JSON de la réponse du webhook
-            logger.error(f"Chatbot: Error parsing Opty-bot webhook JSON response: {str(e)}", exc_info=True)
-            final_response = "Désolé, j'ai reçu une réponse inattendue de la part d'Opty-bot."
-        
+        analysis_context = _analysis_context(request.args.get('analysis_id'))
+        if _use_deepseek():
+            release_db_connection()
+            with metered_ai_usage() as ai_usage:
+                final_response = get_chat_response(user_message, analysis_context, lang_code=get_locale())
+            record_ai_usage(current_user.id, ai_usage)
+            db.session.commit()
+        else:
+            final_response = _webhook_reply(user_message, analysis_context)
         return jsonify({'response': final_response})
     
     except Exception as e:
@@ -110,3 +138,44 @@ def chatbot_route():
             'error': 'An error occurred processing your request',
             'response': "Je suis désolé, une erreur interne s'est produite. Veuillez réessayer plus tard."
         }), 500
+
+@chatbot_bp.route('/chatbot/stream', methods=['POST'])
+@login_required
+@requires_subscription(['premium', 'enterprise'], is_api_route=True)
+def chatbot_stream_route():
+    """
+    Same as /chatbot, delivered as Server-Sent Events: 'text' events ({'delta'}) as the reply is written,
+    then 'done' ({'response'}) with the whole reply. The webhook backend cannot stream: its reply comes
+    as a single 'done' event.
+    """
+    data = request.get_json(silent=True)
+    if not data or 'message' not in data:
+        logger.warning("Chatbot: Missing message parameter in request.")
+        return jsonify({'error': 'Missing message parameter'}), 400
+
+    user_message = data['message']
+    analysis_id = request.args.get('analysis_id')
+    lang_code = get_locale()
+    user_id = current_user.id
+
+    def generate():
+        yield sse_comment('chatbot')  # Headers and first bytes go out before the reply starts
+        try:
+            analysis_context = _analysis_context(analysis_id)
+            if not _use_deepseek():
+                yield sse_event('done', {'response': _webhook_reply(user_message, analysis_context)})
+                return
+            release_db_connection()
+            chunks = []
+            with metered_ai_usage() as ai_usage:
+                for delta in stream_chat_response(user_message, analysis_context, lang_code=lang_code):
+                    chunks.append(delta)
+                    yield sse_event('text', {'delta': delta})
+            record_ai_usage(user_id, ai_usage)
+            db.session.commit()
+            yield sse_event('done', {'response': ''.join(chunks)})
+        except Exception as e:
+            logger.error(f"Error in chatbot_stream_route: {str(e)}", exc_info=True)
+            yield sse_event('error', {'response': "Je suis désolé, une erreur interne s'est produite. Veuillez réessayer plus tard."})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
@@ -0,0 +1,47 @@
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import trafilatura
+except ImportError as e:  # e.g. lxml without lxml_html_clean: the analyzers fall back to the <p> text
+    trafilatura = None
+    logger.warning(f"trafilatura unavailable, content analysis uses the raw paragraph text: {str(e)}")
+
+# Lignes de texte principal (trafilatura met un bloc par ligne) et phrases, pour la lisibilité
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?…])\s+|\n+')
+READABILITY_MIN_WORDS = 50  # Below this, the average sentence length says nothing
+# Taille max du HTML passé à trafilatura (arbre lxml complet) : au-delà, seul le début de la page est extrait.
+# La borne ne dépend que de la page, pas du backend de parsing, pour que les scores restent identiques
+CONTENT_EXTRACTION_MAX_CHARS = int(os.environ.get('CONTENT_EXTRACTION_MAX_CHARS', 1024 * 1024))
+
+def extract_main_text(html):
+    """
+    Main content of a page (trafilatura): article body, lists and tables, without navigation,
+    footers, sidebars or cookie banners. Blocks are separated by newlines.
+
+    Runs once per fetched page, whatever the parser backend; the result is stored in PageFeatures.main_text
+    and cached with the page. Only the first CONTENT_EXTRACTION_MAX_CHARS characters of the HTML are read.
+
+    Returns:
+    - The text, or None if trafilatura is unavailable or finds no main content
+    """
+    if trafilatura is None or not html:
+        return None
+    try:
+        text = trafilatura.extract(html[:CONTENT_EXTRACTION_MAX_CHARS], include_comments=False, include_tables=True, favor_recall=True)
+    except Exception as e:
+        logger.warning(f"trafilatura could not extract the page content: {str(e)}")
+        return None
+    return text if text and text.strip() else None
+
+def average_sentence_length(text):
+    """Average number of words per sentence, or None if the text is too short to tell."""
+    sentences = [sentence.split() for sentence in _SENTENCE_END_RE.split(text)]
+    sentences = [words for words in sentences if words]
+    words = sum(len(sentence) for sentence in sentences)
+    if words < READABILITY_MIN_WORDS:
+        return None
+    return words / len(sentences)
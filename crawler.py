@@ -0,0 +1,479 @@
+import os
+import json
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+from urllib.parse import urljoin, urlsplit
+import requests
+from flask import current_app
+from sqlalchemy import insert, func
+from app import db
+from models import Crawl, CrawlPage
+from jobs import JOB_EXECUTOR, JOB_STALE_AFTER
+from batches import _host_limiter
+from fetcher import get_session, FETCH_TIMEOUT
+from page_cache import normalize_url
+from site_files import site_origin, fetch_robots, iter_sitemap_urls
+from metrics import stage_timer
+from ai_integration import metered_ai_usage
+from usage import record_ai_usage
+
+logger = logging.getLogger(__name__)
+
+# Crawl d'un site (enterprise) : frontière persistée en base (lignes CrawlPage 'queued'), parcours en
+# largeur, robots.txt respecté, pages dédupliquées par URL normalisée et par hash de contenu.
+CRAWL_MAX_PAGES = int(os.environ.get('CRAWL_MAX_PAGES', 500))  # Upper bound of the page budget a user may ask for
+CRAWL_MAX_DEPTH = int(os.environ.get('CRAWL_MAX_DEPTH', 5))
+CRAWL_CONCURRENCY = int(os.environ.get('CRAWL_CONCURRENCY', 4))  # Pages in flight per crawl (the per-host limit still applies)
+CRAWL_RUNNERS = int(os.environ.get('CRAWL_RUNNERS', 2))  # Thread mode: crawls run at once per process (the others wait queued)
+DEFAULT_CRAWL_PAGES = 100
+DEFAULT_CRAWL_DEPTH = 3
+
+# 'deep' would make one DeepSeek call per crawled page
+CRAWL_ANALYSIS_TYPES = ['meta', 'partial', 'complete']
+# Links to these files are not followed (the analyzers only make sense on HTML)
+SKIPPED_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico', '.css', '.js', '.json', '.xml',
+                      '.zip', '.gz', '.rar', '.mp3', '.mp4', '.avi', '.mov', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx')
+# Page states that do not use the page budget
+UNBUDGETED_PAGE_STATES = ['blocked']
+
+class CrawlInputError(ValueError):
+    """Invalid crawl request (bad seed URL, budget out of bounds...)."""
+    pass
+
+class CrawlError(Exception):
+    """The crawl cannot go on (e.g. robots.txt unreachable)."""
+    pass
+
+def _bounded_int(data, key, default, maximum):
+    value = data.get(key, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise CrawlInputError(f"'{key}' must be an integer.")
+    if value < 0 or (key == 'max_pages' and value < 1) or value > maximum:
+        raise CrawlInputError(f"'{key}' must be between {1 if key == 'max_pages' else 0} and {maximum}.")
+    return value
+
+def parse_crawl_request(data):
+    """
+    Validate a crawl request: {"url", "analysis_type", "max_pages", "max_depth"}.
+
+    Returns:
+    - (seed_url, analysis_type, max_pages, max_depth)
+
+    Raises CrawlInputError.
+    """
+    data = data or {}
+    url = str(data.get('url') or '').strip()
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    parts = urlsplit(url)
+    if not parts.hostname or len(url) > 255:
+        raise CrawlInputError('A valid http(s) seed URL (255 characters max) is required.')
+    analysis_type = data.get('analysis_type', 'partial')
+    if analysis_type not in CRAWL_ANALYSIS_TYPES:
+        raise CrawlInputError(f"Invalid analysis type for a crawl: {analysis_type} (expected one of {', '.join(CRAWL_ANALYSIS_TYPES)}).")
+    max_pages = _bounded_int(data, 'max_pages', min(DEFAULT_CRAWL_PAGES, CRAWL_MAX_PAGES), CRAWL_MAX_PAGES)
+    max_depth = _bounded_int(data, 'max_depth', min(DEFAULT_CRAWL_DEPTH, CRAWL_MAX_DEPTH), CRAWL_MAX_DEPTH)
+    return url, analysis_type, max_pages, max_depth
+
+def create_crawl(user_id, seed_url, analysis_type, max_pages, max_depth):
+    """
+    Create a crawl and start its runner (robots.txt, sitemap and seed are read by the runner).
+
+    Returns:
+    - The Crawl (committed, status 'queued')
+    """
+    crawl = Crawl(user_id=user_id, seed_url=seed_url, analysis_type=analysis_type,
+                  max_pages=max_pages, max_depth=max_depth, status='queued')
+    db.session.add(crawl)
+    db.session.commit()
+    logger.info(f"Queued crawl {crawl.id} of {seed_url} ({max_pages} pages, depth {max_depth}, type: {analysis_type}) for user {user_id}")
+    start_crawl_runner(crawl.id)
+    return crawl
+
+_runner_slots = threading.BoundedSemaphore(CRAWL_RUNNERS)
+
+def start_crawl_runner(crawl_id=None):
+    """
+    In thread mode, run a queued crawl in a background thread (the external worker claims it otherwise),
+    then the other queued crawls. At most CRAWL_RUNNERS threads per process: without a free slot the
+    crawl stays queued until a runner, or the sweep of jobs.resume_unfinished_work, takes it.
+
+    Returns:
+    - True if a runner was started
+    """
+    if JOB_EXECUTOR != 'thread':
+        return False
+    if not _runner_slots.acquire(blocking=False):
+        logger.info(f"All {CRAWL_RUNNERS} crawl runners of this process are busy: crawl {crawl_id} waits in the queue")
+        return False
+    app = current_app._get_current_object()
+    threading.Thread(target=_crawl_runner, args=(app, crawl_id), daemon=True,
+                     name=f'site-crawl-{crawl_id or "next"}').start()
+    return True
+
+def _crawl_runner(app, crawl_id):
+    try:
+        with app.app_context():
+            try:
+                claimed = crawl_id is None
+                if claimed:
+                    crawl_id = claim_next_crawl()
+                while crawl_id is not None:
+                    run_crawl(crawl_id, claimed=claimed)  # Records its own failures
+                    crawl_id, claimed = claim_next_crawl(), True
+            finally:
+                db.session.remove()
+    finally:
+        _runner_slots.release()
+
+def _claim_crawl(crawl_id):
+    """Atomically mark a queued crawl as running. Returns False if another runner already took it."""
+    now = datetime.utcnow()
+    claimed = Crawl.query.filter(
+        Crawl.id == crawl_id,
+        Crawl.status == 'queued'
+    ).update({'status': 'running', 'started_at': now, 'updated_at': now}, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+def _crawlable_link(base_url, href, host):
+    """Normalized absolute URL of a link if the crawler should follow it, else None."""
+    href = href.strip()
+    if not href or href.startswith(('#', 'mailto:', 'tel:', 'javascript:', 'data:')):
+        return None
+    url = urljoin(base_url, href)
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or (parts.hostname or '').lower() != host:
+        return None
+    if parts.path.lower().endswith(SKIPPED_EXTENSIONS):
+        return None
+    url = normalize_url(url)
+    return url if len(url) <= 2048 else None
+
+class _Frontier:
+    """
+    In-memory view of a crawl's pages, rebuilt from the database when a crawl is resumed:
+    the set of known URLs and the content hashes of the pages already analyzed.
+    New pages are bulk-inserted; the queued rows are the persistent frontier.
+    """
+
+    def __init__(self, crawl, robots):
+        self.crawl = crawl
+        self.robots = robots
+        rows = db.session.execute(
+            db.select(CrawlPage.url, CrawlPage.status, CrawlPage.content_hash).where(CrawlPage.crawl_id == crawl.id)
+        ).all()
+        self.seen = {url for url, _, _ in rows}
+        self.hashes = {content_hash: url for url, status, content_hash in rows if status == 'done' and content_hash}
+        blocked = sum(1 for _, status, _ in rows if status in UNBUDGETED_PAGE_STATES)
+        self.budget = crawl.max_pages - (len(rows) - blocked)
+        self.blocked_left = crawl.max_pages - blocked  # Blocked URLs recorded for the report, at most max_pages
+
+    def add(self, urls, depth, source):
+        """Record new URLs (already normalized) at a depth; returns the number queued. Caller commits."""
+        rows = []
+        for url in urls:
+            if url in self.seen:
+                continue
+            if not self.robots.can_fetch(url):
+                if self.blocked_left <= 0:
+                    continue
+                self.blocked_left -= 1
+                status = 'blocked'
+            elif self.budget > 0:
+                self.budget -= 1
+                status = 'queued'
+            else:
+                continue
+            self.seen.add(url)
+            rows.append({'crawl_id': self.crawl.id, 'url': url, 'depth': depth, 'source': source, 'status': status})
+        if rows:
+            db.session.execute(insert(CrawlPage), rows)
+        return sum(1 for row in rows if row['status'] == 'queued')
+
+def _seed(frontier, crawl, host):
+    """Queue the seed URL, then the same-host URLs of the sitemaps (declared in robots.txt, or /sitemap.xml)."""
+    frontier.add([normalize_url(crawl.seed_url)], 0, 'seed')
+    if crawl.max_depth >= 1:
+        sitemaps = frontier.robots.sitemaps or [site_origin(crawl.seed_url) + '/sitemap.xml']
+        queued = 0
+        for sitemap_url in sitemaps:
+            batch = []
+            for loc in iter_sitemap_urls(sitemap_url):
+                url = _crawlable_link(sitemap_url, loc, host)
+                if url:
+                    batch.append(url)
+                if len(batch) >= 100:
+                    queued += frontier.add(batch, 1, 'sitemap')
+                    batch = []
+                if frontier.budget <= 0:
+                    break
+            queued += frontier.add(batch, 1, 'sitemap')
+            if frontier.budget <= 0:
+                break
+        logger.info(f"Crawl {crawl.id}: {queued} URLs queued from {len(sitemaps)} sitemap(s)")
+    db.session.commit()
+
+def _resolve_seed(crawl):
+    """
+    Follow the redirects of the seed URL before the first run (example.com -> https://www.example.com/):
+    the crawl stays on the host the site actually serves its pages from.
+    """
+    try:
+        response = get_session().get(crawl.seed_url, timeout=FETCH_TIMEOUT, allow_redirects=True, stream=True)
+        response.close()
+    except requests.exceptions.RequestException as e:
+        logger.info(f"Crawl {crawl.id}: could not resolve seed {crawl.seed_url}: {str(e)}")
+        return
+    if response.url != crawl.seed_url and len(response.url) <= 255:
+        logger.info(f"Crawl {crawl.id}: seed {crawl.seed_url} redirects to {response.url}")
+        crawl.seed_url = response.url
+        db.session.commit()
+
+def _issues(results):
+    """Components in warning or error, as 'category.component'."""
+    return [f"{category}.{component}"
+            for category, items in results['details'].items() if isinstance(items, dict)
+            for component, item in items.items()
+            if isinstance(item, dict) and item.get('status') in ('warning', 'error')]
+
+def _record_page(frontier, page, host, results=None, error=None):
+    """Store the outcome of one page and queue its links. Caller commits."""
+    crawl = frontier.crawl
+    page.fetched_at = datetime.utcnow()
+    if error is not None:
+        page.status = 'failed'
+        page.error = str(error)
+        response = getattr(error.__context__, 'response', None)  # requests HTTPError wrapped in ContentFetchError
+        page.status_code = response.status_code if response is not None else None
+        return
+
+    fetch = results['fetch']
+    page.status_code = fetch['status_code']
+    page.content_hash = fetch.get('content_hash')
+    final_url = normalize_url(fetch['url'])
+    content_type = fetch.get('content_type') or ''
+    if (urlsplit(final_url).hostname or '') != host:
+        page.status, page.duplicate_of, page.error = 'skipped', final_url, 'Redirects to another site.'
+        return
+    if final_url != page.url:
+        if final_url in frontier.seen:
+            page.status, page.duplicate_of = 'duplicate', final_url  # Redirects to a page of the crawl
+            return
+        frontier.seen.add(final_url)
+    if content_type and 'html' not in content_type.lower():
+        page.status, page.error = 'skipped', f"Not an HTML page ({content_type})."
+        return
+    if page.content_hash and page.content_hash in frontier.hashes:
+        page.status, page.duplicate_of = 'duplicate', frontier.hashes[page.content_hash]
+        return
+    if page.content_hash:
+        frontier.hashes[page.content_hash] = page.url
+
+    page.status = 'done'
+    page.meta_score = results['scores'].get('meta')
+    page.content_score = results['scores'].get('content')
+    page.technical_score = results['scores'].get('technical')
+    page.overall_score = results['scores'].get('overall')
+    title = results['details'].get('meta', {}).get('title', {}).get('value')
+    page.title = title[:255] if title else None
+    page.issues = json.dumps(_issues(results))
+
+    if page.depth < crawl.max_depth and frontier.budget > 0:
+        links = [_crawlable_link(fetch['url'], href, host) for href in results.get('links', [])]
+        frontier.add([link for link in links if link], page.depth + 1, 'link')
+
+def run_crawl(crawl_id, claimed=False):
+    """Crawl a site breadth-first, CRAWL_CONCURRENCY pages at a time, until the frontier is empty."""
+    if not claimed and not _claim_crawl(crawl_id):
+        logger.info(f"Crawl {crawl_id} already claimed by another runner, skipping.")
+        return
+    crawl = db.session.get(Crawl, crawl_id)
+    try:
+        _crawl(crawl)
+        crawl.status = 'done'
+        crawl.finished_at = datetime.utcnow()
+        db.session.commit()
+        logger.info(f"Crawl {crawl_id} done.")
+    except Exception as e:
+        logger.error(f"Crawl {crawl_id} failed: {str(e)}", exc_info=True)
+        db.session.rollback()
+        crawl = db.session.get(Crawl, crawl_id)
+        crawl.status = 'failed'
+        crawl.error = str(e)
+        crawl.finished_at = datetime.utcnow()
+        db.session.commit()
+
+def _crawl(crawl):
+    # Imported here like in jobs.run_job: the web process does not need the analyzer to enqueue
+    from seo_analyzer import analyze_url
+
+    if CrawlPage.query.filter_by(crawl_id=crawl.id).first() is None:
+        _resolve_seed(crawl)
+    host = urlsplit(crawl.seed_url).hostname.lower()
+    robots = fetch_robots(site_origin(crawl.seed_url))
+    if robots.status == 'unreachable':
+        raise CrawlError(f"robots.txt of {host} is unreachable ({robots.error}): the site cannot be crawled.")
+    delay = robots.crawl_delay()
+
+    # Reprise : les pages d'un runner mort repassent dans la frontière
+    resumed = CrawlPage.query.filter_by(crawl_id=crawl.id, status='running') \
+        .update({'status': 'queued'}, synchronize_session=False)
+    frontier = _Frontier(crawl, robots)
+    if not frontier.seen:
+        _seed(frontier, crawl, host)
+    else:
+        db.session.commit()
+        logger.info(f"Resuming crawl {crawl.id}: {len(frontier.seen)} known URLs, {resumed} pages put back in the frontier")
+
+    analysis_type = crawl.analysis_type
+
+    def analyze(url):
+        # No database access in the pool threads: only fetch, parse and score (and meter the DeepSeek usage)
+        _host_limiter.acquire(host, delay)
+        try:
+            with metered_ai_usage() as ai_usage:
+                return analyze_url(url, analysis_type), ai_usage
+        finally:
+            _host_limiter.release(host)
+
+    in_flight = {}  # future -> CrawlPage id
+    with ThreadPoolExecutor(max_workers=CRAWL_CONCURRENCY, thread_name_prefix=f'crawl-{crawl.id}') as pool:
+        while True:
+            slots = CRAWL_CONCURRENCY - len(in_flight)
+            if slots > 0:
+                # Breadth-first: shallowest pages first
+                pages = CrawlPage.query.filter_by(crawl_id=crawl.id, status='queued') \
+                    .order_by(CrawlPage.depth, CrawlPage.id).limit(slots).all()
+                for page in pages:
+                    page.status = 'running'
+                db.session.commit()
+                for page in pages:
+                    in_flight[pool.submit(analyze, page.url)] = page.id
+            if not in_flight:
+                break
+
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            with stage_timer('db_persist'):
+                for future in finished:
+                    page = db.session.get(CrawlPage, in_flight.pop(future))
+                    try:
+                        results, ai_usage = future.result()
+                        _record_page(frontier, page, host, results=results)
+                        record_ai_usage(crawl.user_id, ai_usage)
+                    except Exception as e:
+                        _record_page(frontier, page, host, error=e)
+                crawl.updated_at = datetime.utcnow()
+                db.session.commit()
+
+def claim_next_crawl():
+    """Claim the oldest queued crawl for an external worker. Returns its ID or None."""
+    query = Crawl.query.filter(Crawl.status == 'queued').order_by(Crawl.created_at)
+    if db.engine.dialect.name == 'postgresql':
+        query = query.with_for_update(skip_locked=True)
+    crawl = query.first()
+    if not crawl:
+        db.session.rollback()
+        return None
+    crawl.status = 'running'
+    crawl.started_at = crawl.updated_at = datetime.utcnow()
+    db.session.commit()
+    return crawl.id
+
+def is_stale(crawl):
+    """True if a running crawl has not processed a page for JOB_STALE_AFTER seconds (its runner died)."""
+    last_activity = crawl.updated_at or crawl.started_at
+    return crawl.status == 'running' and last_activity is not None \
+        and last_activity < datetime.utcnow() - timedelta(seconds=JOB_STALE_AFTER)
+
+def requeue_stale_crawls():
+    """Put back running crawls whose runner died; the next runner resumes them from their frontier."""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_AFTER)
+    requeued = Crawl.query.filter(
+        Crawl.status == 'running',
+        func.coalesce(Crawl.updated_at, Crawl.started_at) < cutoff
+    ).update({'status': 'queued'}, synchronize_session=False)
+    db.session.commit()
+    if requeued:
+        logger.warning(f"Requeued {requeued} stale crawls.")
+    return requeued
+
+def _average(value):
+    return round(float(value), 1) if value is not None else None
+
+def crawl_to_dict(crawl, include_pages=True):
+    """Progress of a crawl and its site-level report; every crawled page too unless include_pages is False."""
+    counts = dict(db.session.execute(
+        db.select(CrawlPage.status, func.count()).where(CrawlPage.crawl_id == crawl.id).group_by(CrawlPage.status)
+    ).all())
+    budgeted = sum(count for status, count in counts.items() if status not in UNBUDGETED_PAGE_STATES)
+    pending = counts.get('queued', 0) + counts.get('running', 0)
+    averages = db.session.execute(
+        db.select(func.avg(CrawlPage.overall_score), func.avg(CrawlPage.meta_score),
+                  func.avg(CrawlPage.content_score), func.avg(CrawlPage.technical_score))
+        .where(CrawlPage.crawl_id == crawl.id, CrawlPage.status == 'done')
+    ).one()
+
+    analyzed = counts.get('done', 0)
+    issue_counts = Counter()
+    for issues in db.session.scalars(db.select(CrawlPage.issues).where(CrawlPage.crawl_id == crawl.id, CrawlPage.status == 'done')):
+        issue_counts.update(json.loads(issues or '[]'))
+    duplicate_titles = db.session.execute(
+        db.select(CrawlPage.title, func.count()).where(CrawlPage.crawl_id == crawl.id, CrawlPage.status == 'done',
+                                                       CrawlPage.title.isnot(None))
+        .group_by(CrawlPage.title).having(func.count() > 1).order_by(func.count().desc()).limit(20)
+    ).all()
+    broken = db.session.execute(
+        db.select(CrawlPage.url, CrawlPage.status_code, CrawlPage.error)
+        .where(CrawlPage.crawl_id == crawl.id, CrawlPage.status == 'failed').order_by(CrawlPage.id).limit(100)
+    ).all()
+    worst = db.session.execute(
+        db.select(CrawlPage.url, CrawlPage.overall_score)
+        .where(CrawlPage.crawl_id == crawl.id, CrawlPage.status == 'done')
+        .order_by(CrawlPage.overall_score, CrawlPage.id).limit(10)
+    ).all()
+
+    result = {
+        'id': crawl.id,
+        'seed_url': crawl.seed_url,
+        'analysis_type': crawl.analysis_type,
+        'status': crawl.status,
+        'error': crawl.error,
+        'max_pages': crawl.max_pages,
+        'max_depth': crawl.max_depth,
+        'progress': {
+            'queued': counts.get('queued', 0),
+            'running': counts.get('running', 0),
+            'done': analyzed,
+            'failed': counts.get('failed', 0),
+            'duplicate': counts.get('duplicate', 0),
+            'skipped': counts.get('skipped', 0),
+            'blocked': counts.get('blocked', 0),
+            'percent': round(100 * (budgeted - pending) / budgeted, 1) if budgeted else 0.0
+        },
+        'report': {
+            'pages_analyzed': analyzed,
+            'average_scores': {'overall': _average(averages[0]), 'meta': _average(averages[1]),
+                               'content': _average(averages[2]), 'technical': _average(averages[3])},
+            'issues': [{'issue': issue, 'pages': count, 'percent': round(100 * count / analyzed, 1)}
+                       for issue, count in issue_counts.most_common()],
+            'duplicate_titles': [{'title': title, 'pages': count} for title, count in duplicate_titles],
+            'broken_pages': [{'url': url, 'status_code': status_code, 'error': error} for url, status_code, error in broken],
+            'worst_pages': [{'url': url, 'overall_score': score} for url, score in worst]
+        },
+        'created_at': crawl.created_at.isoformat() if crawl.created_at else None,
+        'finished_at': crawl.finished_at.isoformat() if crawl.finished_at else None
+    }
+    if include_pages:
+        result['pages'] = [{
+            'url': page.url, 'depth': page.depth, 'source': page.source, 'status': page.status,
+            'status_code': page.status_code, 'title': page.title, 'duplicate_of': page.duplicate_of, 'error': page.error,
+            'scores': {'overall': page.overall_score, 'meta': page.meta_score, 'content': page.content_score,
+                       'technical': page.technical_score} if page.status == 'done' else None
+        } for page in crawl.pages.order_by(CrawlPage.depth, CrawlPage.id)]
+    return result
@@ -166,7 +166,7 @@ def check_database_models():
             with open('models.py', 'r', encoding='utf-8') as f:
                 content = f.read()
             
-            required_models = ['User', 'Analysis', 'AnalysisDetail', 'Subscription', 'PaymentHistory']
+            required_models = ['User', 'Analysis', 'Subscription', 'PaymentHistory']
             
             for model in required_models:
                 if f"class {model}" in content:
@@ -0,0 +1,155 @@
+import os
+import time
+import logging
+from flask import g, session, has_request_context
+from flask_login import current_user
+from usage import monthly_analyses
+
+logger = logging.getLogger(__name__)
+
+# Droits d'un utilisateur (plan effectif, analyses du mois, types d'analyse autorisés) résolus une fois par requête
+# et gardés dans g. Le plan est aussi gardé ENTITLEMENTS_SESSION_TTL secondes dans la session (cookie signé), ce
+# qui évite la requête sur Subscription à chaque page ; les webhooks Stripe l'invalident (User.entitlements_version).
+ENTITLEMENTS_SESSION_TTL = int(os.environ.get('ENTITLEMENTS_SESSION_TTL', 60))
+SESSION_KEY = 'entitlements'
+
+# Monthly analyses per plan (plans not listed are unlimited)
+ANALYSIS_LIMITS = {
+    'free': 5,
+    'basic': 25,
+}
+# Plans allowed to run each analysis type ('deep' is the advanced semantic AI analysis)
+ANALYSIS_TYPE_PERMISSIONS = {
+    'meta': ['free', 'basic', 'premium', 'enterprise'],
+    'partial': ['basic', 'premium', 'enterprise'],
+    'complete': ['premium', 'enterprise'],
+    'deep': ['enterprise'],
+}
+
+def resolve_plan(user):
+    """
+    Effective plan of a user: the plan of an active Subscription, else User.subscription_status.
+
+    Returns:
+    - (plan or None, active, description of an inactive Subscription or None)
+    """
+    subscription = getattr(user, 'subscription', None)
+    if subscription and subscription.status == 'active':
+        return subscription.plan, True, None
+    inactive = f"Plan: {subscription.plan}, Status: {subscription.status}" if subscription else None
+    if getattr(user, 'subscription_status', None):
+        # subscription_status is kept in sync by the Stripe webhooks: a paid plan there is honoured
+        return user.subscription_status, True, inactive
+    return None, False, inactive
+
+class Entitlements:
+    """What a user may do, resolved once per request (see get_entitlements)."""
+
+    def __init__(self, user_id, is_admin, plan, active, inactive_subscription=None):
+        self.user_id = user_id
+        self.is_admin = is_admin
+        self.plan = plan
+        self.active = active
+        self.inactive_subscription = inactive_subscription
+        self._monthly_usage = None
+
+    @property
+    def monthly_limit(self):
+        """Analyses allowed per month, or None if unlimited."""
+        return ANALYSIS_LIMITS.get(self.plan)
+
+    @property
+    def monthly_usage(self):
+        """Analyses counted this month (usage_counter primary-key read, on first use in the request)."""
+        if self._monthly_usage is None:
+            self._monthly_usage = monthly_analyses(self.user_id)
+        return self._monthly_usage
+
+    @property
+    def allowed_analysis_types(self):
+        return [analysis_type for analysis_type, plans in ANALYSIS_TYPE_PERMISSIONS.items() if self.plan in plans]
+
+    def has_plan(self, plans):
+        """True if the user may use a feature of these plans (admins always may)."""
+        if self.is_admin:
+            return True
+        if self.active:
+            return self.plan in plans
+        # No plan at all counts as 'free'
+        return 'free' in plans and not self.plan
+
+    def denial_message(self, plans):
+        required = ", ".join(plans)
+        if self.active:
+            return f'This feature requires a "{required}" subscription. Your current plan is "{self.plan}".'
+        if self.inactive_subscription:
+            return f'Access denied. This feature requires a "{required}" subscription. Your subscription ({self.inactive_subscription}) is not sufficient or not active.'
+        return f'Access denied. This feature requires a "{required}" subscription. No active or known subscription found.'
+
+    def check_analysis(self, analysis_type):
+        """
+        Whether the user may start an analysis of this type now. The quota is checked again, under lock,
+        when the analysis is created (enqueue_analysis with monthly_limit).
+
+        Returns:
+        - None if allowed, else (error message, reason): reason is 'invalid_type', 'quota' or 'plan'
+        """
+        limit = self.monthly_limit
+        if limit is not None and self.monthly_usage >= limit:
+            return f'Monthly analysis limit of {limit} reached for your {self.plan} plan. Please upgrade your plan or wait until next month.', 'quota'
+        allowed_plans = ANALYSIS_TYPE_PERMISSIONS.get(analysis_type)
+        if allowed_plans is None:
+            return f"Invalid analysis type requested: {analysis_type}.", 'invalid_type'
+        if self.plan not in allowed_plans:
+            return f"The requested analysis type '{analysis_type}' is not available for your current plan ('{self.plan}'). Please upgrade your plan.", 'plan'
+        return None
+
+    def to_dict(self):
+        return {
+            'plan': self.plan, 'active': self.active, 'is_admin': self.is_admin,
+            'monthly_limit': self.monthly_limit, 'monthly_usage': self.monthly_usage,
+            'allowed_analysis_types': self.allowed_analysis_types
+        }
+
+def _from_session(user):
+    claim = session.get(SESSION_KEY)
+    if (not claim or claim.get('user_id') != user.id or claim.get('version') != (user.entitlements_version or 0)
+            or claim.get('expires', 0) < time.time()):
+        return None
+    return Entitlements(user.id, bool(user.is_admin), claim['plan'], claim['active'], claim.get('inactive'))
+
+def _store_in_session(user, entitlements):
+    session[SESSION_KEY] = {
+        'user_id': user.id, 'version': user.entitlements_version or 0, 'expires': time.time() + ENTITLEMENTS_SESSION_TTL,
+        'plan': entitlements.plan, 'active': entitlements.active, 'inactive': entitlements.inactive_subscription
+    }
+
+def get_entitlements():
+    """
+    Entitlements of the current user, cached for the request in g and for ENTITLEMENTS_SESSION_TTL
+    seconds in the session.
+    """
+    user = current_user._get_current_object()
+    cached = g.get('entitlements')
+    if cached is not None and cached.user_id == user.id:
+        return cached
+    entitlements = _from_session(user)
+    if entitlements is None:
+        plan, active, inactive = resolve_plan(user)
+        entitlements = Entitlements(user.id, bool(user.is_admin), plan, active, inactive)
+        if ENTITLEMENTS_SESSION_TTL > 0:
+            _store_in_session(user, entitlements)
+    g.entitlements = entitlements
+    return entitlements
+
+def invalidate_entitlements(user):
+    """
+    Make the cached entitlements of a user stale everywhere (call when their plan or subscription changes,
+    e.g. from a Stripe webhook; the caller commits).
+    """
+    user.entitlements_version = (user.entitlements_version or 0) + 1
+    if has_request_context():
+        g.pop('entitlements', None)
+        if session.get(SESSION_KEY, {}).get('user_id') == user.id:
+            session.pop(SESSION_KEY, None)
+    logger.debug(f"Entitlements of user {user.id} invalidated (version {user.entitlements_version})")
@@ -24,7 +24,59 @@ OPTIONAL_ENV_VARS = {
     'STRIPE_ENTERPRISE_PRICE_ID': 'Stripe price ID for enterprise plan',
     
     'OPTY_BOT_WEBHOOK_URL': 'URL for the external Opty-bot webhook (if used instead of internal DeepSeek for chatbot)',
-    'OPTY_BOT_WEBHOOK_AUTH_TOKEN': 'Authentication token for the Opty-bot webhook (if required by the webhook)'
+    'OPTY_BOT_WEBHOOK_AUTH_TOKEN': 'Authentication token for the Opty-bot webhook (if required by the webhook)',
+    'OPTY_BOT_BACKEND': 'Chatbot answers: webhook (Opty-bot webhook, default) or deepseek (DeepSeek, streamed)',
+    
+    'SERVER_MODE': 'gunicorn worker type: "sync" (default) or "gevent" (cooperative, many concurrent requests per worker)',
+    'WEB_CONCURRENCY': 'Number of gunicorn worker processes (default: 2)',
+    'WORKER_CONNECTIONS': 'Maximum concurrent requests per gevent worker (default: 500)',
+    'GUNICORN_TIMEOUT': 'Seconds before a silent gunicorn worker is restarted (default: 120)',
+    'DB_POOL_SIZE': 'SQLAlchemy connection pool size per process (default: 5, 20 in gevent mode)',
+    'DB_MAX_OVERFLOW': 'Extra connections allowed above DB_POOL_SIZE (default: 10)',
+    'JOB_EXECUTOR': 'Where analysis jobs run: "thread" (pool inside each web worker, default) or "external" (separate `python jobs.py` worker)',
+    'JOB_WORKERS': 'Number of concurrent analysis jobs per process (default: 4, 50 in gevent mode)',
+    'JOB_SWEEP_INTERVAL': 'Thread mode: seconds between two sweeps of each web worker for jobs, batches and crawls left unfinished by a dead worker (default: 60, 0 disables)',
+    'BATCH_MAX_URLS': 'Maximum number of URLs in one bulk analysis batch (default: 500)',
+    'BATCH_CONCURRENCY': 'Analyses of a batch running at once (default: 8)',
+    'BATCH_PER_HOST': 'Batch analyses running at once on one host, per process (default: 2)',
+    'BATCH_HOST_DELAY': 'Minimum seconds between two batch analyses started on one host (default: 1.0)',
+    'BATCH_RUNNERS': 'Thread mode: batches run at once per web worker, the others wait queued (default: 2)',
+    'CRAWL_MAX_PAGES': 'Largest page budget a site crawl may ask for (default: 500)',
+    'CRAWL_MAX_DEPTH': 'Largest link depth a site crawl may ask for (default: 5)',
+    'CRAWL_CONCURRENCY': 'Pages of a crawl analyzed at once (default: 4)',
+    'CRAWL_RUNNERS': 'Thread mode: crawls run at once per web worker, the others wait queued (default: 2)',
+    'CRAWLER_USER_AGENT': 'Name matched against robots.txt User-agent groups by the crawler (default: OptAIBot)',
+    'SITEMAP_MAX_BYTES': 'Maximum decompressed size read from one sitemap file (default: 52428800)',
+    'SITEMAP_MAX_URLS': 'Sitemap URLs remembered per site for the "page listed in sitemap" check (default: 50000)',
+    'SITE_FILES_TTL': 'Seconds the robots.txt and sitemaps of a site are reused between analyses (default: 3600)',
+    'SEMANTIC_PAGE_TOKENS': 'Estimated tokens above which a page is split into chunks for the semantic analysis (default: 1500)',
+    'SEMANTIC_REQUEST_TOKENS': 'Input token budget of one packed semantic analysis request (default: 6000)',
+    'SEMANTIC_MAX_CHUNKS': 'Chunks of a long page scored by the semantic analysis (default: 6)',
+    'SEMANTIC_BATCH_WINDOW': 'Seconds a semantic analysis request waits for concurrent pages to join it (default: 0.5)',
+    'TRANSLATIONS_AUTO_RELOAD': 'Reload translation catalogs when their files change (default: FLASK_DEBUG)',
+    'ANALYSIS_STATS_ROLLUP': 'Read dashboard and profile statistics from the analysis_rollup table (default: false, run `python analysis_stats.py rebuild` first)',
+    'ENTITLEMENTS_SESSION_TTL': 'Seconds the resolved subscription plan is kept in the session (default: 60, 0 to resolve it on every request)',
+    'DB_MIGRATE_ON_START': 'Apply the database migrations when gunicorn starts, before the workers (default: true; false if `alembic upgrade head` runs as a release step)',
+    'HEALTH_CACHE_TTL': 'Seconds the /health/ready dependency probe results are reused (default: 5)',
+    'HEALTH_PROBE_TIMEOUT': 'Timeout of each /health/ready dependency probe in seconds (default: 3)',
+    'METRICS_TOKEN': 'Bearer token required to scrape /metrics (default: none, endpoint open)',
+    'SERVER_TIMING_HEADER': 'Add a Server-Timing header with the stage durations to every response (default: false)',
+    'PROMETHEUS_MULTIPROC_DIR': 'Directory where each gunicorn worker writes its metrics (default: set by gunicorn.conf.py)',
+    'WORKER_METRICS_PORT': 'Port on which `python jobs.py` serves its Prometheus metrics (default: none)',
+    'SEO_PARSER_BACKEND': 'HTML parser used by the analyzer: "auto" (default), "html.parser", "lxml" or "stream"',
+    'SEO_STREAMING_THRESHOLD_BYTES': 'Page size above which "auto" switches to the streaming tokenizer (default: 1048576)',
+    'CONTENT_EXTRACTION_MAX_CHARS': 'Characters of HTML read by the main content extraction, whatever the parser backend (default: 1048576)',
+    'FETCH_TIMEOUT': 'Connect/read timeout in seconds when fetching analyzed pages (default: 20)',
+    'FETCH_MAX_BYTES': 'Maximum page body read per analysis, the rest is ignored (default: 5242880)',
+    'FETCH_POOL_PER_HOST': 'Maximum simultaneous keep-alive connections to one analyzed host (default: 4)',
+    'PAGE_CACHE_ENABLED': 'Cache fetched pages on disk and revalidate them with conditional GETs (default: true)',
+    'PAGE_CACHE_DIR': 'Directory of the page cache (default: <tmp>/optai-page-cache)',
+    'PAGE_CACHE_TTL': 'Seconds a cached page is kept without being revalidated (default: 604800)',
+    'PAGE_CACHE_MAX_BYTES': 'Maximum size of the page cache on disk, least recently used pages are evicted first (default: 268435456)',
+    'AI_CACHE_ENABLED': 'Memoize identical DeepSeek requests in a local SQLite cache (default: true)',
+    'AI_CACHE_PATH': 'SQLite file of the AI response cache (default: <tmp>/optai-ai-cache.sqlite3)',
+    'AI_CACHE_TTL': 'Seconds a cached AI response stays valid (default: 604800)',
+    'AI_CACHE_MAX_BYTES': 'Maximum size of the cached AI responses, least recently used first out (default: 67108864)'
 }
 
 def validate_environment():
@@ -59,6 +111,10 @@ def validate_environment():
                 logger.warning(f"  ⚠️  Format Warning: {var_name} does not start with 'postgresql://'.")
             elif var_name == 'DOMAIN' and not (value.startswith('http://') or value.startswith('https://')):
                  logger.warning(f"  ⚠️  Format Warning: {var_name} should start with http:// or https://.")
+            elif var_name == 'SERVER_MODE' and value.lower() not in ('sync', 'gevent'):
+                logger.warning(f"  ⚠️  Format Warning: {var_name} should be 'sync' or 'gevent'.")
+            elif var_name == 'OPTY_BOT_BACKEND' and value.lower() not in ('webhook', 'deepseek'):
+                logger.warning(f"  ⚠️  Format Warning: {var_name} should be 'webhook' or 'deepseek'.")
 
 
     # Check Optional Variables
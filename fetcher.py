@@ -0,0 +1,269 @@
+import os
+import re
+import time
+import codecs
+import socket
+import logging
+import threading
+from http.cookiejar import DefaultCookiePolicy
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NameResolutionError, NewConnectionError, ConnectTimeoutError
+from urllib3.util.connection import allowed_gai_family
+from charset_normalizer import from_bytes
+
+logger = logging.getLogger(__name__)
+
+FETCH_TIMEOUT = float(os.environ.get('FETCH_TIMEOUT', 20))
+FETCH_MAX_BYTES = int(os.environ.get('FETCH_MAX_BYTES', 5 * 1024 * 1024))  # Body cutoff, the rest of the page is ignored
+FETCH_POOL_HOSTS = int(os.environ.get('FETCH_POOL_HOSTS', 32))  # Hosts kept in the keep-alive pool
+FETCH_POOL_PER_HOST = int(os.environ.get('FETCH_POOL_PER_HOST', 4))  # Max simultaneous connections to one host
+FETCH_CHUNK_SIZE = 64 * 1024
+CHARSET_SNIFF_BYTES = 4096  # <meta charset> must appear early in the document
+CHARSET_DETECT_BYTES = 64 * 1024
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+_HEADER_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([^\s;"\']+)', re.IGNORECASE)
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([a-zA-Z0-9_.:-]+)', re.IGNORECASE)
+_BOMS = ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+# Connection setup times of the fetch running in the current thread (requests opens its
+# connections in the calling thread, so the pool's connection classes can report here)
+_local = threading.local()
+
+def _record_timing(name, seconds):
+    timings = getattr(_local, 'timings', None)
+    if timings is not None:
+        timings[name] += seconds * 1000
+
+def _count_new_connection():
+    if getattr(_local, 'timings', None) is not None:
+        _local.new_connections += 1
+
+class _TimedHTTPConnection(HTTPConnection):
+    """urllib3 connection that resolves the host itself to time DNS and TCP connect separately."""
+
+    def _new_conn(self):
+        started = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(self._dns_host, self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        resolved = time.perf_counter()
+        _record_timing('dns', resolved - started)
+
+        # Connect to the resolved addresses in order, like urllib3's create_connection
+        dns_host = self._dns_host
+        last_error = None
+        try:
+            for address in addresses:
+                self._dns_host = address[4][0]
+                try:
+                    sock = super()._new_conn()
+                    break
+                except (NewConnectionError, ConnectTimeoutError) as e:
+                    last_error = e
+            else:
+                raise last_error
+        finally:
+            self._dns_host = dns_host
+
+        _record_timing('connect', time.perf_counter() - resolved)
+        _count_new_connection()
+        self._setup_elapsed = time.perf_counter() - started
+        return sock
+
+class _TimedHTTPSConnection(HTTPSConnection, _TimedHTTPConnection):
+
+    def connect(self):
+        started = time.perf_counter()
+        self._setup_elapsed = 0
+        super().connect()
+        # Everything after the TCP connection is the TLS handshake (and certificate checks)
+        _record_timing('tls', time.perf_counter() - started - self._setup_elapsed)
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools use the timed connection classes."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool
+        }
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Return the process-wide keep-alive session, recreating it after a fork (gunicorn workers)."""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            session.headers.update(DEFAULT_HEADERS)
+            # Analyses of different customers share this session: never keep cookies between fetches
+            # (cookies set during a redirect chain still apply to that chain)
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            # pool_block: callers wait for a free connection instead of opening more than FETCH_POOL_PER_HOST
+            adapter = PooledHTTPAdapter(pool_connections=FETCH_POOL_HOSTS, pool_maxsize=FETCH_POOL_PER_HOST, pool_block=True)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+            _session_pid = os.getpid()
+            logger.info(f"Created fetch session (pid {_session_pid}, {FETCH_POOL_PER_HOST} connections per host)")
+        return _session
+
+class FetchResult:
+    """Body and metadata of a fetched page."""
+
+    def __init__(self, url, status_code, headers, content, encoding, encoding_source, truncated, timings):
+        self.url = url  # Final URL after redirects
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+        self.encoding_source = encoding_source  # header, bom, meta, detected or default
+        self.truncated = truncated  # True if the body was cut at max_bytes
+        self.timings = timings  # Milliseconds: dns, connect, tls, ttfb, download, total
+        self._text = None
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = self.content.decode(self.encoding or 'utf-8', errors='replace')
+        return self._text
+
+    @property
+    def size(self):
+        return len(self.content)
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'status_code': self.status_code,
+            'content_type': self.headers.get('Content-Type'),
+            'bytes': self.size,
+            'truncated': self.truncated,
+            'encoding': self.encoding,
+            'encoding_source': self.encoding_source,
+            'timings': self.timings
+        }
+
+def _valid_codec(name):
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+def detect_encoding(content, content_type):
+    """
+    Pick the charset to decode a page with.
+
+    The Content-Type header wins; only when it has no (valid) charset do we look at a BOM,
+    a <meta charset> near the top of the document, then statistical detection.
+
+    Returns:
+    - (encoding, source)
+    """
+    match = _HEADER_CHARSET_RE.search(content_type or '')
+    if match and _valid_codec(match.group(1)):
+        return match.group(1), 'header'
+
+    for bom, encoding in _BOMS:
+        if content.startswith(bom):
+            return encoding, 'bom'
+
+    match = _META_CHARSET_RE.search(content[:CHARSET_SNIFF_BYTES])
+    if match:
+        encoding = match.group(1).decode('ascii')
+        if _valid_codec(encoding):
+            return encoding, 'meta'
+
+    best = from_bytes(content[:CHARSET_DETECT_BYTES]).best()
+    if best is not None:
+        return best.encoding, 'detected'
+    return 'utf-8', 'default'
+
+def fetch_page(url, timeout=None, max_bytes=None, headers=None):
+    """
+    Fetch a page through the pooled session, streaming the body up to max_bytes.
+
+    Parameters:
+    - url: URL to fetch (redirects are followed)
+    - timeout: Connect/read timeout in seconds (default: FETCH_TIMEOUT)
+    - max_bytes: Body cutoff in bytes (default: FETCH_MAX_BYTES)
+    - headers: Extra request headers (e.g. If-None-Match / If-Modified-Since from the page cache)
+
+    Returns:
+    - FetchResult (status_code 304 with an empty body if a conditional request matched)
+
+    Raises requests exceptions (including HTTPError for 4xx/5xx statuses) like requests.get.
+    """
+    timeout = timeout or FETCH_TIMEOUT
+    max_bytes = max_bytes or FETCH_MAX_BYTES
+    _local.timings = {'dns': 0.0, 'connect': 0.0, 'tls': 0.0}
+    _local.new_connections = 0
+    started = time.perf_counter()
+    try:
+        response = get_session().get(url, headers=headers, timeout=timeout, allow_redirects=True, stream=True)
+        headers_received = time.perf_counter()
+        try:
+            response.raise_for_status()
+
+            declared_length = response.headers.get('Content-Length')
+            if declared_length and declared_length.isdigit() and int(declared_length) > max_bytes:
+                logger.warning(f"{url} declares {declared_length} bytes, only the first {max_bytes} will be analyzed.")
+
+            chunks = []
+            size = 0
+            truncated = False
+            for chunk in response.iter_content(FETCH_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    chunks.append(chunk[:len(chunk) - (size - max_bytes)])
+                    truncated = True
+                    break
+                chunks.append(chunk)
+            content = b''.join(chunks)
+        finally:
+            # Releases the connection to the pool, or drops it if the body was not read to the end
+            response.close()
+        finished = time.perf_counter()
+
+        timings = _local.timings
+        setup_ms = timings['dns'] + timings['connect'] + timings['tls']
+        timings['ttfb'] = max((headers_received - started) * 1000 - setup_ms, 0.0)
+        timings['download'] = (finished - headers_received) * 1000
+        timings['total'] = (finished - started) * 1000
+        timings = {name: round(value, 1) for name, value in timings.items()}
+        timings['reused_connection'] = _local.new_connections == 0
+    finally:
+        _local.timings = None
+
+    if truncated:
+        logger.warning(f"Body of {url} cut at {max_bytes} bytes.")
+    if response.status_code == 304:
+        encoding, encoding_source = None, 'not-modified'  # No body: the caller reuses its cached copy
+    else:
+        encoding, encoding_source = detect_encoding(content, response.headers.get('Content-Type'))
+    logger.debug(f"Fetched {response.url} ({len(content)} bytes, {encoding} from {encoding_source}): {timings}")
+    return FetchResult(response.url, response.status_code, response.headers, content,
+                       encoding, encoding_source, truncated, timings)
@@ -0,0 +1,70 @@
+import os
+import sys
+import glob
+import tempfile
+import subprocess
+
+# Configuration gunicorn : gunicorn -c gunicorn.conf.py main:app
+#
+# SERVER_MODE=sync (défaut) : un worker = une requête à la fois. Une analyse, une réponse DeepSeek
+#   ou un flux SSE bloque le worker pendant toute la durée de l'appel sortant.
+# SERVER_MODE=gevent : chaque worker sert jusqu'à WORKER_CONNECTIONS requêtes en parallèle, les
+#   sockets (requests, openai/httpx, stripe, psycopg2 via psycogreen) cèdent la main pendant les
+#   attentes réseau. Les jobs d'analyse en thread deviennent des greenlets.
+#
+# Ne pas activer preload_app en mode gevent : l'application doit être importée après le
+# monkey-patching fait par le worker.
+#
+# Migrations : avec DB_MIGRATE_ON_START (défaut true), le master lance `python schema.py upgrade`
+# une seule fois avant de démarrer les workers, dans un processus séparé (le master n'importe pas
+# l'application). Mettre false si `alembic upgrade head` tourne comme étape de release.
+
+SERVER_MODE = os.environ.get('SERVER_MODE', 'sync').lower()
+DB_MIGRATE_ON_START = os.environ.get('DB_MIGRATE_ON_START', 'true').lower() in ('1', 'true', 'yes')
+if SERVER_MODE not in ('sync', 'gevent'):
+    raise RuntimeError(f"Unknown SERVER_MODE '{SERVER_MODE}' (expected 'sync' or 'gevent')")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+accesslog = '-'
+errorlog = '-'
+
+# Métriques Prometheus (metrics.py) : chaque worker écrit ses valeurs dans ce dossier et /metrics
+# agrège tous les workers. Défini ici, avant le fork, pour que les workers l'héritent.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                                                 os.path.join(tempfile.gettempdir(), 'optai-prometheus'))
+
+if SERVER_MODE == 'gevent':
+    worker_class = 'gevent'
+    worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 500))
+
+def on_starting(server):
+    # Les fichiers d'un lancement précédent fausseraient les compteurs
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+    for db_file in glob.glob(os.path.join(PROMETHEUS_MULTIPROC_DIR, '*.db')):
+        os.remove(db_file)
+    if DB_MIGRATE_ON_START:
+        # Un échec arrête gunicorn : les workers ne démarrent pas sur un schéma incomplet
+        server.log.info("Applying database migrations")
+        subprocess.run([sys.executable, 'schema.py', 'upgrade'], check=True,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+
+def child_exit(server, worker):
+    # Les valeurs d'un worker mort restent comptées, mais ses jauges "live" sont retirées
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+def post_worker_init(worker):
+    # JOB_EXECUTOR=thread : le worker reprend les jobs, lots et crawls laissés en plan par un worker mort
+    # (redéploiement, recyclage), voir jobs.start_job_sweeper. benchmark.py load sert une application WSGI nue.
+    if hasattr(worker.wsgi, 'app_context'):
+        from jobs import start_job_sweeper
+        start_job_sweeper(worker.wsgi)
+
+def post_fork(server, worker):
+    if SERVER_MODE == 'gevent':
+        # psycopg2 is a C extension: without this wait callback a query blocks the whole worker
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+        server.log.info(f"Worker {worker.pid}: gevent mode, psycopg2 made cooperative")
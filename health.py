@@ -1,9 +1,35 @@
-from flask import Blueprint, jsonify
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+import requests
+from flask import Blueprint, jsonify, current_app
 from app import db
-from sqlalchemy import text
+from sqlalchemy import text, select, func
+from models import AnalysisJob, AnalysisBatch, Crawl, AnalysisRecommendation
+from metrics import recent_percentiles
+
+logger = logging.getLogger(__name__)
 
 health_bp = Blueprint('health', __name__)
 
+# /health/ready : sondes des dépendances lancées en parallèle, résultat réutilisé HEALTH_CACHE_TTL secondes
+HEALTH_CACHE_TTL = float(os.environ.get('HEALTH_CACHE_TTL', 5))
+HEALTH_PROBE_TIMEOUT = float(os.environ.get('HEALTH_PROBE_TIMEOUT', 3))  # Seconds per probe
+DEEPSEEK_MODELS_URL = "https://api.deepseek.com/models"
+STRIPE_BALANCE_URL = "https://api.stripe.com/v1/balance"
+# Stages reported with their recent latency percentiles (calls to services outside the app)
+UPSTREAM_STAGES = ['fetch', 'site_files', 'semantic_ai', 'recommendations', 'chatbot_webhook', 'stripe']
+
+_probe_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='health-probe')  # Room for probes still hanging
+_ready_lock = threading.Lock()
+_ready_cache = None  # (monotonic time, checks, queue depths, UTC datetime)
+
+class ProbeError(Exception):
+    pass
+
 @health_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint for Railway deployment"""
@@ -14,15 +40,20 @@ def health_check():
         
         # Test DeepSeek AI connection
         try:
-            from ai_integration import openai
-            ai_status = "connected" if openai else "not_configured"
+            from ai_integration import ai_client_configured
+            ai_status = "connected" if ai_client_configured() else "not_configured"
         except Exception:
             ai_status = "error"
+
+        # Compteurs du cache des réponses IA (hits, misses, bypasses...)
+        from ai_cache import get_ai_cache
+        ai_cache = get_ai_cache()
         
         return jsonify({
             "status": "healthy",
             "database": "connected",
             "ai_service": ai_status,
+            "ai_cache": ai_cache.stats() if ai_cache else "disabled",
             "version": "1.0.0"
         }), 200
     except Exception as e:
@@ -31,3 +62,133 @@ def health_check():
             "database": "disconnected",
             "error": str(e)
         }), 500
+
+@health_bp.route('/health/live', methods=['GET'])
+def liveness():
+    """Liveness: the process answers requests. No I/O, so a slow dependency never gets the app restarted."""
+    return jsonify({"status": "alive", "pid": os.getpid()}), 200
+
+def _count_by_status(conn, model, statuses):
+    rows = conn.execute(select(model.status, func.count()).where(model.status.in_(statuses)).group_by(model.status))
+    return {status: count for status, count in rows}
+
+def _probe_database(app):
+    """SELECT 1, then the depth of the work queues (same pooled connection)."""
+    with app.app_context():
+        with db.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            return {
+                'jobs': _count_by_status(conn, AnalysisJob, ['queued', 'fetching', 'parsing', 'scoring', 'ai']),
+                'batches': _count_by_status(conn, AnalysisBatch, ['queued', 'running']),
+                'crawls': _count_by_status(conn, Crawl, ['queued', 'running']),
+                'recommendations': _count_by_status(conn, AnalysisRecommendation, ['queued']),
+            }
+
+def _probe_http(url, **kwargs):
+    """GET url: a response below 500 means the service is reachable (401/403 mean a rejected key)."""
+    response = requests.get(url, timeout=HEALTH_PROBE_TIMEOUT, allow_redirects=False, **kwargs)
+    if response.status_code >= 500 or response.status_code in (401, 403):
+        raise ProbeError(f"HTTP {response.status_code}")
+    return {'http_status': response.status_code}
+
+def _probes(app):
+    """{name: callable} of the dependencies configured in this deployment."""
+    from ai_integration import DEEPSEEK_API_KEY
+    from chatbot import OPTY_BOT_BACKEND, OPTY_BOT_WEBHOOK_URL
+
+    probes = {'database': lambda: _probe_database(app)}
+    if DEEPSEEK_API_KEY:
+        probes['deepseek'] = lambda: _probe_http(DEEPSEEK_MODELS_URL, headers={'Authorization': f"Bearer {DEEPSEEK_API_KEY}"})
+    # payment.stripe ne reçoit sa clé qu'au premier appel Stripe : on lit la même variable d'environnement
+    stripe_key = os.environ.get('STRIPE_SECRET_KEY')
+    if stripe_key:
+        probes['stripe'] = lambda: _probe_http(STRIPE_BALANCE_URL, auth=(stripe_key, ''))
+    if OPTY_BOT_BACKEND == 'webhook' and OPTY_BOT_WEBHOOK_URL:
+        # The webhook only accepts POST (which would run the bot): any answer to a GET proves it is reachable
+        probes['opty_bot_webhook'] = lambda: _probe_http(OPTY_BOT_WEBHOOK_URL)
+    return probes
+
+def _timed(probe):
+    started = time.perf_counter()
+    try:
+        result = probe()
+        status, detail = 'ok', None
+    except Exception as e:
+        result, status, detail = None, 'error', str(e)
+    check = {'status': status, 'latency_ms': round((time.perf_counter() - started) * 1000, 1)}
+    if detail:
+        check['error'] = detail
+    return check, result
+
+def _run_probes(app):
+    """Run every probe in parallel, each bounded by HEALTH_PROBE_TIMEOUT. Returns (checks, queue depths)."""
+    futures = {name: _probe_pool.submit(_timed, probe) for name, probe in _probes(app).items()}
+    wait(futures.values(), timeout=HEALTH_PROBE_TIMEOUT + 0.5)
+    checks, queues = {}, None
+    for name, future in futures.items():
+        if not future.done():
+            # Still running in the probe pool: reported as timed out, its result is dropped
+            checks[name] = {'status': 'timeout', 'latency_ms': round(HEALTH_PROBE_TIMEOUT * 1000, 1)}
+            continue
+        checks[name], result = future.result()
+        if name == 'database':
+            queues = result
+    for name, check in checks.items():
+        if check['status'] != 'ok':
+            logger.warning(f"Readiness probe {name}: {check['status']} {check.get('error', '')}")
+    return checks, queues
+
+def _cached_probes(app):
+    """Probe results less than HEALTH_CACHE_TTL old; concurrent checks wait for a single probe run."""
+    global _ready_cache
+    with _ready_lock:
+        if _ready_cache is None or time.monotonic() - _ready_cache[0] > HEALTH_CACHE_TTL:
+            checks, queues = _run_probes(app)
+            _ready_cache = (time.monotonic(), checks, queues, datetime.utcnow())
+        return _ready_cache
+
+def _pool_status():
+    """Checked-out connections of this process's SQLAlchemy pool."""
+    pool = db.engine.pool
+    if not hasattr(pool, 'checkedout'):
+        return {'class': type(pool).__name__}
+    size = pool.size()
+    max_overflow = max(getattr(pool, '_max_overflow', 0), 0)
+    checked_out = pool.checkedout()
+    return {
+        'size': size,
+        'max_overflow': max_overflow,
+        'checked_out': checked_out,
+        'saturation': round(checked_out / (size + max_overflow), 2) if size + max_overflow else None
+    }
+
+@health_bp.route('/health/ready', methods=['GET'])
+def readiness():
+    """
+    Readiness: dependency probes (database, DeepSeek, Stripe, Opty-bot webhook), cached HEALTH_CACHE_TTL seconds.
+
+    503 if the database is unreachable; an unreachable upstream only makes the status 'degraded'.
+    Pool saturation and upstream latency percentiles are those of the worker process that answers.
+    """
+    from jobs import local_queue_depth
+
+    probed_at, checks, queues, checked_at = _cached_probes(current_app._get_current_object())
+    if checks['database']['status'] != 'ok':
+        status, code = 'not_ready', 503
+    elif any(check['status'] != 'ok' for check in checks.values()):
+        status, code = 'degraded', 200
+    else:
+        status, code = 'ready', 200
+
+    queues = dict(queues or {})
+    queues['local_job_pool'] = local_queue_depth()
+    return jsonify({
+        "status": status,
+        "checked_at": checked_at.isoformat() + 'Z',
+        "cache_age_s": round(time.monotonic() - probed_at, 2),
+        "checks": checks,
+        "db_pool": _pool_status(),
+        "queues": queues,
+        "upstream_latency": recent_percentiles(UPSTREAM_STAGES),
+        "pid": os.getpid()
+    }), code
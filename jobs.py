@@ -0,0 +1,356 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db, SERVER_MODE
+from models import Analysis, AnalysisJob, AnalysisBatchItem
+from analysis_details import findings_from_results
+from recommendations import RECOMMENDATION_ANALYSIS_TYPES, queue_recommendation, generate_queued_recommendations
+from metrics import stage_timer, start_worker_metrics_server
+from analysis_stats import record_analysis
+from ai_integration import metered_ai_usage
+from usage import reserve_analyses, release_analysis, record_ai_usage
+
+logger = logging.getLogger(__name__)
+
+# Job lifecycle: queued -> fetching -> parsing -> scoring -> ai (deep only) -> done | failed
+JOB_STATES = ['queued', 'fetching', 'parsing', 'scoring', 'ai', 'done', 'failed']
+FINISHED_JOB_STATES = ['done', 'failed']
+
+# 'thread': jobs run in a small pool inside each gunicorn worker process.
+# 'external': the web process only enqueues; run `python jobs.py` as a separate worker process.
+JOB_EXECUTOR = os.environ.get('JOB_EXECUTOR', 'thread').lower()
+# In gevent mode the pool threads are greenlets: analyses mostly wait on the network, many can run at once
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 50 if SERVER_MODE == 'gevent' else 4))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2))
+JOB_STALE_AFTER = int(os.environ.get('JOB_STALE_AFTER', 600))  # seconds before an unfinished claimed job is requeued
+# Thread mode: seconds between two sweeps of each web process for work left unfinished by a dead process (0: off)
+JOB_SWEEP_INTERVAL = int(os.environ.get('JOB_SWEEP_INTERVAL', 60))
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_submitted = set()  # IDs of the jobs held by this process's pool (queued or running in it)
+_sweeper_pid = None
+
+def _get_executor():
+    """Return the process-local thread pool, recreating it after a fork (gunicorn workers)."""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='analysis-job')
+            _executor_pid = os.getpid()
+            _submitted.clear()
+            logger.info(f"Started local analysis job pool with {JOB_WORKERS} workers (pid {_executor_pid})")
+        return _executor
+
+def local_queue_depth():
+    """Jobs waiting for a thread of this process's pool (None if this process has no pool)."""
+    if _executor is None or _executor_pid != os.getpid():
+        return None
+    return _executor._work_queue.qsize()
+
+def enqueue_analysis(user_id, url, analysis_type, lang_code=None, monthly_limit=None):
+    """
+    Create the Analysis row and its job, then hand the job to a worker.
+
+    For complete/deep analyses, AI recommendations in lang_code are queued too: the worker
+    generates them right after the analysis so the report can serve the stored copy.
+    The analysis is counted in the user's usage counter in the same transaction.
+
+    Returns:
+    - The AnalysisJob (committed, status 'queued')
+
+    Raises usage.QuotaExceededError (nothing is created) if monthly_limit is given and already reached.
+    """
+    try:
+        reserve_analyses(user_id, 1, monthly_limit)
+    except Exception:
+        db.session.rollback()
+        raise
+    analysis = Analysis(url=url, analysis_type=analysis_type, user_id=user_id)
+    db.session.add(analysis)
+    db.session.flush()
+    job = AnalysisJob(analysis_id=analysis.id, user_id=user_id, url=url, analysis_type=analysis_type, status='queued')
+    db.session.add(job)
+    if lang_code and analysis_type in RECOMMENDATION_ANALYSIS_TYPES:
+        queue_recommendation(analysis, lang_code)
+    db.session.commit()
+    logger.info(f"Queued analysis job {job.id} for {url} (type: {analysis_type}, analysis ID: {analysis.id})")
+
+    if JOB_EXECUTOR == 'thread':
+        submit_local_job(current_app._get_current_object(), job.id)
+    return job
+
+def submit_local_job(app, job_id):
+    """Hand a job to this process's pool, unless the pool already holds it. Returns True if submitted."""
+    executor = _get_executor()
+    with _executor_lock:
+        if job_id in _submitted:
+            return False
+        _submitted.add(job_id)
+    executor.submit(_run_job_in_app_context, app, job_id)
+    return True
+
+def _run_job_in_app_context(app, job_id):
+    with app.app_context():
+        try:
+            run_job(job_id)
+        finally:
+            db.session.remove()
+            with _executor_lock:
+                _submitted.discard(job_id)
+
+def _claim_job(job_id):
+    """Atomically mark a queued job as started. Returns False if another worker already took it."""
+    claimed = AnalysisJob.query.filter(
+        AnalysisJob.id == job_id,
+        AnalysisJob.status == 'queued',
+        AnalysisJob.started_at.is_(None)
+    ).update({'started_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+def run_job(job_id, claimed=False):
+    """Run the SEO analysis for a job and persist its results."""
+    # Imported here so the web process does not need the analyzer loaded just to enqueue
+    from seo_analyzer import analyze_url
+
+    if not claimed and not _claim_job(job_id):
+        logger.info(f"Analysis job {job_id} already claimed by another worker, skipping.")
+        return
+
+    job = db.session.get(AnalysisJob, job_id)
+    if not job:
+        logger.warning(f"Analysis job {job_id} not found.")
+        return
+
+    def set_stage(stage):
+        job.status = stage
+        db.session.commit()
+        logger.debug(f"Analysis job {job.id} -> {stage}")
+
+    try:
+        # DeepSeek usage of the analysis (semantic AI of deep analyses), charged to the user
+        with metered_ai_usage() as ai_usage:
+            seo_results = analyze_url(job.url, job.analysis_type, progress=set_stage)
+        analysis = db.session.get(Analysis, job.analysis_id) if job.analysis_id else None
+        if not analysis:
+            raise RuntimeError(f"Analysis {job.analysis_id} for job {job.id} no longer exists.")
+        with stage_timer('db_persist'):
+            save_analysis_results(analysis, seo_results)
+            record_ai_usage(job.user_id, ai_usage)
+            job.status = 'done'
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+        logger.info(f"Analysis job {job.id} done for {job.url}. Overall score: {analysis.overall_score}")
+    except Exception as e:
+        logger.error(f"Analysis job {job_id} failed for {job.url}: {str(e)}", exc_info=True)
+        db.session.rollback()
+        job = db.session.get(AnalysisJob, job_id)
+        # A failed run must not leave an empty report behind (nor count against the monthly quota)
+        if job.analysis_id:
+            analysis = db.session.get(Analysis, job.analysis_id)
+            job.analysis_id = None
+            if analysis:
+                release_analysis(analysis.user_id, analysis.created_at)
+                db.session.delete(analysis)
+        record_ai_usage(job.user_id, ai_usage)
+        job.status = 'failed'
+        job.error = str(e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return
+
+    # Le rapport est déjà consultable ; les recommandations IA arrivent ensuite (elles ne font jamais échouer le job)
+    if job.analysis_type in RECOMMENDATION_ANALYSIS_TYPES:
+        generate_queued_recommendations(analysis)
+
+def save_analysis_results(analysis, seo_results):
+    """Copy seo_analyzer results onto an Analysis row, details included (one blob, see analysis_details.py). Caller commits."""
+    analysis.meta_score = seo_results['scores'].get('meta', 0)
+    analysis.content_score = seo_results['scores'].get('content', 0)
+    analysis.technical_score = seo_results['scores'].get('technical', 0)
+    analysis.overall_score = seo_results['scores'].get('overall', 0)
+    analysis.details = findings_from_results(seo_results)
+    record_analysis(analysis)
+
+def job_to_dict(job):
+    return {
+        'id': job.id,
+        'analysis_id': job.analysis_id,
+        'url': job.url,
+        'analysis_type': job.analysis_type,
+        'status': job.status,
+        'finished': job.status in FINISHED_JOB_STATES,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+
+def claim_next_job():
+    """Claim the oldest queued job for an external worker. Returns its ID or None."""
+    query = AnalysisJob.query.filter(
+        AnalysisJob.status == 'queued',
+        AnalysisJob.started_at.is_(None),
+        AnalysisJob.id.notin_(db.select(AnalysisBatchItem.job_id))  # Batch jobs are run by their batch runner
+    ).order_by(AnalysisJob.created_at)
+    if db.engine.dialect.name == 'postgresql':
+        query = query.with_for_update(skip_locked=True)
+    job = query.first()
+    if not job:
+        db.session.rollback()
+        return None
+    job.started_at = datetime.utcnow()
+    db.session.commit()
+    return job.id
+
+def requeue_stale_jobs():
+    """Put back jobs whose worker died mid-run (e.g. a redeploy) so they are picked up again."""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_AFTER)
+    requeued = AnalysisJob.query.filter(
+        AnalysisJob.status.notin_(FINISHED_JOB_STATES),
+        AnalysisJob.started_at.isnot(None),
+        AnalysisJob.started_at < cutoff
+    ).update({'status': 'queued', 'started_at': None}, synchronize_session=False)
+    db.session.commit()
+    if requeued:
+        logger.warning(f"Requeued {requeued} stale analysis jobs.")
+    return requeued
+
+def resume_unfinished_work(app):
+    """
+    Thread mode: take over the work a dead web process left unfinished (redeploy, recycled worker).
+    Stale jobs, batches and crawls are requeued; queued jobs that are not part of a batch are handed to
+    this process's pool, and a runner of this process takes the queued batches and crawls if it has a
+    free slot. Every web process sweeps: the claims (_claim_job...) make sure each job runs once.
+
+    Returns:
+    - Number of jobs handed to the local pool
+    """
+    from batches import requeue_stale_batches, start_batch_runner
+    from crawler import requeue_stale_crawls, start_crawl_runner
+    from models import AnalysisBatch, Crawl
+
+    requeue_stale_jobs()
+    requeue_stale_batches()
+    requeue_stale_crawls()
+    job_ids = db.session.scalars(
+        db.select(AnalysisJob.id).where(
+            AnalysisJob.status == 'queued',
+            AnalysisJob.started_at.is_(None),
+            AnalysisJob.id.notin_(db.select(AnalysisBatchItem.job_id))  # Run by their batch runner
+        ).order_by(AnalysisJob.created_at)).all()
+    queued_batch = db.session.scalar(db.select(AnalysisBatch.id).where(AnalysisBatch.status == 'queued').limit(1))
+    queued_crawl = db.session.scalar(db.select(Crawl.id).where(Crawl.status == 'queued').limit(1))
+    db.session.commit()
+
+    submitted = sum(submit_local_job(app, job_id) for job_id in job_ids)
+    if submitted:
+        logger.info(f"Picked up {submitted} queued analysis jobs (pid {os.getpid()})")
+    if queued_batch is not None:
+        start_batch_runner()
+    if queued_crawl is not None:
+        start_crawl_runner()
+    return submitted
+
+def start_job_sweeper(app):
+    """
+    Thread mode: sweep for unfinished work (resume_unfinished_work) now, then every JOB_SWEEP_INTERVAL
+    seconds, in a background thread of this process. Called once per web process by gunicorn.conf.py
+    (post_worker_init) and `python main.py`; the command-line scripts that build the app do not sweep.
+    """
+    global _sweeper_pid
+    if JOB_EXECUTOR != 'thread' or JOB_SWEEP_INTERVAL <= 0 or _sweeper_pid == os.getpid():
+        return
+    _sweeper_pid = os.getpid()
+
+    def sweep_forever():
+        while True:
+            with app.app_context():
+                try:
+                    resume_unfinished_work(app)
+                except Exception as e:
+                    logger.error(f"Sweep for unfinished analysis work failed: {str(e)}", exc_info=True)
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+            time.sleep(JOB_SWEEP_INTERVAL)
+
+    threading.Thread(target=sweep_forever, daemon=True, name='analysis-job-sweeper').start()
+    logger.info(f"Unfinished work sweeper started (every {JOB_SWEEP_INTERVAL}s, pid {_sweeper_pid})")
+
+def run_worker():
+    """
+    Poll the database for queued jobs and run them in a pool of JOB_WORKERS threads.
+    Queued batches and site crawls are run too, one of each at a time, by runner threads.
+    """
+    from batches import claim_next_batch, run_batch, requeue_stale_batches
+    from crawler import claim_next_crawl, run_crawl, requeue_stale_crawls
+
+    app = current_app._get_current_object()
+    executor = _get_executor()
+    in_flight = set()
+    in_flight_lock = threading.Lock()
+    batch_runner = None
+    crawl_runner = None
+    logger.info(f"Analysis worker started (pid {os.getpid()}, {JOB_WORKERS} threads).")
+    start_worker_metrics_server()  # The analysis stages run here, not in the web process
+    requeue_stale_jobs()
+    requeue_stale_batches()
+    requeue_stale_crawls()
+
+    def run_claimed_batch(batch_id):
+        with app.app_context():
+            try:
+                run_batch(batch_id, claimed=True)
+            except Exception as e:
+                logger.error(f"Batch {batch_id} failed: {str(e)}", exc_info=True)
+            finally:
+                db.session.remove()
+
+    def run_claimed_crawl(crawl_id):
+        with app.app_context():
+            try:
+                run_crawl(crawl_id, claimed=True)
+            finally:
+                db.session.remove()
+
+    def run_claimed(job_id):
+        with app.app_context():
+            try:
+                run_job(job_id, claimed=True)
+            finally:
+                db.session.remove()
+                with in_flight_lock:
+                    in_flight.discard(job_id)
+
+    while True:
+        if batch_runner is None or not batch_runner.is_alive():
+            batch_id = claim_next_batch()
+            if batch_id is not None:
+                batch_runner = threading.Thread(target=run_claimed_batch, args=(batch_id,), daemon=True)
+                batch_runner.start()
+        if crawl_runner is None or not crawl_runner.is_alive():
+            crawl_id = claim_next_crawl()
+            if crawl_id is not None:
+                crawl_runner = threading.Thread(target=run_claimed_crawl, args=(crawl_id,), daemon=True)
+                crawl_runner.start()
+        with in_flight_lock:
+            has_capacity = len(in_flight) < JOB_WORKERS
+        job_id = claim_next_job() if has_capacity else None
+        if job_id is None:
+            time.sleep(JOB_POLL_INTERVAL)
+            continue
+        with in_flight_lock:
+            in_flight.add(job_id)
+        executor.submit(run_claimed, job_id)
+
+if __name__ == "__main__":
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        run_worker()
@@ -1,8 +1,17 @@
-from app import app  # noqa: F401
-
 import os
+from app import create_app
+
+app = create_app()
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     debug_mode = os.environ.get("FLASK_DEBUG", "False").lower() == "true"
+    # Serveur de développement : pas de master gunicorn pour appliquer les migrations (voir gunicorn.conf.py)
+    if os.environ.get("DB_MIGRATE_ON_START", "true").lower() in ("1", "true", "yes"):
+        from schema import upgrade_database
+        with app.app_context():
+            upgrade_database()
+    # Reprise des jobs interrompus (JOB_EXECUTOR=thread), comme post_worker_init sous gunicorn
+    from jobs import start_job_sweeper
+    start_job_sweeper(app)
     app.run(host='0.0.0.0', port=port, debug=debug_mode)
@@ -0,0 +1,133 @@
+import os
+import time
+import logging
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from flask import Blueprint, Response, g, request, has_request_context, jsonify
+from prometheus_client import (CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, start_http_server,
+                               CONTENT_TYPE_LATEST)
+from prometheus_client import multiprocess
+
+logger = logging.getLogger(__name__)
+
+# Métriques Prometheus : durée de chaque étape du pipeline (histogrammes) et des requêtes HTTP, exposées sur /metrics.
+# Sous gunicorn, chaque worker écrit ses valeurs dans PROMETHEUS_MULTIPROC_DIR (voir gunicorn.conf.py) et
+# /metrics agrège tous les workers, quel que soit celui qui répond.
+PROMETHEUS_MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # If set, /metrics requires "Authorization: Bearer <token>"
+SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', 'false').lower() in ('1', 'true', 'yes')
+WORKER_METRICS_PORT = os.environ.get('WORKER_METRICS_PORT')  # Port of the /metrics server of `python jobs.py`
+
+# From a few ms (parse of a small page) to the 120s of a slow DeepSeek response
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+RECENT_SAMPLES = 200  # Last durations kept per stage in this process, for the percentiles of /health/ready
+
+# Stages timed with stage_timer():
+# fetch, parse, extract, site_files, analyze_meta, analyze_content, analyze_technical (seo_analyzer),
+# semantic_ai (one packed DeepSeek request), db_persist (analysis and crawl page results),
+# recommendations (DeepSeek recommendations), chatbot_webhook (Opty-bot), stripe (each Stripe API call)
+STAGE_DURATION = Histogram('optai_stage_duration_seconds', 'Duration of a pipeline stage', ['stage'],
+                           buckets=DURATION_BUCKETS)
+STAGE_ERRORS = Counter('optai_stage_errors_total', 'Pipeline stages that raised an exception', ['stage'])
+REQUEST_DURATION = Histogram('optai_http_request_duration_seconds',
+                             'Time to build the HTTP response (streamed bodies are not included)',
+                             ['method', 'endpoint', 'status'], buckets=DURATION_BUCKETS)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+_recent = defaultdict(lambda: deque(maxlen=RECENT_SAMPLES))
+_recent_lock = threading.Lock()
+
+def observe_stage(stage, seconds, error=False):
+    """Record one run of a stage (for code that cannot use stage_timer, e.g. generators)."""
+    STAGE_DURATION.labels(stage).observe(seconds)
+    with _recent_lock:
+        _recent[stage].append(seconds)
+    if error:
+        STAGE_ERRORS.labels(stage).inc()
+    if has_request_context():
+        timings = g.setdefault('stage_timings', {})
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+@contextmanager
+def stage_timer(stage):
+    """
+    Time the enclosed block as a pipeline stage.
+
+    Usage:
+        with stage_timer('fetch'):
+            page = fetch_page(url)
+
+    An exception is counted in optai_stage_errors_total and re-raised.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        observe_stage(stage, time.perf_counter() - started, error=True)
+        raise
+    observe_stage(stage, time.perf_counter() - started)
+
+def recent_percentiles(stages):
+    """
+    p50/p95/p99 in ms of the last RECENT_SAMPLES runs of each stage in this process.
+
+    Returns:
+    - {stage: {'samples', 'p50_ms', 'p95_ms', 'p99_ms'}} for the stages that ran at least once
+    """
+    with _recent_lock:
+        samples = {stage: sorted(_recent[stage]) for stage in stages if _recent.get(stage)}
+    def percentile(values, p):
+        return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 1)
+    return {stage: {'samples': len(values), 'p50_ms': percentile(values, 0.5), 'p95_ms': percentile(values, 0.95),
+                    'p99_ms': percentile(values, 0.99)} for stage, values in samples.items()}
+
+def _registry():
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return REGISTRY
+    # Fresh registry on each scrape: MultiProcessCollector reads the files of every worker, alive or dead
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint."""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(generate_latest(_registry()), mimetype=CONTENT_TYPE_LATEST)
+
+def _before_request():
+    g.request_started = time.perf_counter()
+
+def _after_request(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'  # Route template: bounded cardinality
+    if endpoint != '/metrics':
+        REQUEST_DURATION.labels(request.method, endpoint, str(response.status_code)).observe(elapsed)
+    if SERVER_TIMING_HEADER:
+        # Server-Timing: fetch;dur=120.4, parse;dur=8.1, total;dur=140.2 (ms, shown by the browser devtools)
+        timings = g.get('stage_timings', {})
+        entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+        entries.append(f"total;dur={elapsed * 1000:.1f}")
+        response.headers['Server-Timing'] = ', '.join(entries)
+    return response
+
+def init_app(app):
+    """Register /metrics and the request timing hooks."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.register_blueprint(metrics_bp)
+    if PROMETHEUS_MULTIPROC_DIR:
+        logger.info(f"Prometheus metrics aggregated across processes in {PROMETHEUS_MULTIPROC_DIR}")
+
+def start_worker_metrics_server():
+    """Serve /metrics from the external job worker on WORKER_METRICS_PORT, if set."""
+    if not WORKER_METRICS_PORT:
+        return
+    start_http_server(int(WORKER_METRICS_PORT), registry=_registry())
+    logger.info(f"Worker metrics served on port {WORKER_METRICS_PORT}")
@@ -0,0 +1,46 @@
+from logging.config import fileConfig
+from alembic import context
+from app import create_app, db
+import models  # noqa: F401 (registers the tables in db.metadata)
+
+config = context.config
+# schema.upgrade_database() passes the connection of the application (and keeps its logging);
+# otherwise this is the alembic command line
+connection = config.attributes.get('connection')
+if connection is None and config.config_file_name:
+    fileConfig(config.config_file_name)
+
+target_metadata = db.metadata
+
+def _configure(connection):
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        compare_type=True,
+        # SQLite cannot ALTER constraints: batch operations rebuild the table
+        render_as_batch=connection.dialect.name == 'sqlite',
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_offline():
+    with create_app().app_context():
+        url = db.engine.url.render_as_string(hide_password=False)
+    context.configure(url=url, target_metadata=target_metadata, literal_binds=True,
+                      dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    if connection is not None:
+        _configure(connection)
+        return
+    with create_app().app_context():
+        with db.engine.connect() as conn:
+            _configure(conn)
+            conn.commit()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,250 @@
+"""Baseline schema
+
+Creates the tables as the models defined them when migrations were introduced. On a database created
+earlier by db.create_all(), only what is missing is created (tables, indexes, and the columns that the
+former schema.upgrade_schema() used to add), so both end up at this revision.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 12:37:39.963573
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+LEGACY_COLUMNS = [
+    ('user', sa.Column('entitlements_version', sa.Integer(), server_default='0', nullable=False)),
+    ('analysis_detail', sa.Column('message_code', sa.String(length=80), nullable=True)),
+    ('analysis_detail', sa.Column('message_params', sa.Text(), nullable=True)),
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing = set(inspector.get_table_names())
+
+    def _create_table(name, *elements):
+        if name not in existing:
+            op.create_table(name, *elements)
+
+    def _create_index(table, name, columns):
+        if table not in existing or name not in {index['name'] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+    _create_table('user',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=64), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('password_hash', sa.String(length=256), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('subscription_status', sa.String(length=20), nullable=True),
+    sa.Column('subscription_ends_at', sa.DateTime(), nullable=True),
+    sa.Column('stripe_customer_id', sa.String(length=100), nullable=True),
+    sa.Column('is_admin', sa.Boolean(), nullable=True),
+    sa.Column('entitlements_version', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('username')
+    )
+    _create_table('analysis',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('url', sa.String(length=255), nullable=False),
+    sa.Column('analysis_type', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('meta_score', sa.Integer(), nullable=True),
+    sa.Column('content_score', sa.Integer(), nullable=True),
+    sa.Column('technical_score', sa.Integer(), nullable=True),
+    sa.Column('overall_score', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_index('analysis', 'ix_analysis_user_created', ['user_id', 'created_at', 'id'])
+
+    _create_table('analysis_batch',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('analysis_type', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_index('analysis_batch', 'ix_analysis_batch_user_id', ['user_id'])
+
+    _create_table('analysis_rollup',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('week_start', sa.Date(), nullable=False),
+    sa.Column('analyses', sa.Integer(), nullable=False),
+    sa.Column('score_sum', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'week_start')
+    )
+    _create_table('crawl',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('seed_url', sa.String(length=255), nullable=False),
+    sa.Column('analysis_type', sa.String(length=20), nullable=False),
+    sa.Column('max_pages', sa.Integer(), nullable=False),
+    sa.Column('max_depth', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_index('crawl', 'ix_crawl_user_id', ['user_id'])
+
+    _create_table('payment_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('stripe_payment_id', sa.String(length=100), nullable=True),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('subscription',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('stripe_customer_id', sa.String(length=100), nullable=True),
+    sa.Column('stripe_subscription_id', sa.String(length=100), nullable=True),
+    sa.Column('plan', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('ends_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('usage_counter',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.Date(), nullable=False),
+    sa.Column('analyses', sa.Integer(), nullable=False),
+    sa.Column('ai_calls', sa.Integer(), nullable=False),
+    sa.Column('tokens', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'period')
+    )
+    _create_table('analysis_detail',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('analysis_id', sa.Integer(), nullable=True),
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('component', sa.String(length=50), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('recommendation', sa.Text(), nullable=True),
+    sa.Column('message_code', sa.String(length=80), nullable=True),
+    sa.Column('message_params', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['analysis_id'], ['analysis.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('analysis_job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('analysis_id', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('url', sa.String(length=255), nullable=False),
+    sa.Column('analysis_type', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['analysis_id'], ['analysis.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('analysis_recommendation',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('analysis_id', sa.Integer(), nullable=False),
+    sa.Column('lang_code', sa.String(length=5), nullable=False),
+    sa.Column('prompt_version', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('data', sa.Text(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('generated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['analysis_id'], ['analysis.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('analysis_id', 'lang_code', name='uq_analysis_recommendation_lang')
+    )
+    _create_index('analysis_recommendation', 'ix_analysis_recommendation_analysis_id', ['analysis_id'])
+
+    _create_table('crawl_page',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('crawl_id', sa.Integer(), nullable=False),
+    sa.Column('url', sa.String(length=2048), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=True),
+    sa.Column('content_hash', sa.String(length=64), nullable=True),
+    sa.Column('duplicate_of', sa.String(length=2048), nullable=True),
+    sa.Column('title', sa.String(length=255), nullable=True),
+    sa.Column('meta_score', sa.Integer(), nullable=True),
+    sa.Column('content_score', sa.Integer(), nullable=True),
+    sa.Column('technical_score', sa.Integer(), nullable=True),
+    sa.Column('overall_score', sa.Integer(), nullable=True),
+    sa.Column('issues', sa.Text(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('fetched_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['crawl_id'], ['crawl.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('crawl_id', 'url', name='uq_crawl_page_url')
+    )
+    _create_index('crawl_page', 'ix_crawl_page_frontier', ['crawl_id', 'status', 'depth'])
+
+    _create_table('analysis_batch_item',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('batch_id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('url', sa.String(length=255), nullable=False),
+    sa.ForeignKeyConstraint(['batch_id'], ['analysis_batch.id'], ),
+    sa.ForeignKeyConstraint(['job_id'], ['analysis_job.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('job_id')
+    )
+    _create_index('analysis_batch_item', 'ix_analysis_batch_item_batch_id', ['batch_id'])
+
+    # Databases created by db.create_all() before the migrations: columns added to existing tables since then
+    for table, column in LEGACY_COLUMNS:
+        if table in existing and column.name not in {c['name'] for c in inspector.get_columns(table)}:
+            op.add_column(table, column)
+
+
+def downgrade():
+    op.drop_index('ix_analysis_batch_item_batch_id', table_name='analysis_batch_item')
+    op.drop_table('analysis_batch_item')
+    op.drop_index('ix_crawl_page_frontier', table_name='crawl_page')
+    op.drop_table('crawl_page')
+    op.drop_index('ix_analysis_recommendation_analysis_id', table_name='analysis_recommendation')
+    op.drop_table('analysis_recommendation')
+    op.drop_table('analysis_job')
+    op.drop_table('analysis_detail')
+    op.drop_table('usage_counter')
+    op.drop_table('subscription')
+    op.drop_table('payment_history')
+    op.drop_index('ix_crawl_user_id', table_name='crawl')
+    op.drop_table('crawl')
+    op.drop_table('analysis_rollup')
+    op.drop_index('ix_analysis_batch_user_id', table_name='analysis_batch')
+    op.drop_table('analysis_batch')
+    op.drop_index('ix_analysis_user_created', table_name='analysis')
+    op.drop_table('analysis')
+    op.drop_table('user')
@@ -0,0 +1,77 @@
+"""Indexes of the hot query patterns, uniqueness of subscriptions
+
+- analysis_detail.analysis_id: details of a report, recommendations prompt
+- analysis_job.analysis_id: job of an analysis (report page, batch results)
+- analysis_job (status, created_at): claim_next_job, oldest queued job first
+- payment_history.user_id: payments of a user
+- subscription.user_id and subscription.stripe_subscription_id are unique: User.subscription is one
+  row, and every Stripe webhook looks its subscription up by ID
+
+Analysis lookups by user and date are served by ix_analysis_user_created (revision 0001).
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 12:38:04.070355
+"""
+import logging
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+subscription = sa.table(
+    'subscription',
+    sa.column('id', sa.Integer), sa.column('user_id', sa.Integer), sa.column('stripe_subscription_id', sa.String),
+    sa.column('status', sa.String), sa.column('plan', sa.String), sa.column('updated_at', sa.DateTime),
+)
+
+
+def _remove_duplicate_subscriptions(bind, column):
+    """
+    Keep one subscription per value of column (the active one, else the most recently updated):
+    the application only ever used one of them (User.subscription, .first() in the webhooks).
+    """
+    duplicated = bind.execute(
+        sa.select(column).where(column.isnot(None)).group_by(column).having(sa.func.count() > 1)).scalars().all()
+    for value in duplicated:
+        rows = bind.execute(
+            sa.select(subscription.c.id, subscription.c.plan, subscription.c.status,
+                      subscription.c.stripe_subscription_id)
+            .where(column == value)
+            .order_by((subscription.c.status == 'active').desc(), subscription.c.updated_at.desc(),
+                      subscription.c.id.desc())).all()
+        for row in rows[1:]:
+            logger.warning(f"Removing duplicate subscription {row.id} ({column.name}={value}, plan {row.plan}, "
+                           f"status {row.status}, Stripe {row.stripe_subscription_id}); kept {rows[0].id}")
+            bind.execute(sa.delete(subscription).where(subscription.c.id == row.id))
+
+
+def upgrade():
+    op.create_index('ix_analysis_detail_analysis_id', 'analysis_detail', ['analysis_id'])
+    op.create_index('ix_analysis_job_analysis_id', 'analysis_job', ['analysis_id'])
+    op.create_index('ix_analysis_job_queue', 'analysis_job', ['status', 'created_at'])
+    op.create_index('ix_payment_history_user_id', 'payment_history', ['user_id'])
+
+    bind = op.get_bind()
+    _remove_duplicate_subscriptions(bind, subscription.c.user_id)
+    _remove_duplicate_subscriptions(bind, subscription.c.stripe_subscription_id)
+    # Batch mode: SQLite rebuilds the table to add a constraint, PostgreSQL uses ALTER TABLE
+    with op.batch_alter_table('subscription') as batch_op:
+        batch_op.create_unique_constraint('uq_subscription_user', ['user_id'])
+        batch_op.create_unique_constraint('uq_subscription_stripe_subscription', ['stripe_subscription_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('subscription') as batch_op:
+        batch_op.drop_constraint('uq_subscription_stripe_subscription', type_='unique')
+        batch_op.drop_constraint('uq_subscription_user', type_='unique')
+    op.drop_index('ix_payment_history_user_id', table_name='payment_history')
+    op.drop_index('ix_analysis_job_queue', table_name='analysis_job')
+    op.drop_index('ix_analysis_job_analysis_id', table_name='analysis_job')
+    op.drop_index('ix_analysis_detail_analysis_id', table_name='analysis_detail')
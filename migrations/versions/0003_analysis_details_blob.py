@@ -0,0 +1,115 @@
+"""Details of an analysis in one blob (analysis.details_data) instead of analysis_detail rows
+
+The rows of each analysis are encoded with analysis_details.encode_details (format version 1: a version
+byte, then zlib-compressed JSON), in batches of analyses, then the analysis_detail table is dropped.
+The downgrade writes the rows back from the blobs.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 13:02:11.514210
+"""
+import json
+import logging
+from alembic import op
+import sqlalchemy as sa
+from analysis_details import Finding, encode_details, decode_details
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+BATCH_SIZE = 1000  # Analyses converted per round trip
+
+analysis = sa.table('analysis', sa.column('id', sa.Integer), sa.column('details_data', sa.LargeBinary))
+analysis_detail = sa.table(
+    'analysis_detail',
+    sa.column('id', sa.Integer), sa.column('analysis_id', sa.Integer), sa.column('category', sa.String),
+    sa.column('component', sa.String), sa.column('status', sa.String), sa.column('score', sa.Integer),
+    sa.column('description', sa.Text), sa.column('recommendation', sa.Text),
+    sa.column('message_code', sa.String), sa.column('message_params', sa.Text),
+)
+
+
+def _finding(row):
+    return Finding(row.category, row.component, row.status, row.score, row.description, row.recommendation,
+                   row.message_code, json.loads(row.message_params) if row.message_params else None)
+
+
+def upgrade():
+    op.add_column('analysis', sa.Column('details_data', sa.LargeBinary(), nullable=True))
+
+    bind = op.get_bind()
+    orphans = bind.execute(sa.select(sa.func.count()).select_from(analysis_detail)
+                           .where(analysis_detail.c.analysis_id.is_(None))).scalar()
+    if orphans:
+        logger.warning(f"Dropping {orphans} analysis_detail rows without an analysis")
+    converted = rows = 0
+    last_id = 0
+    while True:
+        # Next batch of analyses that have details, then all their rows in one query
+        analysis_ids = bind.execute(
+            sa.select(analysis_detail.c.analysis_id).distinct()
+            .where(analysis_detail.c.analysis_id > last_id)
+            .order_by(analysis_detail.c.analysis_id).limit(BATCH_SIZE)).scalars().all()
+        if not analysis_ids:
+            break
+        findings = {}
+        for row in bind.execute(
+                sa.select(analysis_detail)
+                .where(analysis_detail.c.analysis_id.between(analysis_ids[0], analysis_ids[-1]))
+                .order_by(analysis_detail.c.analysis_id, analysis_detail.c.id)):
+            findings.setdefault(row.analysis_id, []).append(_finding(row))
+            rows += 1
+        bind.execute(
+            sa.update(analysis).where(analysis.c.id == sa.bindparam('analysis_id'))
+            .values(details_data=sa.bindparam('data')),
+            [{'analysis_id': analysis_id, 'data': encode_details(items)} for analysis_id, items in findings.items()])
+        converted += len(findings)
+        last_id = analysis_ids[-1]
+        logger.info(f"Analysis details: {converted} analyses ({rows} rows) converted")
+
+    op.drop_index('ix_analysis_detail_analysis_id', table_name='analysis_detail')
+    op.drop_table('analysis_detail')
+
+
+def downgrade():
+    op.create_table('analysis_detail',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('analysis_id', sa.Integer(), nullable=True),
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('component', sa.String(length=50), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('recommendation', sa.Text(), nullable=True),
+    sa.Column('message_code', sa.String(length=80), nullable=True),
+    sa.Column('message_params', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['analysis_id'], ['analysis.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_analysis_detail_analysis_id', 'analysis_detail', ['analysis_id'])
+
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        batch = bind.execute(
+            sa.select(analysis.c.id, analysis.c.details_data)
+            .where(analysis.c.details_data.isnot(None), analysis.c.id > last_id)
+            .order_by(analysis.c.id).limit(BATCH_SIZE)).all()
+        if not batch:
+            break
+        rows = [{'analysis_id': analysis_id, 'category': finding.category, 'component': finding.component,
+                 'status': finding.status, 'score': finding.score, 'description': finding.description,
+                 'recommendation': finding.recommendation, 'message_code': finding.message_code,
+                 'message_params': json.dumps(finding.params, ensure_ascii=False) if finding.params else None}
+                for analysis_id, data in batch for finding in decode_details(data)]
+        if rows:
+            bind.execute(sa.insert(analysis_detail), rows)
+        last_id = batch[-1].id
+
+    with op.batch_alter_table('analysis') as batch_op:
+        batch_op.drop_column('details_data')
@@ -1,5 +1,6 @@
 from datetime import datetime
 from app import db
+from analysis_details import encode_details, decode_details
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -13,6 +14,7 @@ class User(UserMixin, db.Model):
     subscription_ends_at = db.Column(db.DateTime, nullable=True)
     stripe_customer_id = db.Column(db.String(100), nullable=True)
     is_admin = db.Column(db.Boolean, default=False)
+    entitlements_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped when the plan changes (entitlements.py)
     
     # Relationships
     analyses = db.relationship('Analysis', backref='user', lazy='dynamic')
@@ -35,19 +37,137 @@ class Analysis(db.Model):
     content_score = db.Column(db.Integer, nullable=True)
     technical_score = db.Column(db.Integer, nullable=True)
     overall_score = db.Column(db.Integer, nullable=True)
+    # Détails (relevés par composant) en un seul blob versionné et compressé, voir analysis_details.py. Chargé à
+    # la première lecture seulement : les listes d'analyses ne le lisent pas
+    details_data = db.deferred(db.Column(db.LargeBinary, nullable=True))
+
+    # Historique paginé par curseur (created_at, id) de /api/analyses
+    __table_args__ = (db.Index('ix_analysis_user_created', 'user_id', 'created_at', 'id'),)
+
+    @property
+    def details(self):
+        """Findings of the analysis (analysis_details.Finding: category, component, status, score, texts, code)."""
+        return decode_details(self.details_data)
+
+    @details.setter
+    def details(self, findings):
+        self.details_data = encode_details(findings) if findings else None
+
+class AnalysisRollup(db.Model):
+    # Compteurs par utilisateur et par semaine, tenus à jour à chaque analyse enregistrée (voir analysis_stats.py)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    week_start = db.Column(db.Date, primary_key=True)  # Sunday starting the week the analysis was created
+    analyses = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)  # Sum of overall_score (missing scores count as 0)
+
+class UsageCounter(db.Model):
+    # Consommation mensuelle par utilisateur, mise à jour dans la transaction de chaque analyse créée (voir usage.py)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    period = db.Column(db.Date, primary_key=True)  # First day of the month (UTC)
+    analyses = db.Column(db.Integer, nullable=False, default=0)  # Analyses created (failed ones are given back)
+    ai_calls = db.Column(db.Integer, nullable=False, default=0)  # DeepSeek requests (AI cache hits are free)
+    tokens = db.Column(db.Integer, nullable=False, default=0)  # DeepSeek tokens (prompt + completion)
+
+class AnalysisJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    analysis_id = db.Column(db.Integer, db.ForeignKey('analysis.id'), nullable=True, index=True)  # null once a failed analysis is discarded
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    url = db.Column(db.String(255), nullable=False)
+    analysis_type = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, fetching, parsing, scoring, ai, done, failed
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)  # set when a worker claims the job
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    # File des jobs (claim_next_job : statut 'queued', du plus ancien au plus récent)
+    __table_args__ = (db.Index('ix_analysis_job_queue', 'status', 'created_at'),)
     
     # Relationship
-    details = db.relationship('AnalysisDetail', backref='analysis', lazy='dynamic', cascade='all, delete-orphan')
+    analysis = db.relationship('Analysis', backref=db.backref('job', uselist=False))
+
+class AnalysisRecommendation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    analysis_id = db.Column(db.Integer, db.ForeignKey('analysis.id'), nullable=False, index=True)
+    lang_code = db.Column(db.String(5), nullable=False)
+    prompt_version = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, ready, failed
+    data = db.Column(db.Text, nullable=True)  # JSON: summary, priorities, recommendations, insights
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    generated_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (db.UniqueConstraint('analysis_id', 'lang_code', name='uq_analysis_recommendation_lang'),)
+
+    # Relationship
+    analysis = db.relationship('Analysis', backref=db.backref('recommendations', lazy='dynamic', cascade='all, delete-orphan'))
 
-class AnalysisDetail(db.Model):
+class AnalysisBatch(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    analysis_id = db.Column(db.Integer, db.ForeignKey('analysis.id'))
-    category = db.Column(db.String(50), nullable=False)  # title, meta, headings, content, etc.
-    component = db.Column(db.String(50), nullable=False)  # specific component name
-    status = db.Column(db.String(20), nullable=False)  # good, warning, error
-    score = db.Column(db.Integer, nullable=False)
-    description = db.Column(db.Text, nullable=True)
-    recommendation = db.Column(db.Text, nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    analysis_type = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done
+    total = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)  # set when a runner claims the batch
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    # Relationship
+    items = db.relationship('AnalysisBatchItem', backref='batch', lazy='dynamic', cascade='all, delete-orphan',
+                            order_by='AnalysisBatchItem.position')
+
+class AnalysisBatchItem(db.Model):
+    """One URL of a batch and the job that analyzes it (batch jobs are run by the batch runner, not claimed one by one)."""
+    id = db.Column(db.Integer, primary_key=True)
+    batch_id = db.Column(db.Integer, db.ForeignKey('analysis_batch.id'), nullable=False, index=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('analysis_job.id'), nullable=False, unique=True)
+    position = db.Column(db.Integer, nullable=False)  # Order of the URL in the submitted list
+    url = db.Column(db.String(255), nullable=False)
+
+    # Relationship
+    job = db.relationship('AnalysisJob')
+
+class Crawl(db.Model):
+    """Multi-page crawl of a site from a seed URL; its frontier is the CrawlPage rows still 'queued'."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    seed_url = db.Column(db.String(255), nullable=False)
+    analysis_type = db.Column(db.String(20), nullable=False)
+    max_pages = db.Column(db.Integer, nullable=False)
+    max_depth = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)  # set when a runner claims the crawl
+    updated_at = db.Column(db.DateTime, nullable=True)  # last page processed (a stale value means the runner died)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    # Relationship
+    pages = db.relationship('CrawlPage', backref='crawl', lazy='dynamic', cascade='all, delete-orphan')
+
+class CrawlPage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    crawl_id = db.Column(db.Integer, db.ForeignKey('crawl.id'), nullable=False)
+    url = db.Column(db.String(2048), nullable=False)  # Normalized (page_cache.normalize_url)
+    depth = db.Column(db.Integer, nullable=False)  # Clicks from the seed URL (sitemap URLs count as depth 1)
+    source = db.Column(db.String(20), nullable=False, default='link')  # seed, sitemap, link
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed, duplicate, skipped, blocked
+    status_code = db.Column(db.Integer, nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True)
+    duplicate_of = db.Column(db.String(2048), nullable=True)  # URL of the page with the same content, or of the redirect target
+    title = db.Column(db.String(255), nullable=True)
+    meta_score = db.Column(db.Integer, nullable=True)
+    content_score = db.Column(db.Integer, nullable=True)
+    technical_score = db.Column(db.Integer, nullable=True)
+    overall_score = db.Column(db.Integer, nullable=True)
+    issues = db.Column(db.Text, nullable=True)  # JSON: ["meta.description", ...] components in warning or error
+    error = db.Column(db.Text, nullable=True)
+    fetched_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('crawl_id', 'url', name='uq_crawl_page_url'),
+        db.Index('ix_crawl_page_frontier', 'crawl_id', 'status', 'depth'),
+    )
 
 class Subscription(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -59,13 +179,19 @@ class Subscription(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     ends_at = db.Column(db.DateTime, nullable=True)
+
+    # One subscription per user (User.subscription), and the Stripe webhooks look them up by subscription ID
+    __table_args__ = (
+        db.UniqueConstraint('user_id', name='uq_subscription_user'),
+        db.UniqueConstraint('stripe_subscription_id', name='uq_subscription_stripe_subscription'),
+    )
     
     # Relationship
     user = db.relationship('User', backref=db.backref('subscription', uselist=False))
 
 class PaymentHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     stripe_payment_id = db.Column(db.String(100), nullable=True)
     amount = db.Column(db.Float, nullable=False)
     currency = db.Column(db.String(3), nullable=False, default='USD')
@@ -0,0 +1,292 @@
+import os
+import gzip
+import json
+import time
+import zlib
+import hashlib
+import logging
+import tempfile
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+PAGE_CACHE_DIR = os.environ.get('PAGE_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'optai-page-cache')
+PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 7 * 24 * 3600))  # seconds since the page was last fetched or revalidated
+PAGE_CACHE_MAX_BYTES = int(os.environ.get('PAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+EVICT_EVERY = 50  # Stores between two eviction passes (per process)
+
+# Bump when PageFeatures or the scoring rules change: the features and scores of older entries are then
+# rebuilt from their stored body (their validators still avoid the download)
+PAGE_CACHE_VERSION = 6
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def normalize_url(url):
+    """Cache key form of a URL: lowercase scheme/host, no default port, no fragment, sorted query."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        host = f"[{host}]"  # IPv6 literal
+    netloc = host if parts.port is None or DEFAULT_PORTS.get(scheme) == parts.port else f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, parts.path or '/', query, ''))
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+class CachedPage:
+    """A cache entry: validators, body hash, extracted features and the scores computed from them."""
+
+    def __init__(self, key, url, etag=None, last_modified=None, content_hash=None, headers=None,
+                 encoding=None, stored_at=None, features=None, scored=None):
+        self.key = key
+        self.url = url  # Normalized URL
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+        self.headers = headers or {}
+        self.encoding = encoding
+        self.stored_at = stored_at or time.time()
+        self.features = features  # PageFeatures
+        self.scored = scored or {}  # analysis_type -> {'scores': ..., 'details': ...} (without the AI part)
+        self.body = None  # Stored body of an entry from an older PAGE_CACHE_VERSION, to rebuild its features
+
+    def validators(self):
+        """Headers for a conditional GET."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_dict(self):
+        return {
+            'version': PAGE_CACHE_VERSION,
+            'url': self.url,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'content_hash': self.content_hash,
+            'headers': self.headers,
+            'encoding': self.encoding,
+            'stored_at': self.stored_at,
+            'features': self.features.to_dict() if self.features else None,
+            'scored': self.scored
+        }
+
+    @classmethod
+    def from_dict(cls, key, data):
+        from page_features import PageFeatures  # bs4: only loaded where pages are analyzed, not at web boot
+        features = data.get('features')
+        return cls(key, data['url'], etag=data.get('etag'), last_modified=data.get('last_modified'),
+                   content_hash=data.get('content_hash'), headers=data.get('headers'), encoding=data.get('encoding'),
+                   stored_at=data.get('stored_at'), features=PageFeatures.from_dict(features) if features else None,
+                   scored=data.get('scored'))
+
+class PageCache:
+    """
+    On-disk page cache shared by every worker process of the host.
+
+    Each entry is two files named after the hash of the normalized URL:
+    - <key>.json: validators, content hash, features and scores (mtime = last use, for LRU)
+    - <key>.body.gz: the compressed body (mtime = last fetch or 304 revalidation, for the TTL), read back
+      only to rebuild the features of an entry written by an older PAGE_CACHE_VERSION
+    Files are written to a temporary name then renamed, so readers never see a partial entry.
+    """
+
+    def __init__(self, directory=PAGE_CACHE_DIR, ttl=PAGE_CACHE_TTL, max_bytes=PAGE_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._evict_lock = threading.Lock()
+        self._stores = 0
+        self._stores_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + '.json', base + '.body.gz'
+
+    def _write_atomic(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def get(self, url):
+        """
+        Return the CachedPage for a URL, or None if missing, expired or unreadable.
+
+        An entry written by an older PAGE_CACHE_VERSION comes back without features nor scores, with its
+        body in entry.body: the caller rebuilds the features from it if the page has not changed.
+        """
+        normalized = normalize_url(url)
+        key = content_hash(normalized.encode('utf-8'))
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            outdated = data.get('version') != PAGE_CACHE_VERSION
+            if outdated:
+                data = dict(data, features=None, scored=None)  # Format or scoring rules of another version
+            entry = CachedPage.from_dict(key, data)
+            if outdated:
+                entry.body = self.read_body(entry)
+                if entry.body is None:
+                    self.delete(key)
+                    return None
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Dropping unreadable page cache entry for {normalized}: {str(e)}")
+            self.delete(key)
+            return None
+
+        if entry.url != normalized or time.time() - entry.stored_at > self.ttl:
+            self.delete(key)
+            return None
+        try:
+            os.utime(meta_path)  # Most recently used
+        except OSError:
+            pass
+        return entry
+
+    def read_body(self, entry):
+        """Stored body of an entry, or None if missing or unreadable."""
+        _, body_path = self._paths(entry.key)
+        try:
+            with open(body_path, 'rb') as f:
+                return gzip.decompress(f.read())
+        except (OSError, EOFError, zlib.error):
+            return None
+
+    def put(self, url, page, features, page_hash, scored=None):
+        """
+        Store a freshly fetched page.
+
+        Parameters:
+        - url: URL as requested (normalized here)
+        - page: fetcher.FetchResult
+        - features: PageFeatures extracted from the body
+        - page_hash: content_hash(page.content)
+        - scored: Optional {analysis_type: {'scores', 'details'}}
+
+        Returns:
+        - The stored CachedPage
+        """
+        normalized = normalize_url(url)
+        key = content_hash(normalized.encode('utf-8'))
+        entry = CachedPage(key, normalized, etag=page.headers.get('ETag'), last_modified=page.headers.get('Last-Modified'),
+                           content_hash=page_hash, headers=dict(page.headers), encoding=page.encoding,
+                           features=features, scored=scored)
+        meta_path, body_path = self._paths(key)
+        try:
+            self._write_atomic(body_path, gzip.compress(page.content, compresslevel=5))
+            self._write_atomic(meta_path, json.dumps(entry.to_dict()).encode('utf-8'))
+        except OSError as e:
+            logger.warning(f"Could not write page cache entry for {normalized}: {str(e)}")
+            return entry
+        # scandir + stat de tout le cache : pas à chaque page, la taille peut dépasser max_bytes entre deux passes
+        with self._stores_lock:
+            self._stores += 1
+            evict_now = self._stores % EVICT_EVERY == 1
+        if evict_now:
+            self.evict()
+        return entry
+
+    def save(self, entry, revalidated=False):
+        """Rewrite an entry's metadata (new scores, or a 304 that restarts its TTL)."""
+        if revalidated:
+            entry.stored_at = time.time()
+        meta_path, body_path = self._paths(entry.key)
+        try:
+            self._write_atomic(meta_path, json.dumps(entry.to_dict()).encode('utf-8'))
+            if revalidated:
+                os.utime(body_path)
+        except OSError as e:
+            logger.warning(f"Could not update page cache entry for {entry.url}: {str(e)}")
+
+    def delete(self, key):
+        for path in self._paths(key):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not delete page cache file {path}: {str(e)}")
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until the cache fits in max_bytes."""
+        if not self._evict_lock.acquire(blocking=False):
+            return  # Another thread of this process is already evicting
+        try:
+            now = time.time()
+            entries = {}  # key -> [total size, last use, stored at]
+            for dir_entry in os.scandir(self.directory):
+                name = dir_entry.name
+                if name.startswith('.tmp-'):
+                    # Leftover of a crashed write
+                    try:
+                        if now - dir_entry.stat().st_mtime > 3600:
+                            os.unlink(dir_entry.path)
+                    except OSError:
+                        pass
+                    continue
+                key, _, suffix = name.partition('.')
+                try:
+                    stat = dir_entry.stat()
+                except FileNotFoundError:
+                    continue
+                info = entries.setdefault(key, [0, 0.0, now])
+                info[0] += stat.st_size
+                if suffix == 'json':
+                    info[1] = stat.st_mtime
+                else:
+                    info[2] = stat.st_mtime
+
+            total = 0
+            for key, (size, last_use, stored_at) in list(entries.items()):
+                if now - stored_at > self.ttl:
+                    self.delete(key)
+                    del entries[key]
+                else:
+                    total += size
+
+            evicted = 0
+            for key, (size, last_use, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+                if total <= self.max_bytes:
+                    break
+                self.delete(key)
+                total -= size
+                evicted += 1
+            if evicted:
+                logger.info(f"Page cache: evicted {evicted} least recently used entries ({total} bytes left).")
+        finally:
+            self._evict_lock.release()
+
+_page_cache = None
+_page_cache_lock = threading.Lock()
+
+def get_page_cache():
+    """Return the process-wide PageCache, or None if caching is disabled or the directory is unusable."""
+    global _page_cache
+    if not PAGE_CACHE_ENABLED:
+        return None
+    with _page_cache_lock:
+        if _page_cache is None:
+            try:
+                _page_cache = PageCache()
+            except OSError as e:
+                logger.error(f"Page cache disabled: cannot use {PAGE_CACHE_DIR}: {str(e)}")
+                return None
+        return _page_cache
@@ -0,0 +1,361 @@
+import os
+import logging
+from bs4 import BeautifulSoup
+from bs4.builder import HTMLParserTreeBuilder, ParserRejectedMarkup
+from bs4.builder._htmlparser import BeautifulSoupHTMLParser
+from bs4.element import CData, NavigableString
+
+logger = logging.getLogger(__name__)
+
+HEADING_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+# Parser backends:
+# - 'html.parser' / 'lxml': build a BeautifulSoup tree, then extract_features() walks it once
+# - 'stream': event-based tokenizer that fills PageFeatures directly, without ever building a tree
+# - 'auto': 'html.parser' for normal pages, 'stream' above SEO_STREAMING_THRESHOLD_BYTES
+PARSER_BACKENDS = ('auto', 'html.parser', 'lxml', 'stream')
+SEO_PARSER_BACKEND = os.environ.get('SEO_PARSER_BACKEND', 'auto')
+SEO_STREAMING_THRESHOLD_BYTES = int(os.environ.get('SEO_STREAMING_THRESHOLD_BYTES', 1024 * 1024))
+STREAM_CHUNK_SIZE = 64 * 1024
+
+class PageFeatures:
+    """
+    Compact record of every signal the SEO scorers need from a page.
+
+    Built by extract_features() in a single walk over the parsed document so that
+    analyze_meta_tags, analyze_content and analyze_technical never walk the tree themselves.
+    """
+    __slots__ = ('title', 'metas_by_name', 'metas_by_property', 'headings', 'paragraphs',
+                 'image_count', 'images_with_alt', 'has_canonical', 'canonical_href', 'links', 'main_text')
+
+    def __init__(self):
+        self.title = None  # Text of the first <title> (None if missing or not a single string, like soup.title.string)
+        self.metas_by_name = {}  # name -> content of the first <meta name="..."> ('' if it has no content)
+        self.metas_by_property = {}  # property -> content of the first <meta property="..."> (Open Graph)
+        self.headings = {tag: 0 for tag in HEADING_TAGS}  # Histogram of h1..h6
+        self.paragraphs = []  # get_text(' ', strip=True) of every <p>, in document order
+        self.image_count = 0
+        self.images_with_alt = 0  # <img> with a non-blank alt attribute
+        self.has_canonical = False
+        self.canonical_href = None  # href of the first <link rel="canonical">
+        self.links = []  # href of every <a> without rel="nofollow", in document order (unresolved)
+        self.main_text = None  # Main content (content_extraction.extract_main_text), set by analyze_url; None if not extracted
+
+    @property
+    def paragraph_text(self):
+        """Non-empty paragraph texts joined with spaces."""
+        return " ".join(text for text in self.paragraphs if text)
+
+    @property
+    def content_text(self):
+        """Text of the page content (word count, readability, semantic analysis): the main content, else the <p> text."""
+        return self.main_text if self.main_text is not None else self.paragraph_text
+
+    @property
+    def word_count(self):
+        return len(self.content_text.split())
+
+    def followed_links(self):
+        """Links a crawler may follow: none if the page has <meta name="robots" content="nofollow">."""
+        robots = (self.metas_by_name.get('robots') or '').lower()
+        if 'nofollow' in robots or 'none' in robots.replace(' ', '').split(','):
+            return []
+        return self.links
+
+    def meta_content(self, name):
+        """Stripped content of <meta name=...>, or None if the tag is missing or empty."""
+        content = self.metas_by_name.get(name)
+        return content.strip() if content else None
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        features = cls()
+        for slot in cls.__slots__:
+            if slot in data:
+                setattr(features, slot, data[slot])
+        return features
+
+def extract_features(soup):
+    """
+    Collect PageFeatures from a BeautifulSoup document in one pass over its tags.
+
+    Parameters:
+    - soup: Parsed BeautifulSoup document
+
+    Returns:
+    - PageFeatures
+    """
+    features = PageFeatures()
+    seen_title = False
+
+    for tag in soup.find_all(True):
+        name = tag.name
+        if name == 'p':
+            features.paragraphs.append(tag.get_text(separator=' ', strip=True))
+        elif name in features.headings:
+            features.headings[name] += 1
+        elif name == 'a':
+            href = tag.get('href')
+            if href is not None and 'nofollow' not in (tag.get('rel') or []):
+                features.links.append(href)
+        elif name == 'img':
+            features.image_count += 1
+            if (tag.get('alt') or '').strip():
+                features.images_with_alt += 1
+        elif name == 'meta':
+            content = tag.get('content') or ''
+            meta_name = tag.get('name')
+            if meta_name is not None and meta_name not in features.metas_by_name:
+                features.metas_by_name[meta_name] = content
+            meta_property = tag.get('property')
+            if meta_property is not None and meta_property not in features.metas_by_property:
+                features.metas_by_property[meta_property] = content
+        elif name == 'link':
+            if not features.has_canonical and 'canonical' in (tag.get('rel') or []):
+                features.has_canonical = True
+                features.canonical_href = tag.get('href')
+        elif name == 'title' and not seen_title:
+            seen_title = True
+            title = tag.string
+            features.title = str(title) if title is not None else None
+
+    return features
+
+class _ResumingHTMLParser(BeautifulSoupHTMLParser):
+    """
+    BeautifulSoupHTMLParser that parses everything it is fed before returning.
+
+    html.parser stops at a '&#' that does not start a character reference and only resumes on the
+    next feed() or on close(); after a second one during close(), the rest of the document becomes
+    text. A document fed in one piece and the same document fed in chunks then give different
+    trees, so each feed() here resumes until no more progress is made.
+    """
+
+    def feed(self, data):
+        super().feed(data)
+        while self.rawdata:
+            pending = len(self.rawdata)
+            self.goahead(0)
+            if len(self.rawdata) == pending:  # Waiting for more markup (tag or reference split at the end)
+                break
+
+class _ResumingTreeBuilder(HTMLParserTreeBuilder):
+    """html.parser tree builder using _ResumingHTMLParser, for the 'html.parser' backend."""
+
+    def feed(self, markup):
+        args, kwargs = self.parser_args
+        parser = _ResumingHTMLParser(self.soup, *args, **kwargs)
+        try:
+            parser.feed(markup)
+            parser.close()
+        except AssertionError as e:
+            raise ParserRejectedMarkup(e)
+        parser.already_closed_empty_element = []
+
+class _TagEvent:
+    """Minimal stand-in for the Tag object BeautifulSoupHTMLParser expects back from handle_starttag."""
+    __slots__ = ('is_empty_element',)
+
+    def __init__(self, is_empty_element):
+        self.is_empty_element = is_empty_element
+
+_VOID_TAG = _TagEvent(True)
+_CONTAINER_TAG = _TagEvent(False)
+
+class _TitleNode:
+    __slots__ = ('depth', 'children')
+
+    def __init__(self, depth):
+        self.depth = depth  # Open-tag stack depth of the element this node stands for
+        self.children = []  # str for strings, _TitleNode for elements
+
+    def string(self):
+        """Same rule as bs4 Tag.string: the only child string, looking through single-child elements."""
+        if len(self.children) != 1:
+            return None
+        child = self.children[0]
+        return child if isinstance(child, str) else child.string()
+
+class StreamingFeatureParser:
+    """
+    Event-based feature extraction for the 'stream' backend.
+
+    Uses the same tokenizer adapter as BeautifulSoup's html.parser backend, but receives its
+    events here instead of in a BeautifulSoup object: only the stack of open tag names and the
+    text of the currently open <p>/<title> elements are kept in memory, so the scores are
+    identical to the 'html.parser' tree mode without the cost of building the tree.
+
+    Usage:
+        parser = StreamingFeatureParser()
+        parser.feed(chunk)  # any number of times
+        features = parser.close()
+    """
+
+    def __init__(self):
+        # Attributes read by BeautifulSoupHTMLParser on its "soup"
+        self.builder = HTMLParserTreeBuilder()
+        self.contains_replacement_characters = False
+
+        self.features = PageFeatures()
+        self._stack = []  # Names of the open elements (bs4's tagStack without the root)
+        self._open_counts = {}
+        self._open_string_containers = 0  # Open <script>, <style>, <template>, <rt>, <rp>
+        self._current_data = []
+        self._open_paragraphs = []  # [index in features.paragraphs, depth, stripped strings]
+        self._title_nodes = None  # Node stack while the first <title> is open
+        self._seen_title = False
+
+        args, kwargs = self.builder.parser_args
+        self._parser = _ResumingHTMLParser(self, *args, **kwargs)
+
+    def feed(self, markup):
+        try:
+            self._parser.feed(markup)
+        except AssertionError as e:
+            raise ParserRejectedMarkup(e)
+
+    def close(self):
+        try:
+            self._parser.close()
+        except AssertionError as e:
+            raise ParserRejectedMarkup(e)
+        self.endData()
+        while self._stack:
+            self.popTag()
+        return self.features
+
+    # --- Tree-builder API called by BeautifulSoupHTMLParser ---
+
+    def handle_starttag(self, name, namespace, nsprefix, attrs, sourceline=None, sourcepos=None, namespaces=None):
+        self.endData()
+        features = self.features
+
+        if name == 'p':
+            features.paragraphs.append('')
+            self._open_paragraphs.append([len(features.paragraphs) - 1, len(self._stack) + 1, []])
+        elif name in features.headings:
+            features.headings[name] += 1
+        elif name == 'a':
+            href = attrs.get('href')
+            if href is not None and 'nofollow' not in attrs.get('rel', '').split():
+                features.links.append(href)
+        elif name == 'img':
+            features.image_count += 1
+            if attrs.get('alt', '').strip():
+                features.images_with_alt += 1
+        elif name == 'meta':
+            content = attrs.get('content') or ''
+            meta_name = attrs.get('name')
+            if meta_name is not None and meta_name not in features.metas_by_name:
+                features.metas_by_name[meta_name] = content
+            meta_property = attrs.get('property')
+            if meta_property is not None and meta_property not in features.metas_by_property:
+                features.metas_by_property[meta_property] = content
+        elif name == 'link':
+            # rel is a multi-valued attribute: bs4 splits it on whitespace
+            if not features.has_canonical and 'canonical' in attrs.get('rel', '').split():
+                features.has_canonical = True
+                features.canonical_href = attrs.get('href')
+
+        self._stack.append(name)
+        self._open_counts[name] = self._open_counts.get(name, 0) + 1
+        if name in self.builder.string_containers:
+            self._open_string_containers += 1
+
+        if self._title_nodes is not None:
+            node = _TitleNode(len(self._stack))
+            self._title_nodes[-1].children.append(node)
+            self._title_nodes.append(node)
+        elif name == 'title' and not self._seen_title:
+            self._seen_title = True
+            self._title_nodes = [_TitleNode(len(self._stack))]
+
+        return _VOID_TAG if name in self.builder.empty_element_tags else _CONTAINER_TAG
+
+    def handle_endtag(self, name, nsprefix=None):
+        self.endData()
+        if not self._open_counts.get(name):
+            return
+        while self._stack:
+            if self.popTag() == name:
+                break
+
+    def handle_data(self, data):
+        self._current_data.append(data)
+
+    def endData(self, containerClass=None):
+        if not self._current_data:
+            return
+        data = "".join(self._current_data)
+        self._current_data = []
+
+        if self._title_nodes is not None:
+            self._title_nodes[-1].children.append(data)
+
+        # Only NavigableString and CData count for get_text(); comments, doctypes and strings
+        # inside script/style/template/ruby annotations are other NavigableString subclasses
+        if containerClass is None:
+            is_content = not self._open_string_containers
+        else:
+            is_content = containerClass in (NavigableString, CData)
+        if is_content and self._open_paragraphs:
+            stripped = data.strip()
+            if stripped:
+                for paragraph in self._open_paragraphs:
+                    paragraph[2].append(stripped)
+
+    def popTag(self):
+        depth = len(self._stack)
+        name = self._stack.pop()
+        self._open_counts[name] -= 1
+        if name in self.builder.string_containers:
+            self._open_string_containers -= 1
+
+        if name == 'p' and self._open_paragraphs and self._open_paragraphs[-1][1] == depth:
+            index, _, strings = self._open_paragraphs.pop()
+            self.features.paragraphs[index] = " ".join(strings)
+
+        if self._title_nodes is not None and self._title_nodes[-1].depth == depth:
+            node = self._title_nodes.pop()
+            if not self._title_nodes:
+                self._title_nodes = None
+                self.features.title = node.string()
+        return name
+
+    # Hooks of the html.parser XML detector (irrelevant here)
+    def _root_tag_encountered(self, name):
+        pass
+
+def _resolve_backend(backend, size):
+    backend = backend or SEO_PARSER_BACKEND
+    if backend not in PARSER_BACKENDS:
+        logger.warning(f"Unknown parser backend '{backend}', falling back to 'auto'.")
+        backend = 'auto'
+    if backend == 'auto':
+        backend = 'stream' if size > SEO_STREAMING_THRESHOLD_BYTES else 'html.parser'
+    return backend
+
+def parse_features(html, backend=None, size=None):
+    """
+    Parse an HTML document into PageFeatures with the configured backend.
+
+    Parameters:
+    - html: Document text
+    - backend: One of PARSER_BACKENDS (default: SEO_PARSER_BACKEND)
+    - size: Size of the raw document in bytes, used by 'auto' (default: len(html))
+
+    Returns:
+    - (PageFeatures, name of the backend actually used)
+    """
+    backend = _resolve_backend(backend, len(html) if size is None else size)
+    if backend == 'stream':
+        parser = StreamingFeatureParser()
+        for start in range(0, len(html), STREAM_CHUNK_SIZE):
+            parser.feed(html[start:start + STREAM_CHUNK_SIZE])
+        return parser.close(), backend
+    if backend == 'html.parser':
+        return extract_features(BeautifulSoup(html, builder=_ResumingTreeBuilder())), backend
+    return extract_features(BeautifulSoup(html, backend)), backend
@@ -4,15 +4,39 @@ import logging
 from datetime import datetime, timedelta
 from flask import Blueprint, request, redirect, url_for, flash, render_template, jsonify
 from flask_login import login_required, current_user
-import stripe
 from app import db
 from models import User, Subscription, PaymentHistory
+from metrics import stage_timer
+from entitlements import invalidate_entitlements
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Initialize Stripe
-stripe.api_key = os.environ.get('STRIPE_SECRET_KEY')
+def _init_stripe():
+    import stripe as stripe_module
+    stripe_module.api_key = os.environ.get('STRIPE_SECRET_KEY')
+
+    class _TimedStripeClient(stripe_module.RequestsClient):
+        """Stripe HTTP client timing every API call in the 'stripe' stage metrics (see metrics.py)."""
+
+        def request(self, method, url, headers, post_data=None):
+            with stage_timer('stripe'):
+                return super().request(method, url, headers, post_data)
+
+    stripe_module.default_http_client = _TimedStripeClient()
+    return stripe_module
+
+class _LazyStripe:
+    """The stripe module, imported and configured on first use: booting a worker does not need it."""
+    _module = None
+
+    def __getattr__(self, name):
+        if _LazyStripe._module is None:
+            _LazyStripe._module = _init_stripe()
+        return getattr(_LazyStripe._module, name)
+
+# Initialize Stripe (on first use)
+stripe = _LazyStripe()
 
 # Configuration for Stripe products
 STRIPE_PRODUCTS = {
@@ -252,6 +276,7 @@ def payment_success():
         user = User.query.get(current_user.id)
         user.subscription_status = plan_name
         user.subscription_ends_at = datetime.utcnow() + timedelta(days=30)
+        invalidate_entitlements(user)
         
         # Record payment
         payment = PaymentHistory(
@@ -373,6 +398,7 @@ def handle_subscription_updated(subscription):
 
                 if new_ends_at:
                     user.subscription_ends_at = new_ends_at
+                invalidate_entitlements(user)
                 logger.info(f"Webhook: Updated user {user.id} with plan '{user.subscription_status}' and ends_at '{user.subscription_ends_at}'")
 
             db_subscription_record.updated_at = datetime.utcnow()
@@ -394,6 +420,7 @@ def handle_subscription_deleted(subscription):
             user = User.query.get(sub.user_id)
             if user:
                 user.subscription_status = 'free'
+                invalidate_entitlements(user)
             
             db.session.commit()
             
@@ -451,6 +478,8 @@ def handle_payment_failed(invoice):
         
         # Update User model status
         user = User.query.get(sub.user_id)
+        if user:
+            invalidate_entitlements(user)  # The Subscription row is now past_due
         if user and user.subscription_status != 'free': # Only update if they weren't already free
             # Option 1: Revert to 'free'
             user.subscription_status = 'free'
@@ -0,0 +1,186 @@
+import json
+import time
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from app import db
+from utils import release_db_connection
+from models import AnalysisRecommendation
+from ai_integration import (get_seo_recommendations, stream_seo_recommendations, AIRecommendationError,
+                            metered_ai_usage, RECOMMENDATIONS_PROMPT_VERSION)
+from metrics import stage_timer, observe_stage
+from usage import record_ai_usage
+
+logger = logging.getLogger(__name__)
+
+# AI recommendations are generated once per (analysis, language), right after the analysis job,
+# and served from the database afterwards.
+RECOMMENDATION_ANALYSIS_TYPES = ['complete', 'deep']
+QUEUED_RECOMMENDATION_TIMEOUT = timedelta(minutes=5)  # A queued row older than this was abandoned by its worker
+
+def recommendation_lang(lang_code):
+    """Prompt language for a locale ('fr' or 'en')."""
+    return 'fr' if (lang_code or '').startswith('fr') else 'en'
+
+def details_for_prompt(analysis):
+    """
+    Rebuild the {"category.component": {...}} dictionary format_analysis_for_ai expects
+    from the details of an analysis.
+    """
+    details = {}
+    for detail_item in analysis.details:
+        details[f"{detail_item.category}.{detail_item.component}"] = {
+            "status": detail_item.status,
+            "score": detail_item.score,
+            "description": detail_item.description,
+        }
+    return details
+
+def get_recommendation(analysis_id, lang_code):
+    return AnalysisRecommendation.query.filter_by(analysis_id=analysis_id, lang_code=recommendation_lang(lang_code)).first()
+
+def is_servable(recommendation):
+    """True if the stored copy can be served as is."""
+    return (recommendation is not None and recommendation.status == 'ready'
+            and recommendation.prompt_version == RECOMMENDATIONS_PROMPT_VERSION)
+
+def is_pending(recommendation):
+    """True while a worker is (still plausibly) generating this recommendation."""
+    return (recommendation is not None and recommendation.status == 'queued'
+            and recommendation.prompt_version == RECOMMENDATIONS_PROMPT_VERSION
+            and recommendation.created_at is not None
+            and datetime.utcnow() - recommendation.created_at < QUEUED_RECOMMENDATION_TIMEOUT)
+
+def queue_recommendation(analysis, lang_code):
+    """Add a queued recommendation row for an analysis (caller commits)."""
+    recommendation = AnalysisRecommendation(analysis_id=analysis.id, lang_code=recommendation_lang(lang_code),
+                                            prompt_version=RECOMMENDATIONS_PROMPT_VERSION, status='queued')
+    db.session.add(recommendation)
+    return recommendation
+
+def _get_or_create(analysis, lang_code):
+    recommendation = get_recommendation(analysis.id, lang_code)
+    if recommendation:
+        return recommendation
+    recommendation = queue_recommendation(analysis, lang_code)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker created it in the meantime
+        db.session.rollback()
+        recommendation = get_recommendation(analysis.id, lang_code)
+    return recommendation
+
+def generate_recommendation(analysis, lang_code, use_cache=True):
+    """
+    Ask the AI for recommendations on an analysis and store them.
+
+    Parameters:
+    - analysis: Analysis (complete or deep)
+    - lang_code: Locale of the recommendations
+    - use_cache: False to bypass the AI response cache (explicit regeneration)
+
+    Returns:
+    - The ready AnalysisRecommendation
+
+    Raises AIRecommendationError (the row is marked failed; fallbacks are never stored).
+    """
+    lang_code = recommendation_lang(lang_code)
+    recommendation = _get_or_create(analysis, lang_code)
+    details = details_for_prompt(analysis)
+    release_db_connection()
+    try:
+        with stage_timer('recommendations'), metered_ai_usage() as ai_usage:
+            data = get_seo_recommendations(
+                url=analysis.url,
+                analysis_type=analysis.analysis_type,
+                analysis_details=details,
+                lang_code=lang_code,
+                use_cache=use_cache,
+                raise_errors=True
+            )
+    except AIRecommendationError as e:
+        record_ai_usage(analysis.user_id, ai_usage)  # A response that did not parse was paid for too
+        _mark_failed(recommendation, e)
+        raise
+    record_ai_usage(analysis.user_id, ai_usage)
+    return _store(recommendation, data)
+
+def stream_recommendation(analysis, lang_code, use_cache=True):
+    """
+    Streaming variant of generate_recommendation: generator of the raw JSON text deltas,
+    stored like generate_recommendation once the response is complete.
+
+    If the consumer closes the generator early (client disconnected), the rest of the response is
+    still read and stored: it is paid for, and the next visit gets it from the database.
+
+    Raises AIRecommendationError (the row is marked failed).
+    """
+    lang_code = recommendation_lang(lang_code)
+    recommendation = _get_or_create(analysis, lang_code)
+    details = details_for_prompt(analysis)
+    release_db_connection()
+    started = time.perf_counter()
+    deltas = stream_seo_recommendations(
+        url=analysis.url,
+        analysis_type=analysis.analysis_type,
+        analysis_details=details,
+        lang_code=lang_code,
+        use_cache=use_cache
+    )
+    chunks = []
+    client_gone = False
+    try:
+        with metered_ai_usage() as ai_usage:
+            try:
+                for delta in deltas:
+                    chunks.append(delta)
+                    yield delta
+            except GeneratorExit:
+                logger.info(f"AI recommendations stream for analysis {analysis.id} closed by the client, finishing it anyway")
+                client_gone = True
+                chunks.extend(deltas)
+    except AIRecommendationError as e:
+        observe_stage('recommendations', time.perf_counter() - started, error=True)
+        record_ai_usage(analysis.user_id, ai_usage)
+        _mark_failed(recommendation, e)
+        if client_gone:
+            return  # Nobody left to tell (close() must not raise)
+        raise
+    observe_stage('recommendations', time.perf_counter() - started)  # Until the last delta, like the non-streamed call
+    record_ai_usage(analysis.user_id, ai_usage)
+    _store(recommendation, json.loads(''.join(chunks)))  # Validated JSON (json_mode)
+
+def _mark_failed(recommendation, error):
+    # A previously stored copy stays servable if a regeneration fails
+    if recommendation.status != 'ready':
+        recommendation.status = 'failed'
+    recommendation.error = str(error)
+    db.session.commit()
+
+def _store(recommendation, data):
+    recommendation.data = json.dumps(data, ensure_ascii=False)
+    recommendation.status = 'ready'
+    recommendation.error = None
+    recommendation.prompt_version = RECOMMENDATIONS_PROMPT_VERSION
+    recommendation.generated_at = datetime.utcnow()
+    db.session.commit()
+    logger.info(f"Stored AI recommendations for analysis {recommendation.analysis_id} ({recommendation.lang_code}, prompt v{RECOMMENDATIONS_PROMPT_VERSION})")
+    return recommendation
+
+def generate_queued_recommendations(analysis):
+    """Generate the recommendations queued for an analysis (called by the job runner once the analysis is saved)."""
+    queued = AnalysisRecommendation.query.filter_by(analysis_id=analysis.id, status='queued').all()
+    for recommendation in queued:
+        try:
+            generate_recommendation(analysis, recommendation.lang_code)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Background AI recommendations failed for analysis {analysis.id} ({recommendation.lang_code}): {str(e)}")
+
+def recommendation_to_dict(recommendation):
+    data = json.loads(recommendation.data)
+    data['lang_code'] = recommendation.lang_code
+    data['prompt_version'] = recommendation.prompt_version
+    data['generated_at'] = recommendation.generated_at.isoformat() if recommendation.generated_at else None
+    return data
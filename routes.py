@@ -1,12 +1,23 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request, current_app, url_for, Response, stream_with_context
 from flask_login import login_required, current_user
 from datetime import datetime, timedelta
 from utils import requires_subscription # Ajout de l'import
-from models import Analysis, User, AnalysisDetail # AnalysisDetail ajouté
-from collections import defaultdict
+from models import Analysis, User, AnalysisJob, AnalysisBatch, Crawl
+from sqlalchemy.orm import undefer
 from app import db
 # Importer la fonction pour obtenir les recommandations IA
-from ai_integration import get_seo_recommendations, format_analysis_for_ai as format_details_for_ai_prompt
+from ai_integration import AIRecommendationError, fallback_recommendations, ai_client_configured
+from recommendations import (recommendation_lang, get_recommendation, is_servable, is_pending,
+                             generate_recommendation, stream_recommendation, recommendation_to_dict)
+from streaming import SSE_HEADERS, sse_event, sse_comment, RecommendationStreamAssembler
+from translation import get_locale
+from jobs import enqueue_analysis, job_to_dict
+from batches import BatchInputError, parse_batch_urls, create_batch, batch_to_dict
+from crawler import CrawlInputError, parse_crawl_request, create_crawl, start_crawl_runner, is_stale, crawl_to_dict
+from analysis_list import AnalysisQueryError, parse_analysis_query, list_analyses
+from analysis_stats import dashboard_totals, weekly_stats
+from entitlements import get_entitlements
+from usage import QuotaExceededError
 
 api_bp = Blueprint('api', __name__)
 
@@ -14,16 +25,14 @@ api_bp = Blueprint('api', __name__)
 @login_required
 # Removed @requires_subscription(['enterprise'], is_api_route=True) - All authenticated users can list their own analyses
 def get_analyses():
-    """Get all analyses for current user"""
+    """
+    Page of the current user's analyses, newest first: {"analyses": [...], "next_cursor": ...}.
+    Query: limit, cursor, fields, url_prefix, type, created_from, created_to, min_score, max_score (see analysis_list.py)
+    """
     try:
-        analyses = Analysis.query.filter_by(user_id=current_user.id).order_by(Analysis.created_at.desc()).all()
-        result = [{
-            'id': analysis.id, 'url': analysis.url, 'analysis_type': analysis.analysis_type,
-            'created_at': analysis.created_at.isoformat(), 'meta_score': analysis.meta_score or 0,
-            'content_score': analysis.content_score or 0, 'technical_score': analysis.technical_score or 0,
-            'overall_score': analysis.overall_score or 0
-        } for analysis in analyses]
-        return jsonify(result)
+        return jsonify(list_analyses(current_user.id, parse_analysis_query(request.args)))
+    except AnalysisQueryError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error in /api/analyses: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
@@ -34,13 +43,15 @@ def get_analyses():
 def get_analysis_details_route(analysis_id): # Renommé pour éviter conflit avec une potentielle variable 'analysis'
     """Get specific analysis details"""
     try:
-        analysis_obj = Analysis.query.filter_by(id=analysis_id, user_id=current_user.id).first()
+        # Une seule requête : la ligne de l'analyse avec le blob de ses détails
+        analysis_obj = Analysis.query.options(undefer(Analysis.details_data)).filter_by(id=analysis_id, user_id=current_user.id).first()
         if not analysis_obj:
             return jsonify({'error': 'Analysis not found'}), 404
         
         details_list = [{
             'category': detail.category, 'component': detail.component, 'status': detail.status,
-            'score': detail.score, 'description': detail.description, 'recommendation': detail.recommendation
+            'score': detail.score, 'description': detail.description, 'recommendation': detail.recommendation,
+            'code': detail.message_code, 'params': detail.params
         } for detail in analysis_obj.details]
         
         result = {
@@ -54,6 +65,32 @@ def get_analysis_details_route(analysis_id): # Renommé pour éviter conflit ave
         current_app.logger.error(f"Error in /api/analyses/<id>: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+def _recommendations_analysis(analysis_id):
+    """
+    Analysis of the current user whose AI recommendations are requested.
+
+    Returns:
+    - (analysis, None), or (None, error response) if it is missing or not eligible
+    """
+    current_app.logger.info(f"Request for AI recommendations for analysis ID: {analysis_id} by user {current_user.id}")
+    analysis = Analysis.query.filter_by(id=analysis_id, user_id=current_user.id).first()
+
+    if not analysis:
+        current_app.logger.warning(f"Analysis ID {analysis_id} not found for user {current_user.id}")
+        return None, (jsonify({'error': 'Analysis not found or not authorized'}), 404)
+
+    # Le plan a déjà été résolu pour cette requête par @requires_subscription (entitlements.get_entitlements)
+    entitlements = get_entitlements()
+    if not entitlements.has_plan(['premium', 'enterprise']):
+        current_app.logger.warning(f"User {current_user.id} (plan: {entitlements.plan}) reached AI recommendations without eligible plan (should be caught by decorator).")
+        return None, (jsonify({'error': 'Access to AI recommendations requires an active Premium or Enterprise plan.'}), 403)
+
+    if not analysis.analysis_type in ['complete', 'deep']:
+        current_app.logger.info(f"User {current_user.id} (plan: {entitlements.plan}) not eligible for AI recommendations because analysis type is '{analysis.analysis_type}'. Requires 'complete' or 'deep'.")
+        return None, (jsonify({'error': f"AI recommendations are only available for 'complete' or 'deep' analysis types. This analysis is type '{analysis.analysis_type}'."}), 403)
+
+    return analysis, None
+
 # NOUVELLE ROUTE POUR LES RECOMMANDATIONS IA
 @api_bp.route('/ai-recommendations/<int:analysis_id>')
 @login_required
@@ -61,80 +98,89 @@ def get_analysis_details_route(analysis_id): # Renommé pour éviter conflit ave
 def ai_recommendations_route(analysis_id):
     """Get AI-powered SEO recommendations for a specific analysis."""
     try:
-        current_app.logger.info(f"Request for AI recommendations for analysis ID: {analysis_id} by user {current_user.id}")
-        analysis = Analysis.query.filter_by(id=analysis_id, user_id=current_user.id).first()
+        analysis, error_response = _recommendations_analysis(analysis_id)
+        if error_response:
+            return error_response
 
-        if not analysis:
-            current_app.logger.warning(f"Analysis ID {analysis_id} not found for user {current_user.id}")
-            return jsonify({'error': 'Analysis not found or not authorized'}), 404
+        # Les recommandations sont générées une fois (en arrière-plan à la fin du job) puis servies depuis la base.
+        # ?refresh=1 force une nouvelle génération (sans passer par le cache des réponses IA) ;
+        # un changement de RECOMMENDATIONS_PROMPT_VERSION les régénère aussi.
+        lang_code = recommendation_lang(get_locale())
+        refresh = request.args.get('refresh') == '1'
+        recommendation = get_recommendation(analysis.id, lang_code)
 
-        # Vérifier si l'utilisateur a le droit aux recommandations IA.
-        # Le décorateur @requires_subscription gère déjà l'accès au plan ['premium', 'enterprise'] avec un statut actif.
-        # Il reste donc à vérifier ici principalement le type d'analyse.
-        # Et par sécurité, on peut revérifier le plan/statut au cas où un admin sans le bon plan passerait le décorateur.
-        
-        user_sub = getattr(current_user, 'subscription', None)
-        is_eligible_plan = False
-        if user_sub and user_sub.status == 'active' and user_sub.plan in ['premium', 'enterprise']:
-            is_eligible_plan = True
-        
-        # Si l'utilisateur est admin, il outrepasse la vérification de plan du décorateur,
-        # mais nous voulons quand même nous assurer que la fonctionnalité est utilisée dans un contexte de plan attendu si possible,
-        # ou au moins que le type d'analyse est correct.
-        # Pour un admin, on peut être plus souple sur le plan exact s'il teste, mais le type d'analyse reste pertinent.
-
-        if not ( (hasattr(current_user, 'is_admin') and current_user.is_admin) or is_eligible_plan ):
-            # Ce cas ne devrait pas être atteint si le décorateur fonctionne pour les non-admins,
-            # sauf si l'admin n'a pas de plan premium/enterprise.
-            # Le message du décorateur est plus précis pour les non-admins.
-            current_app.logger.warning(f"User {current_user.id} (plan: {user_sub.plan if user_sub else 'None'}, status: {user_sub.status if user_sub else 'None'}) reached AI recommendations without eligible plan (should be caught by decorator).")
-            return jsonify({'error': 'Access to AI recommendations requires an active Premium or Enterprise plan.'}), 403
-
-        if not analysis.analysis_type in ['complete', 'deep']:
-            current_app.logger.info(f"User {current_user.id} (plan: {user_sub.plan if user_sub else 'N/A'}) not eligible for AI recommendations because analysis type is '{analysis.analysis_type}'. Requires 'complete' or 'deep'.")
-            return jsonify({'error': f"AI recommendations are only available for 'complete' or 'deep' analysis types. This analysis is type '{analysis.analysis_type}'."}), 403
-
-        # Récupérer les AnalysisDetail et les formater pour la fonction get_seo_recommendations
-        # La fonction get_seo_recommendations attend un dictionnaire de détails.
-        # Nous devons reconstruire ce dictionnaire à partir des objets AnalysisDetail.
-        analysis_details_from_db = AnalysisDetail.query.filter_by(analysis_id=analysis.id).all()
-        
-        # Reformater les détails pour correspondre à ce que seo_analyzer.py produirait initialement
-        # et ce que format_analysis_for_ai attend.
-        # La fonction format_analysis_for_ai attend un dictionnaire où les clés sont comme "category.component"
-        # et les valeurs sont des dictionnaires avec "status", "score", "description".
-        
-        formatted_details_for_prompt = {}
-        for detail_item in analysis_details_from_db:
-            key = f"{detail_item.category}.{detail_item.component}"
-            formatted_details_for_prompt[key] = {
-                "status": detail_item.status,
-                "score": detail_item.score,
-                "description": detail_item.description,
-                # La valeur originale n'est pas stockée dans AnalysisDetail, donc on ne peut pas la passer ici.
-                # Ce n'est pas grave si format_analysis_for_ai gère l'absence de 'value'.
-            }
-        
-        current_app.logger.debug(f"Formatted details for AI prompt: {formatted_details_for_prompt}")
+        if not refresh and is_servable(recommendation):
+            return jsonify(recommendation_to_dict(recommendation))
+        if not refresh and is_pending(recommendation):
+            # Le worker est encore en train de les générer : le client réessaie
+            return jsonify({'status': 'pending'}), 202, {'Retry-After': '3'}
+
+        try:
+            recommendation = generate_recommendation(analysis, lang_code, use_cache=not refresh)
+        except AIRecommendationError:
+            if recommendation is not None and recommendation.status == 'ready' and recommendation.data:
+                return jsonify(recommendation_to_dict(recommendation))  # Copie précédente plutôt qu'une erreur
+            return jsonify(fallback_recommendations(lang_code, api_key_missing=not ai_client_configured()))
 
-        # Obtenir la langue de l'utilisateur (si vous avez un système de i18n pour les préférences utilisateur)
-        # Pour l'instant, on peut utiliser la langue de la requête ou une valeur par défaut.
-        lang_code = request.accept_languages.best_match(['fr', 'en']) or 'en'
-        
-        recommendations = get_seo_recommendations(
-            url=analysis.url,
-            analysis_type=analysis.analysis_type,
-            analysis_details=formatted_details_for_prompt, # Utiliser les détails formatés
-            lang_code=lang_code
-        )
-        
         current_app.logger.info(f"Successfully generated AI recommendations for analysis ID: {analysis_id}")
-        return jsonify(recommendations)
+        return jsonify(recommendation_to_dict(recommendation))
 
     except Exception as e:
         current_app.logger.error(f"Error in /ai-recommendations/{analysis_id}: {str(e)}", exc_info=True)
         return jsonify({'error': 'Failed to generate AI recommendations', 'details': str(e)}), 500
 
+@api_bp.route('/ai-recommendations/<int:analysis_id>/stream')
+@login_required
+@requires_subscription(['premium', 'enterprise'], is_api_route=True)
+def ai_recommendations_stream_route(analysis_id):
+    """
+    Same as /ai-recommendations/<id>, delivered as Server-Sent Events while DeepSeek writes them.
+
+    Events: 'text' and 'item' (see RecommendationStreamAssembler) while generating, then 'done' with the
+    full recommendations (a stored copy is sent as 'done' right away), or 'pending' with 'retry_after'
+    when the background worker is still generating them.
+    """
+    analysis, error_response = _recommendations_analysis(analysis_id)
+    if error_response:
+        return error_response
+
+    lang_code = recommendation_lang(get_locale())
+    refresh = request.args.get('refresh') == '1'
+
+    def generate():
+        yield sse_comment('recommendations')  # Headers and first bytes go out before DeepSeek answers
+        try:
+            recommendation = get_recommendation(analysis.id, lang_code)
+            if not refresh and is_servable(recommendation):
+                yield sse_event('done', recommendation_to_dict(recommendation))
+                return
+            if not refresh and is_pending(recommendation):
+                yield sse_event('pending', {'retry_after': 3})
+                return
+
+            assembler = RecommendationStreamAssembler()
+            deltas = stream_recommendation(analysis, lang_code, use_cache=not refresh)
+            try:
+                for delta in deltas:
+                    for event, data in assembler.feed(delta):
+                        yield sse_event(event, data)
+            except AIRecommendationError:
+                recommendation = get_recommendation(analysis.id, lang_code)
+                if recommendation is not None and recommendation.status == 'ready' and recommendation.data:
+                    yield sse_event('done', recommendation_to_dict(recommendation))
+                else:
+                    yield sse_event('done', fallback_recommendations(lang_code, api_key_missing=not ai_client_configured()))
+                return
+            finally:
+                deltas.close()  # Client gone: the generation is finished and stored anyway
+            current_app.logger.info(f"Successfully streamed AI recommendations for analysis ID: {analysis_id}")
+            yield sse_event('done', recommendation_to_dict(get_recommendation(analysis.id, lang_code)))
+        except Exception as e:
+            current_app.logger.error(f"Error in /ai-recommendations/{analysis_id}/stream: {str(e)}", exc_info=True)
+            yield sse_event('error', {'error': 'Failed to generate AI recommendations'})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+
 
 @api_bp.route('/profile/stats') 
 @login_required
@@ -148,17 +194,8 @@ def profile_stats():
         elif period == 'last_quarter': start_date = now - timedelta(days=90)
         elif period == 'last_year': start_date = now - timedelta(days=365)
         else: start_date = now - timedelta(days=30)
-        analyses = Analysis.query.filter(Analysis.user_id == current_user.id, Analysis.created_at >= start_date).all()
-        data_by_week = defaultdict(lambda: {'analyses': 0, 'avg_score': 0, 'total_score': 0})
-        for analysis_item in analyses: # Renommé pour éviter conflit
-            week_label = analysis_item.created_at.strftime('Week %U')
-            data_by_week[week_label]['analyses'] += 1
-            score = analysis_item.overall_score or 0
-            data_by_week[week_label]['total_score'] += score
-        for week_data in data_by_week.values():
-            if week_data['analyses'] > 0: week_data['avg_score'] = week_data['total_score'] / week_data['analyses']
-        sorted_weeks = sorted(data_by_week.keys())
-        return jsonify({'labels': sorted_weeks, 'analyses': [data_by_week[week]['analyses'] for week in sorted_weeks], 'scores': [data_by_week[week]['avg_score'] for week in sorted_weeks]})
+        weeks = weekly_stats(current_user.id, start_date)
+        return jsonify({'labels': [week.strftime('Week %U') for week, _, _ in weeks], 'analyses': [count for _, count, _ in weeks], 'scores': [avg_score for _, _, avg_score in weeks]})
     except Exception as e:
         current_app.logger.error(f"Error in /api/profile/stats: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
@@ -169,9 +206,7 @@ def profile_stats():
 def dashboard_summary():
     # ... (code existant inchangé)
     try:
-        total_analyses = Analysis.query.filter_by(user_id=current_user.id).count()
-        analyses_items = Analysis.query.filter_by(user_id=current_user.id).all() # Renommé
-        avg_score = sum(a.overall_score or 0 for a in analyses_items) / len(analyses_items) if analyses_items else 0
+        total_analyses, avg_score = dashboard_totals(current_user.id)  # Un seul COUNT/AVG (ou la table de cumuls)
         recent_analyses_items = Analysis.query.filter_by(user_id=current_user.id).order_by(Analysis.created_at.desc()).limit(5).all() # Renommé
         recent_data = [{'id': item.id, 'url': item.url, 'analysis_type': item.analysis_type, 'created_at': item.created_at.isoformat(), 'overall_score': item.overall_score or 0} for item in recent_analyses_items]
         return jsonify({'total_analyses': total_analyses, 'avg_score': round(avg_score, 1), 'recent_analyses': recent_data, 'subscription_status': current_user.subscription_status})
@@ -179,6 +214,16 @@ def dashboard_summary():
         current_app.logger.error(f"Error in /api/dashboard/summary: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/entitlements')
+@login_required
+def get_entitlements_route():
+    """Plan, monthly usage and allowed analysis types of the current user"""
+    try:
+        return jsonify(get_entitlements().to_dict())
+    except Exception as e:
+        current_app.logger.error(f"Error in /api/entitlements: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
 @api_bp.route('/analyze', methods=['POST']) 
 @login_required
 @requires_subscription(['enterprise'], is_api_route=True)
@@ -192,57 +237,137 @@ def analyze_url_route(): # Renommé
         if not url:
             return jsonify({'error': 'URL is required'}), 400
 
-        # Monthly analysis limits (consistent with main_routes.py)
-        # Note: This route is already protected by @requires_subscription(['enterprise'])
-        # So, this internal limit check for 'free' or 'basic' will likely not be hit
-        # unless the decorator logic changes or fails.
-        # However, for consistency in the function's structure:
-        user_plan = getattr(current_user, 'subscription_status', 'free')
-
-        ANALYSIS_LIMITS = {
-            'free': 5,
-            'basic': 25,
-        }
+        entitlements = get_entitlements()
+        denied = entitlements.check_analysis(analysis_type)
+        if denied:
+            message, reason = denied
+            return jsonify({'error': message}), 400 if reason == 'invalid_type' else 403
 
-        if user_plan in ANALYSIS_LIMITS:
-            limit = ANALYSIS_LIMITS[user_plan]
-            month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            monthly_count = Analysis.query.filter(
-                Analysis.user_id == current_user.id,
-                Analysis.created_at >= month_start
-            ).count()
-            
-            if monthly_count >= limit:
-                return jsonify({'error': f'Monthly analysis limit of {limit} reached for your {user_plan} plan. Please upgrade your plan or wait until next month.'}), 403
-        
-        # Check analysis type permissions based on plan
-        # Note: This route is already protected by @requires_subscription(['enterprise'])
-        # So, user_plan here should ideally be 'enterprise' if decorator works.
-        # This internal check adds another layer or would be primary if decorator was different.
-        ANALYSIS_TYPE_PERMISSIONS = {
-            'meta': ['free', 'basic', 'premium', 'enterprise'],
-            'partial': ['basic', 'premium', 'enterprise'],
-            'complete': ['premium', 'enterprise'],
-            'deep': ['enterprise'] 
-        }
+        try:
+            job = enqueue_analysis(current_user.id, url, analysis_type, lang_code=get_locale(),
+                                   monthly_limit=entitlements.monthly_limit)
+        except QuotaExceededError as e:
+            return jsonify({'error': str(e)}), 403
+        return jsonify({
+            'id': job.analysis_id, 'job_id': job.id, 'status': job.status,
+            'status_url': url_for('api.get_job_route', job_id=job.id), 'message': 'Analysis queued.'
+        }), 202
+    except Exception as e:
+        db.session.rollback(); current_app.logger.error(f"Error in /api/analyze: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
 
-        allowed_plans_for_requested_type = ANALYSIS_TYPE_PERMISSIONS.get(analysis_type)
+@api_bp.route('/analyses/batch', methods=['POST'])
+@login_required
+@requires_subscription(['enterprise'], is_api_route=True)
+def create_batch_route():
+    """
+    Queue a bulk analysis: JSON {"urls": [...], "analysis_type": "partial"} or a multipart upload
+    with a CSV 'file' (a 'url' column, or URLs in the first column) and an 'analysis_type' field.
+    """
+    try:
+        if request.is_json:
+            data = request.get_json()
+            analysis_type = data.get('analysis_type', 'partial')
+            urls = parse_batch_urls(data=data)
+        else:
+            csv_file = request.files.get('file')
+            if csv_file is None:
+                return jsonify({'error': "Send JSON {'urls': [...]} or a CSV file in the 'file' field."}), 400
+            analysis_type = request.form.get('analysis_type', 'partial')
+            urls = parse_batch_urls(csv_file=csv_file)
 
-        if allowed_plans_for_requested_type is None:
+        if analysis_type not in ['meta', 'partial', 'complete', 'deep']:
             return jsonify({'error': f"Invalid analysis type requested: {analysis_type}"}), 400
 
-        # user_plan was defined above for monthly limits.
-        # If this route is strictly 'enterprise' due to decorator, this check might seem redundant
-        # for 'enterprise' users but is good practice.
-        if user_plan not in allowed_plans_for_requested_type:
-            return jsonify({'error': f"The requested analysis type '{analysis_type}' is not available for your current plan ('{user_plan}'). Please upgrade your plan."}), 403
+        batch = create_batch(current_user.id, urls, analysis_type)
+        return jsonify({
+            'id': batch.id, 'status': batch.status, 'total': batch.total,
+            'status_url': url_for('api.get_batch_route', batch_id=batch.id), 'message': 'Batch queued.'
+        }), 202
+    except BatchInputError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback(); current_app.logger.error(f"Error in /api/analyses/batch: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
 
-        analysis_obj = Analysis(url=url, analysis_type=analysis_type, user_id=current_user.id)
-        db.session.add(analysis_obj)
+@api_bp.route('/analyses/batch/<int:batch_id>')
+@login_required
+@requires_subscription(['enterprise'], is_api_route=True)
+def get_batch_route(batch_id):
+    """Aggregate progress of a batch and its per-URL results (?results=0 for the progress only)"""
+    try:
+        batch = AnalysisBatch.query.filter_by(id=batch_id, user_id=current_user.id).first()
+        if not batch:
+            return jsonify({'error': 'Batch not found'}), 404
+        return jsonify(batch_to_dict(batch, include_results=request.args.get('results') != '0'))
+    except Exception as e:
+        current_app.logger.error(f"Error in /api/analyses/batch/{batch_id}: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/crawls', methods=['POST'])
+@login_required
+@requires_subscription(['enterprise'], is_api_route=True)
+def create_crawl_route():
+    """Start a site crawl: JSON {"url": seed, "analysis_type": "partial", "max_pages": 100, "max_depth": 3}"""
+    try:
+        seed_url, analysis_type, max_pages, max_depth = parse_crawl_request(request.get_json(silent=True))
+        crawl = create_crawl(current_user.id, seed_url, analysis_type, max_pages, max_depth)
+        return jsonify({
+            'id': crawl.id, 'status': crawl.status, 'max_pages': crawl.max_pages, 'max_depth': crawl.max_depth,
+            'status_url': url_for('api.get_crawl_route', crawl_id=crawl.id), 'message': 'Crawl queued.'
+        }), 202
+    except CrawlInputError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback(); current_app.logger.error(f"Error in /api/crawls: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/crawls/<int:crawl_id>')
+@login_required
+@requires_subscription(['enterprise'], is_api_route=True)
+def get_crawl_route(crawl_id):
+    """Progress and site-level report of a crawl, with every page (?pages=0 for the report only)"""
+    try:
+        crawl = Crawl.query.filter_by(id=crawl_id, user_id=current_user.id).first()
+        if not crawl:
+            return jsonify({'error': 'Crawl not found'}), 404
+        return jsonify(crawl_to_dict(crawl, include_pages=request.args.get('pages') != '0'))
+    except Exception as e:
+        current_app.logger.error(f"Error in /api/crawls/{crawl_id}: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/crawls/<int:crawl_id>/resume', methods=['POST'])
+@login_required
+@requires_subscription(['enterprise'], is_api_route=True)
+def resume_crawl_route(crawl_id):
+    """Resume a failed crawl, or a running one whose runner died, from its stored frontier"""
+    try:
+        crawl = Crawl.query.filter_by(id=crawl_id, user_id=current_user.id).first()
+        if not crawl:
+            return jsonify({'error': 'Crawl not found'}), 404
+        if crawl.status != 'failed' and not is_stale(crawl):
+            return jsonify({'error': f"Crawl is {crawl.status}, nothing to resume."}), 409
+        crawl.status = 'queued'
+        crawl.error = None
+        crawl.finished_at = None
         db.session.commit()
-        return jsonify({'id': analysis_obj.id, 'status': 'created', 'message': 'Analysis started...'})
+        start_crawl_runner(crawl.id)
+        return jsonify({'id': crawl.id, 'status': crawl.status, 'message': 'Crawl resumed.'}), 202
     except Exception as e:
-        db.session.rollback(); current_app.logger.error(f"Error in /api/analyze: {str(e)}", exc_info=True)
+        db.session.rollback(); current_app.logger.error(f"Error in /api/crawls/{crawl_id}/resume: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/jobs/<int:job_id>')
+@login_required
+def get_job_route(job_id):
+    """Get the progress of a background analysis job (polled by the report page)"""
+    try:
+        job = AnalysisJob.query.filter_by(id=job_id, user_id=current_user.id).first()
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job_to_dict(job))
+    except Exception as e:
+        current_app.logger.error(f"Error in /api/jobs/{job_id}: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 @api_bp.route('/user/profile') 
@@ -0,0 +1,129 @@
+import os
+import re
+import sys
+import logging
+from string import Formatter
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import text, select, update
+from app import db
+from models import Analysis
+from translation import Catalogs
+from analysis_details import encode_details, decode_details
+
+logger = logging.getLogger(__name__)
+
+# Le schéma est géré par les migrations Alembic de migrations/versions (alembic.ini). `python schema.py upgrade`
+# les applique (gunicorn.conf.py le lance une fois, avant de démarrer les workers) ; une base créée avant elles
+# par db.create_all() est reprise par la migration initiale, qui ne crée que ce qui manque.
+MIGRATIONS_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'alembic.ini')
+MIGRATION_LOCK_ID = 72_115_001  # PostgreSQL advisory lock: one process migrates, the others wait for it
+BACKFILL_BATCH_SIZE = 500  # Analyses per transaction
+
+def migrations_config():
+    return Config(MIGRATIONS_CONFIG)
+
+def upgrade_database(revision='head'):
+    """
+    Apply the migrations up to revision, in one transaction. Several processes migrating at once
+    (replicas starting together) take turns: the others find the database already up to date.
+    """
+    config = migrations_config()
+    with db.engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {'id': MIGRATION_LOCK_ID})
+        config.attributes['connection'] = conn
+        command.upgrade(config, revision)
+
+def current_revision():
+    """Revision the database is at (None before the first migration)."""
+    with db.engine.connect() as conn:
+        return MigrationContext.configure(conn).get_current_revision()
+
+def _message_pattern(template):
+    """Regex matching the texts rendered from a catalog template; its {placeholders} become named groups."""
+    pattern, seen = '', set()
+    for literal, name, _, _ in Formatter().parse(template):
+        pattern += re.escape(literal)
+        if name:
+            pattern += f"(?P={name})" if name in seen else f"(?P<{name}>.*)"
+            seen.add(name)
+    return re.compile(pattern, re.DOTALL)
+
+def _finding_patterns():
+    """{category.component: [(code, description regex, recommendation regex)]} from the English catalog."""
+    messages = Catalogs(auto_reload=False).messages('en', 'findings.')
+    patterns = {}
+    for key, description in messages.items():
+        if not key.endswith('.description'):
+            continue
+        code = key[len('findings.'):-len('.description')]
+        recommendation = messages.get(f"findings.{code}.recommendation", '')
+        prefix = code.rsplit('.', 1)[0]
+        patterns.setdefault(prefix, []).append((code, _message_pattern(description), _message_pattern(recommendation)))
+    return patterns
+
+def _match_finding(patterns, detail):
+    """(code, params) of a detail stored with English texts only, or None if no message matches."""
+    for code, description_re, recommendation_re in patterns.get(f"{detail.category}.{detail.component}", []):
+        description = description_re.fullmatch(detail.description or '')
+        recommendation = recommendation_re.fullmatch(detail.recommendation or '')
+        if description and recommendation:
+            return code, {**description.groupdict(), **recommendation.groupdict()}
+    return None
+
+def backfill_message_codes(batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Set the message code and params of the details saved before the analyzers emitted codes, by
+    matching their English texts against the 'findings' catalog. Details that match no message
+    (texts of an older analyzer version) keep their stored texts.
+
+    Returns:
+    - (details updated, details left without a code)
+    """
+    patterns = _finding_patterns()
+    updated = unmatched = 0
+    last_id = 0
+    while True:
+        analyses = db.session.execute(
+            select(Analysis.id, Analysis.details_data).where(Analysis.details_data.isnot(None), Analysis.id > last_id)
+            .order_by(Analysis.id).limit(batch_size)).all()
+        if not analyses:
+            break
+        for analysis_id, data in analyses:
+            details = decode_details(data)
+            changed = False
+            for detail in details:
+                if detail.message_code:
+                    continue
+                match = _match_finding(patterns, detail)
+                if match is None:
+                    unmatched += 1
+                    continue
+                detail.message_code, detail.params = match
+                changed = True
+                updated += 1
+            if changed:
+                db.session.execute(update(Analysis).where(Analysis.id == analysis_id)
+                                   .values(details_data=encode_details(details)))
+        last_id = analyses[-1].id
+        db.session.commit()
+        logger.info(f"Backfill of message codes: {updated} updated, {unmatched} unmatched so far")
+    return updated, unmatched
+
+if __name__ == '__main__':
+    # python schema.py upgrade : applique les migrations (gunicorn.conf.py le lance avant de démarrer les workers)
+    # python schema.py backfill : codes des messages des analyses enregistrées avant leur introduction
+    if sys.argv[1:] not in (['upgrade'], ['backfill']):
+        print("Usage: python schema.py upgrade|backfill")
+        raise SystemExit(2)
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        if sys.argv[1] == 'upgrade':
+            upgrade_database()
+            print(f"Database at revision {current_revision()}")
+        else:
+            updated, unmatched = backfill_message_codes()
+            print(f"{updated} details updated, {unmatched} left without a message code")
@@ -0,0 +1,254 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from concurrent.futures import Future
+from collections import Counter
+from ai_cache import get_ai_cache, make_key
+from ai_integration import _chat_completion, ai_client_configured, metered_ai_usage, current_ai_usage, DEEPSEEK_MODEL
+from metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+# Analyse sémantique (analyses 'deep') : le contenu principal de chaque page (PageFeatures.content_text) est découpé selon un
+# budget de tokens, et les pages analysées en même temps partagent une même requête DeepSeek.
+SEMANTIC_PAGE_TOKENS = int(os.environ.get('SEMANTIC_PAGE_TOKENS', 1500))  # Above this, a page is split into chunks
+SEMANTIC_REQUEST_TOKENS = int(os.environ.get('SEMANTIC_REQUEST_TOKENS', 6000))  # Input budget of one packed request
+SEMANTIC_MAX_CHUNKS = int(os.environ.get('SEMANTIC_MAX_CHUNKS', 6))  # Chunks scored per page; the rest of a huge page is not sent
+SEMANTIC_BATCH_WINDOW = float(os.environ.get('SEMANTIC_BATCH_WINDOW', 0.5))  # Seconds a request waits for other pages to join
+SEMANTIC_MAX_ITEMS = 10  # Pages or chunks per request: bounds the size of the JSON answer
+OUTPUT_TOKENS_PER_ITEM = 160
+CHARS_PER_TOKEN = 4  # No tokenizer dependency: ~4 characters per token for English/French prose, on the safe side
+# Bump when the prompt below changes (cached per-item results are keyed on it)
+SEMANTIC_PROMPT_VERSION = 1
+
+SEMANTIC_SYSTEM_PROMPT = "You are an SEO content analyst. You assess the topical relevance and depth of web page content."
+
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+')
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def split_chunks(text, max_tokens):
+    """Split text into pieces of at most max_tokens, at paragraph then sentence boundaries."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces = []
+    for paragraph in text.split('\n'):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in _SENTENCE_END_RE.split(paragraph):
+            # A "sentence" longer than a chunk (no punctuation) is cut hard
+            pieces.extend(sentence[start:start + max_chars] for start in range(0, len(sentence), max_chars))
+
+    chunks, current, size = [], [], 0
+    for piece in pieces:
+        if current and size + len(piece) + 1 > max_chars:
+            chunks.append('\n'.join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 1
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
+
+def _item_key(text, keywords):
+    """AI cache key of one page or chunk result, whatever the request it was packed into."""
+    return make_key(DEEPSEEK_MODEL, SEMANTIC_SYSTEM_PROMPT, f"semantic-item-v{SEMANTIC_PROMPT_VERSION}\n{keywords or ''}\n{text}",
+                    None, None, True)
+
+def _clean_result(result):
+    """
+    Validated copy of one item of the model's JSON, or None if it has no usable relevance score.
+
+    The score must be an integer 0-100 (85, 85.0 or "85"); "85/100", "high" or null are rejected,
+    like a missing result, so they are neither cached nor combined with the other chunks.
+    """
+    score = result.get('relevance_score')
+    if isinstance(score, str) and score.strip().isdigit():
+        score = int(score.strip())
+    elif isinstance(score, float) and score.is_integer():
+        score = int(score)
+    if isinstance(score, bool) or not isinstance(score, int) or not 0 <= score <= 100:
+        return None
+    topics = result.get('main_topics')
+    return {
+        'relevance_score': score,
+        'depth_assessment': str(result.get('depth_assessment') or ''),
+        'main_topics': [str(topic) for topic in topics] if isinstance(topics, list) else []
+    }
+
+def _packed_prompt(items):
+    parts = [
+        "Analyze each of the following items independently. An item is the content of a web page, or an excerpt "
+        "of a longer page (then judge the excerpt on its own).\n"
+        "Respond as JSON: {\"results\": [...]} with one object per item, having these fields:\n"
+        "- id: the item id\n"
+        "- relevance_score: integer 0-100, how focused and relevant the content is for its apparent topic\n"
+        "- depth_assessment: 2-3 sentences on the depth and completeness of the content, with the main gap to fill\n"
+        "- main_topics: array of the main topics covered"
+    ]
+    for item_id, (text, keywords) in enumerate(items, start=1):
+        keywords_line = f"Target keywords: {', '.join(keywords)}\n" if keywords else ""
+        parts.append(f"\n=== ITEM {item_id} ===\n{keywords_line}{text}")
+    return '\n'.join(parts)
+
+class SemanticBatcher:
+    """
+    Packs the semantic items (pages or chunks) submitted by concurrent analyses into shared requests.
+
+    The first caller to submit becomes the leader: it waits SEMANTIC_BATCH_WINDOW for other analyses
+    to add their items, then sends them in as few requests as the token budget allows and hands each
+    caller its results. Other callers just wait for their futures. The tokens of a shared request are
+    charged to the metered usage of each caller (metered_ai_usage) in proportion to its items' size.
+    """
+
+    def __init__(self, window=SEMANTIC_BATCH_WINDOW, request_tokens=SEMANTIC_REQUEST_TOKENS, max_items=SEMANTIC_MAX_ITEMS):
+        self.window = window
+        self.request_tokens = request_tokens
+        self.max_items = max_items
+        self.requests_sent = 0
+        self._lock = threading.Lock()
+        self._pending = []  # (text, keywords, future, AIUsage of the caller or None)
+        self._leader_active = False
+
+    def score(self, items):
+        """Results of [(text, keywords)], in order; None for an item whose request failed."""
+        futures = [Future() for _ in items]
+        usage = current_ai_usage()
+        with self._lock:
+            self._pending.extend((text, keywords, future, usage) for (text, keywords), future in zip(items, futures))
+            lead = not self._leader_active
+            self._leader_active = True
+        if lead:
+            time.sleep(self.window)
+            with self._lock:
+                pending, self._pending = self._pending, []
+                self._leader_active = False
+            self._dispatch(pending)
+        return [future.result() if future.exception() is None else None for future in futures]
+
+    def _dispatch(self, pending):
+        request, tokens = [], 0
+        for entry in pending:
+            item_tokens = estimate_tokens(entry[0])
+            if request and (tokens + item_tokens > self.request_tokens or len(request) >= self.max_items):
+                self._send(request)
+                request, tokens = [], 0
+            request.append(entry)
+            tokens += item_tokens
+        if request:
+            self._send(request)
+
+    def _send(self, request):
+        request_usage = None
+        try:
+            with self._lock:
+                self.requests_sent += 1
+            items = [(text, keywords) for text, keywords, _, _ in request]
+            with stage_timer('semantic_ai'), metered_ai_usage() as request_usage:
+                response = _chat_completion(SEMANTIC_SYSTEM_PROMPT, _packed_prompt(items),
+                                            max_tokens=OUTPUT_TOKENS_PER_ITEM * len(items) + 100, json_mode=True)
+            results = {str(result.get('id')): result for result in json.loads(response).get('results', [])
+                       if isinstance(result, dict)}
+            logger.info(f"Semantic request: {len(items)} items, ~{sum(estimate_tokens(text) for text, _ in items)} input tokens")
+        except Exception as e:
+            logger.error(f"Semantic request of {len(request)} items failed: {str(e)}", exc_info=True)
+            self._charge(request, request_usage)
+            for _, _, future, _ in request:
+                future.set_exception(e)
+            return
+        self._charge(request, request_usage)
+        for item_id, (_, _, future, _) in enumerate(request, start=1):
+            result = results.get(str(item_id))
+            clean = _clean_result(result) if result is not None else None
+            if result is None:
+                logger.warning(f"No result for item {item_id} of {len(request)} in the semantic response")
+                future.set_exception(ValueError(f"No result for item {item_id} in the semantic response"))
+            elif clean is None:
+                logger.warning(f"Invalid relevance_score for item {item_id} of {len(request)} in the semantic response: {result.get('relevance_score')!r}")
+                future.set_exception(ValueError(f"Invalid result for item {item_id} in the semantic response"))
+            else:
+                future.set_result(clean)
+
+    @staticmethod
+    def _charge(request, request_usage):
+        """Split the calls and tokens of a request between its callers (before their futures complete)."""
+        if request_usage is None or not request_usage.calls:
+            return
+        weights = {}
+        for text, _, _, usage in request:
+            if usage is not None:
+                weights[usage] = weights.get(usage, 0) + estimate_tokens(text)
+        total = sum(estimate_tokens(text) for text, _, _, _ in request)
+        for usage, weight in weights.items():
+            usage.add(request_usage.calls, round(request_usage.tokens * weight / total))
+
+_batcher = SemanticBatcher()
+
+def _score_items(items, use_cache):
+    """Results for [(text, keywords)]: from the AI cache when possible, the rest through the batcher (None if failed)."""
+    cache = get_ai_cache()
+    results = [None] * len(items)
+    missing = []
+    for index, (text, keywords) in enumerate(items):
+        cached = cache.get(_item_key(text, keywords)) if cache and use_cache else None
+        if cached is not None:
+            cached = _clean_result(json.loads(cached))  # Entries stored before results were validated
+        if cached is not None:
+            results[index] = cached
+        else:
+            missing.append(index)
+    if not missing:
+        return results
+
+    for index, result in zip(missing, _batcher.score([items[index] for index in missing])):
+        results[index] = result
+        if cache and result is not None:
+            cache.set(_item_key(*items[index]), DEEPSEEK_MODEL, json.dumps(result, ensure_ascii=False))
+    return results
+
+def _reduce(results, chunks):
+    """Combine chunk results (failed ones are skipped): score weighted by chunk length, topics by number of chunks, weakest chunk's assessment."""
+    scored = [(result, len(chunk)) for result, chunk in zip(results, chunks) if result is not None]
+    total = sum(weight for _, weight in scored)
+    score = round(sum(result['relevance_score'] * weight for result, weight in scored) / total)
+    topics = Counter(topic for result, _ in scored for topic in dict.fromkeys(result.get('main_topics') or []))
+    weakest = min(scored, key=lambda entry: entry[0]['relevance_score'])[0]
+    return {
+        'relevance_score': score,
+        'depth_assessment': weakest.get('depth_assessment', ''),
+        'main_topics': [topic for topic, _ in topics.most_common(8)]
+    }
+
+def analyze_page_semantics(text, keywords=None, use_cache=True):
+    """
+    Semantic relevance of a page's main content.
+
+    A page within SEMANTIC_PAGE_TOKENS is one item; a longer one is split into up to SEMANTIC_MAX_CHUNKS
+    chunks scored separately (map) then combined (reduce). Items of concurrent analyses are packed into
+    shared DeepSeek requests (SemanticBatcher), and each item's result is cached on its own.
+
+    Returns:
+    - {'relevance_score', 'depth_assessment', 'main_topics', 'chunks', 'estimated_tokens'}
+    """
+    if not ai_client_configured():
+        return {"relevance_score": 50, "depth_assessment": "AI-powered semantic analysis requires a DeepSeek API key."}
+    page_tokens = min(SEMANTIC_PAGE_TOKENS, SEMANTIC_REQUEST_TOKENS)
+    chunks = split_chunks(text, page_tokens) if estimate_tokens(text) > page_tokens else [text]
+    if len(chunks) > SEMANTIC_MAX_CHUNKS:
+        logger.info(f"Semantic analysis: page of ~{estimate_tokens(text)} tokens, only the first {SEMANTIC_MAX_CHUNKS} of {len(chunks)} chunks are scored")
+        chunks = chunks[:SEMANTIC_MAX_CHUNKS]
+    results = _score_items([(chunk, keywords) for chunk in chunks], use_cache)
+    if all(result is None for result in results):
+        return {"relevance_score": 50, "depth_assessment": "Unable to analyze content depth..."}
+
+    result = results[0] if len(chunks) == 1 else _reduce(results, chunks)
+    result['chunks'] = len(chunks)
+    result['estimated_tokens'] = sum(estimate_tokens(chunk) for chunk in chunks)
+    return result
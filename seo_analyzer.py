@@ -1,12 +1,22 @@
 import re
+import copy
 import requests
 from urllib.parse import urlparse
-from bs4 import BeautifulSoup
 import logging
-from ai_integration import analyze_content_semantics # Importation ajoutée
+from fetcher import fetch_page, FETCH_TIMEOUT
+from page_features import parse_features
+from page_cache import get_page_cache, content_hash, normalize_url
+from site_files import get_site_files
+from content_extraction import extract_main_text, average_sentence_length
+from semantic import analyze_page_semantics
+from metrics import stage_timer
+from translation import render_finding
 
 logger = logging.getLogger(__name__)
 
+# analyze_technical of these types checks robots.txt and the sitemap of the site (site_files.py)
+SITE_CHECK_TYPES = ['complete', 'deep']
+
 # Définir des exceptions personnalisées pour une meilleure gestion des erreurs
 class SeoAnalysisError(Exception):
     """Classe de base pour les erreurs d'analyse SEO."""
@@ -20,121 +30,149 @@ class HtmlParsingError(SeoAnalysisError):
     """Erreur lors du parsing du HTML."""
     pass
 
-def analyze_url(url, analysis_type='meta'):
+def _report_progress(progress, stage):
+    """Notify the optional progress callback (used by the job runner) of the current stage."""
+    if progress:
+        progress(stage)
+
+def _parse_page(url, text, size):
+    """PageFeatures of a page body, with its main content. Raises HtmlParsingError."""
+    try:
+        # Un seul parcours du document : les analyseurs travaillent ensuite sur ce relevé.
+        # Au-delà de SEO_STREAMING_THRESHOLD_BYTES, le mode 'auto' passe au tokenizer en flux (pas d'arbre en mémoire)
+        with stage_timer('parse'):
+            features, backend = parse_features(text, size=size)
+        logger.debug(f"Successfully parsed HTML for {url} ({size} bytes, backend: {backend})")
+    except Exception as parse_err: # Attraper des erreurs plus larges de BeautifulSoup si nécessaire
+        logger.error(f"Failed to parse HTML for {url}: {str(parse_err)}")
+        raise HtmlParsingError(f"ParsingError: Could not parse HTML content from {url}. Error: {str(parse_err)}")
+    # Contenu principal (trafilatura), extrait une fois par page et mis en cache avec le relevé.
+    # Extrait quel que soit le backend (borné par CONTENT_EXTRACTION_MAX_CHARS) : mêmes scores en flux
+    with stage_timer('extract'):
+        features.main_text = extract_main_text(text)
+    return features
+
+def analyze_url(url, analysis_type='meta', progress=None):
     """
     Analyze a URL for SEO performance.
+    
+    Parameters:
+    - url: URL to analyze
+    - analysis_type: meta, partial, complete or deep
+    - progress: Optional callable receiving the stage name ('fetching', 'parsing', 'scoring', 'ai')
     """
     logger.info(f"Starting analysis for {url}, type: {analysis_type}")
     try:
-        # Get URL content with a common User-Agent and error handling
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'DNT': '1', 
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1'
-        }
+        _report_progress(progress, 'fetching')
+        # Cache disque des pages : si l'URL est connue, requête conditionnelle (ETag / Last-Modified)
+        page_cache = get_page_cache()
+        cached = page_cache.get(url) if page_cache else None
+        # Connexions keep-alive partagées, corps lu en flux et plafonné à FETCH_MAX_BYTES
         try:
-            response = requests.get(url, headers=headers, timeout=20, allow_redirects=True)
-            response.raise_for_status() 
-            logger.debug(f"Successfully fetched content for {url}, status: {response.status_code}")
+            with stage_timer('fetch'):
+                page = fetch_page(url, headers=cached.validators() if cached else None)
+            logger.debug(f"Successfully fetched content for {url}, status: {page.status_code}, timings: {page.timings}")
         except requests.exceptions.Timeout:
             logger.error(f"Timeout while trying to fetch {url}")
-            raise ContentFetchError(f"Timeout: The request to {url} timed out after 20 seconds.")
+            raise ContentFetchError(f"Timeout: The request to {url} timed out after {FETCH_TIMEOUT:g} seconds.")
         except requests.exceptions.TooManyRedirects:
             logger.error(f"Too many redirects for {url}")
             raise ContentFetchError(f"RedirectError: Too many redirects for {url}.")
         except requests.exceptions.HTTPError as http_err:
             logger.error(f"HTTP error occurred for {url}: {http_err}")
-            raise ContentFetchError(f"HTTPError: Failed to fetch content from {url}. Status: {response.status_code}. Error: {http_err}")
+            raise ContentFetchError(f"HTTPError: Failed to fetch content from {url}. Status: {http_err.response.status_code}. Error: {http_err}")
         except requests.exceptions.RequestException as req_err:
             logger.error(f"Request failed for {url}: {str(req_err)}")
             raise ContentFetchError(f"RequestError: Failed to fetch content from {url}. Error: {str(req_err)}")
 
         # Parse HTML
-        try:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            logger.debug(f"Successfully parsed HTML for {url}")
-        except Exception as parse_err: # Attraper des erreurs plus larges de BeautifulSoup si nécessaire
-            logger.error(f"Failed to parse HTML for {url}: {str(parse_err)}")
-            raise HtmlParsingError(f"ParsingError: Could not parse HTML content from {url}. Error: {str(parse_err)}")
+        _report_progress(progress, 'parsing')
+        page_hash = None
+        if cached and page.status_code == 304:
+            cache_status = 'not-modified'
+        else:
+            page_hash = content_hash(page.content)
+            cache_status = 'unchanged' if cached and cached.content_hash == page_hash else 'miss'
+
+        if cache_status == 'miss':
+            features = _parse_page(url, page.text, page.size)
+        elif cached.features is None:
+            # Entrée d'une ancienne PAGE_CACHE_VERSION : relevé refait depuis le corps stocké, sans téléchargement
+            features = cached.features = _parse_page(
+                url, cached.body.decode(cached.encoding or 'utf-8', errors='replace'), len(cached.body))
+            logger.debug(f"Page cache hit for {url} ({cache_status}), features rebuilt from the stored body")
+        else:
+            # Page inchangée depuis la dernière analyse : on réutilise le relevé (et les scores) du cache
+            features = cached.features
+            logger.debug(f"Page cache hit for {url} ({cache_status}), skipping parse")
         
         results = {
             'url': url, 'analysis_type': analysis_type,
             'scores': {'meta': 0, 'content': 0, 'technical': 0, 'overall': 0}, # Initialiser tous les scores
-            'details': {'meta': {}, 'content': {}, 'technical': {}} # Initialiser toutes les sections de détails
+            'details': {'meta': {}, 'content': {}, 'technical': {}}, # Initialiser toutes les sections de détails
+            'fetch': page.to_dict() # URL finale, taille, troncature, encodage et temps (DNS, connect, TLS, TTFB, download)
         }
+        results['fetch']['cache'] = cache_status
+        results['fetch']['content_hash'] = page_hash or cached.content_hash
+        results['links'] = features.followed_links()  # Used by the site crawler (crawler.py)
         
-        analyze_meta_tags(soup, results)
-        
-        if analysis_type in ['partial', 'complete', 'deep']:
-            analyze_content(soup, results)
-            
-        if analysis_type in ['complete', 'deep']:
-            analyze_technical(soup, url, results)
-            
-        # Calculate overall score
-        scores_to_average = [results['scores']['meta']]
-        if analysis_type in ['partial', 'complete', 'deep']:
-            scores_to_average.append(results['scores']['content'])
-        if analysis_type in ['complete', 'deep']:
-            scores_to_average.append(results['scores']['technical'])
+        _report_progress(progress, 'scoring')
+        # Les scores en cache ne valent que pour la page : robots.txt et sitemap peuvent changer sans elle,
+        # ces types sont donc renotés à partir du relevé (le parsing reste évité)
+        scored = cached.scored.get(analysis_type) if cache_status != 'miss' and analysis_type not in SITE_CHECK_TYPES else None
+        if scored:
+            results['scores'] = copy.deepcopy(scored['scores'])
+            results['details'] = copy.deepcopy(scored['details'])
+        else:
+            # robots.txt et sitemaps : chargés une fois par site et par SITE_FILES_TTL, pas à chaque page
+            site = None
+            if analysis_type in SITE_CHECK_TYPES:
+                with stage_timer('site_files'):
+                    site = get_site_files(url)
+            score_features(features, url, analysis_type, results, site=site)
+            scored = copy.deepcopy({'scores': results['scores'], 'details': results['details']})
+
+        if page_cache:
+            if cache_status == 'miss':
+                page_cache.put(url, page, features, page_hash, scored={analysis_type: scored})
+            else:
+                if cache_status == 'unchanged':
+                    # 200 avec le même contenu : on garde les nouveaux validateurs éventuels
+                    cached.etag = page.headers.get('ETag') or cached.etag
+                    cached.last_modified = page.headers.get('Last-Modified') or cached.last_modified
+                cached.scored[analysis_type] = scored
+                page_cache.save(cached, revalidated=True)
         
         # Semantic analysis for 'deep' type
         if analysis_type == 'deep':
-            logger.info(f"Extracting text for semantic analysis from {url}")
-            paragraphs = soup.find_all('p')
-            extracted_text_for_semantic_analysis = " ".join(p.get_text(separator=' ', strip=True) for p in paragraphs if p.get_text(strip=True))
+            # Contenu principal extrait au parsing (ou relu du cache) ; à défaut, le texte des <p>
+            extracted_text_for_semantic_analysis = features.content_text
             
             if extracted_text_for_semantic_analysis.strip():
+                _report_progress(progress, 'ai')
                 try:
                     logger.info(f"Performing semantic analysis for {url} (type: deep)")
-                    semantic_results = analyze_content_semantics(extracted_text_for_semantic_analysis)
+                    semantic_results = analyze_page_semantics(extracted_text_for_semantic_analysis)
                     logger.debug(f"Semantic analysis results for {url}: {semantic_results}")
 
                     if 'semantic' not in results['details']:
                         results['details']['semantic'] = {}
                     
-                    results['details']['semantic']['relevance'] = {
-                        'status': 'info', 
-                        'score': semantic_results.get('relevance_score', 0), 
-                        'description': f"AI Semantic Relevance Score: {semantic_results.get('relevance_score', 'N/A')}/100.",
-                        'recommendation': semantic_results.get('depth_assessment', 'No specific depth assessment provided.')
-                    }
-                    # Potentially add other semantic details if returned by analyze_content_semantics
+                    results['details']['semantic']['relevance'] = _finding(
+                        'semantic.relevance.assessed', 'info', semantic_results.get('relevance_score', 0),
+                        relevance=semantic_results.get('relevance_score', 'N/A'),
+                        assessment=semantic_results.get('depth_assessment', 'No specific depth assessment provided.'))
+                    # Potentially add other semantic details if returned by analyze_page_semantics
                 except Exception as sem_err:
                     logger.error(f"Error during semantic analysis for {url}: {str(sem_err)}", exc_info=True)
                     if 'semantic' not in results['details']:
                         results['details']['semantic'] = {}
-                    results['details']['semantic']['error'] = {
-                        'status': 'error', 
-                        'score': 0, 
-                        'description': "Semantic analysis could not be performed.",
-                        'recommendation': str(sem_err)
-                    }
+                    results['details']['semantic']['error'] = _finding('semantic.error.failed', 'error', 0, error=str(sem_err))
             else:
-                logger.warning(f"No significant text extracted from <p> tags for semantic analysis of {url}")
+                logger.warning(f"No significant text content found for semantic analysis of {url}")
                 if 'semantic' not in results['details']:
                     results['details']['semantic'] = {}
-                results['details']['semantic']['no_text'] = {
-                    'status': 'warning',
-                    'score': 0, # Or a neutral score
-                    'description': "No significant text content found in <p> tags for semantic analysis.",
-                    'recommendation': "Ensure the page has substantial textual content in paragraph tags for semantic analysis."
-                }
-
-        # Calculate overall score
-        scores_to_average = [results['scores']['meta']]
-        if analysis_type in ['partial', 'complete', 'deep']:
-            scores_to_average.append(results['scores']['content'])
-        if analysis_type in ['complete', 'deep']:
-            scores_to_average.append(results['scores']['technical'])
-        
-        if scores_to_average:
-            results['scores']['overall'] = sum(scores_to_average) // len(scores_to_average)
-        else:
-            results['scores']['overall'] = 0 # Should always have at least meta score
+                results['details']['semantic']['no_text'] = _finding('semantic.no_text.empty', 'warning', 0)
 
         logger.info(f"Analysis for {url} completed. Overall score: {results['scores']['overall']}")
         return results
@@ -149,128 +187,198 @@ def analyze_url(url, analysis_type='meta'):
         logger.error(f"Unexpected error analyzing URL {url}: {str(e)}", exc_info=True)
         raise SeoAnalysisError(f"An unexpected error occurred during analysis of {url}: {str(e)}")
 
-# Les fonctions analyze_meta_tags, analyze_content, analyze_technical restent inchangées pour l'instant
-# ... (coller ici le reste des fonctions analyze_meta_tags, analyze_content, analyze_technical)
-# ... (Assurez-vous que ces fonctions utilisent logger.debug ou logger.info pour les messages internes si besoin)
+def score_features(features, url, analysis_type, results, site=None):
+    """
+    Run the analyzers of an analysis type on a PageFeatures record and compute the overall score.
+    site is the SiteFiles of the URL's site, for the robots.txt and sitemap checks of analyze_technical.
+    """
+    with stage_timer('analyze_meta'):
+        analyze_meta_tags(features, results)
+    
+    if analysis_type in ['partial', 'complete', 'deep']:
+        with stage_timer('analyze_content'):
+            analyze_content(features, results)
+        
+    if analysis_type in ['complete', 'deep']:
+        with stage_timer('analyze_technical'):
+            analyze_technical(features, url, results, site=site)
+
+    # Calculate overall score
+    scores_to_average = [results['scores']['meta']]
+    if analysis_type in ['partial', 'complete', 'deep']:
+        scores_to_average.append(results['scores']['content'])
+    if analysis_type in ['complete', 'deep']:
+        scores_to_average.append(results['scores']['technical'])
+    
+    if scores_to_average:
+        results['scores']['overall'] = sum(scores_to_average) // len(scores_to_average)
+    else:
+        results['scores']['overall'] = 0 # Should always have at least meta score
+
+# Les analyseurs ci-dessous notent la page à partir du relevé PageFeatures (voir page_features.py)
+# et ne parcourent jamais l'arbre HTML eux-mêmes.
+
+def _finding(code, status, score, value=None, **params):
+    """
+    A detail entry: message code and params (rendered in the reader's language from the 'findings'
+    translation catalogs), plus the English texts used by the API, the AI prompts and the logs.
+    """
+    finding = {'status': status, 'score': score, 'code': code, 'params': params,
+               'description': render_finding(code, 'description', params, 'en', fallback=''),
+               'recommendation': render_finding(code, 'recommendation', params, 'en', fallback='')}
+    if value is not None:
+        finding['value'] = value
+    return finding
 
-def analyze_meta_tags(soup, results):
+def analyze_meta_tags(features, results):
     """Analyze meta tags for SEO"""
     meta_score = 0
     meta_items = 0
     
     # Title analysis
-    title_tag = soup.title
-    title_text = title_tag.string if title_tag else None
+    title_text = features.title
     if title_text:
         title_length = len(title_text.strip())
-        if 10 <= title_length <= 60: status, score, recommendation = 'good', 100, "Optimal title length."
-        elif title_length < 10: status, score, recommendation = 'error', 30, "Title too short. Make it more descriptive."
-        else: status, score, recommendation = 'warning', 70, "Title too long. Keep under 60 characters."
-        results['details']['meta']['title'] = {'status': status, 'score': score, 'description': f"Title: {title_text.strip()} ({title_length} chars)", 'recommendation': recommendation, 'value': title_text.strip()}
+        if 10 <= title_length <= 60: status, score, code = 'good', 100, 'meta.title.optimal'
+        elif title_length < 10: status, score, code = 'error', 30, 'meta.title.too_short'
+        else: status, score, code = 'warning', 70, 'meta.title.too_long'
+        results['details']['meta']['title'] = _finding(code, status, score, value=title_text.strip(), title=title_text.strip(), length=title_length)
         meta_score += score; meta_items += 1
     else:
-        results['details']['meta']['title'] = {'status': 'error', 'score': 0, 'description': "Missing page title.", 'recommendation': "Add a descriptive title tag."}
+        results['details']['meta']['title'] = _finding('meta.title.missing', 'error', 0)
         meta_items += 1
     
     # Meta description
-    meta_desc_tag = soup.find('meta', attrs={'name': 'description'})
-    meta_desc_content = meta_desc_tag['content'].strip() if meta_desc_tag and meta_desc_tag.get('content') else None
+    meta_desc_content = features.meta_content('description')
     if meta_desc_content:
         desc_length = len(meta_desc_content)
-        if 50 <= desc_length <= 160: status, score, recommendation = 'good', 100, "Optimal meta description length."
-        elif desc_length < 50: status, score, recommendation = 'warning', 50, "Meta description too short (aim 50-160 chars)."
-        else: status, score, recommendation = 'warning', 70, "Meta description too long (under 160 chars)."
-        results['details']['meta']['description'] = {'status': status, 'score': score, 'description': f"Length: {desc_length} chars", 'recommendation': recommendation, 'value': meta_desc_content[:200] + "..."}
+        if 50 <= desc_length <= 160: status, score, code = 'good', 100, 'meta.description.optimal'
+        elif desc_length < 50: status, score, code = 'warning', 50, 'meta.description.too_short'
+        else: status, score, code = 'warning', 70, 'meta.description.too_long'
+        results['details']['meta']['description'] = _finding(code, status, score, value=meta_desc_content[:200] + "...", length=desc_length)
         meta_score += score; meta_items += 1
     else:
-        results['details']['meta']['description'] = {'status': 'error', 'score': 0, 'description': "Missing meta description.", 'recommendation': "Add a meta description."}
+        results['details']['meta']['description'] = _finding('meta.description.missing', 'error', 0)
         meta_items += 1
         
     # Meta keywords (moins important mais vérifié)
-    meta_kw_tag = soup.find('meta', attrs={'name': 'keywords'})
-    meta_kw_content = meta_kw_tag['content'].strip() if meta_kw_tag and meta_kw_tag.get('content') else None
+    meta_kw_content = features.meta_content('keywords')
     if meta_kw_content:
-        kw_count = len(meta_kw_content.split(','))
-        status, score, recommendation = 'info', 70, "Meta keywords are less impactful now but can be used."
-        results['details']['meta']['keywords'] = {'status': status, 'score': score, 'description': f"{kw_count} keywords found.", 'recommendation': recommendation, 'value': meta_kw_content[:200] + "..."}
+        score = 70
+        results['details']['meta']['keywords'] = _finding('meta.keywords.present', 'info', score, value=meta_kw_content[:200] + "...", count=len(meta_kw_content.split(',')))
     else:
-        status, score, recommendation = 'info', 50, "No meta keywords tag found."
-        results['details']['meta']['keywords'] = {'status': status, 'score': score, 'description': "Missing meta keywords.", 'recommendation': recommendation}
+        score = 50
+        results['details']['meta']['keywords'] = _finding('meta.keywords.missing', 'info', score)
     meta_score += score; meta_items += 1
 
     # OG tags
-    og_title = soup.find('meta', property='og:title')
-    og_desc = soup.find('meta', property='og:description')
-    og_image = soup.find('meta', property='og:image')
-    og_tags_found = sum(1 for tag in [og_title, og_desc, og_image] if tag and tag.get('content'))
-    if og_tags_found == 3: status, score, recommendation = 'good', 100, "All key Open Graph tags present."
-    elif og_tags_found > 0: status, score, recommendation = 'warning', 60, f"{3-og_tags_found} Open Graph tags missing."
-    else: status, score, recommendation = 'error', 20, "Open Graph tags missing."
-    results['details']['meta']['og_tags'] = {'status': status, 'score': score, 'description': f"{og_tags_found}/3 OG tags found.", 'recommendation': recommendation}
+    og_tags_found = sum(1 for prop in ['og:title', 'og:description', 'og:image'] if features.metas_by_property.get(prop))
+    if og_tags_found == 3: status, score, code = 'good', 100, 'meta.og_tags.complete'
+    elif og_tags_found > 0: status, score, code = 'warning', 60, 'meta.og_tags.partial'
+    else: status, score, code = 'error', 20, 'meta.og_tags.missing'
+    results['details']['meta']['og_tags'] = _finding(code, status, score, found=og_tags_found, missing=3 - og_tags_found)
     meta_score += score; meta_items += 1
     
     results['scores']['meta'] = meta_score // meta_items if meta_items > 0 else 0
 
-def analyze_content(soup, results):
+def analyze_content(features, results):
     content_score = 0; content_items = 0
     
-    h1_tags = soup.find_all('h1')
-    h1_count = len(h1_tags)
-    if h1_count == 1: status, score, recommendation = 'good', 100, "One H1 tag found."
-    elif h1_count == 0: status, score, recommendation = 'error', 0, "Missing H1 tag."
-    else: status, score, recommendation = 'warning', 50, f"{h1_count} H1 tags found. Aim for one."
-    results['details']['content']['h1_tag'] = {'status': status, 'score': score, 'description': f"{h1_count} H1 tags.", 'recommendation': recommendation}
+    h1_count = features.headings['h1']
+    if h1_count == 1: status, score, code = 'good', 100, 'content.h1_tag.one'
+    elif h1_count == 0: status, score, code = 'error', 0, 'content.h1_tag.missing'
+    else: status, score, code = 'warning', 50, 'content.h1_tag.multiple'
+    results['details']['content']['h1_tag'] = _finding(code, status, score, count=h1_count)
     content_score += score; content_items += 1
 
-    headings = {f'h{i}': len(soup.find_all(f'h{i}')) for i in range(1, 7)}
-    if headings['h1'] == 1 and headings['h2'] >= 1: status, score, recommendation = 'good', 100, "Good heading structure."
-    else: status, score, recommendation = 'warning', 60, "Suboptimal heading structure. Ensure H1 is followed by H2s etc."
+    headings = features.headings
+    if headings['h1'] == 1 and headings['h2'] >= 1: status, score, code = 'good', 100, 'content.heading_structure.good'
+    else: status, score, code = 'warning', 60, 'content.heading_structure.suboptimal'
     desc_str = ", ".join([f"{count} H{i}" for i, count in headings.items()])
-    results['details']['content']['heading_structure'] = {'status': status, 'score': score, 'description': desc_str, 'recommendation': recommendation}
+    results['details']['content']['heading_structure'] = _finding(code, status, score, headings=desc_str)
     content_score += score; content_items += 1
 
-    text_content = ' '.join(p.get_text(separator=' ', strip=True) for p in soup.find_all('p'))
-    word_count = len(text_content.split())
-    if word_count >= 300: status, score, recommendation = 'good', 100, "Good content length."
-    elif word_count >= 100: status, score, recommendation = 'warning', 70, "Content a bit short (aim 300+ words)."
-    else: status, score, recommendation = 'error', 30, "Content too short."
-    results['details']['content']['content_length'] = {'status': status, 'score': score, 'description': f"{word_count} words.", 'recommendation': recommendation}
+    word_count = features.word_count
+    if word_count >= 300: status, score, code = 'good', 100, 'content.content_length.good'
+    elif word_count >= 100: status, score, code = 'warning', 70, 'content.content_length.short'
+    else: status, score, code = 'error', 30, 'content.content_length.too_short'
+    results['details']['content']['content_length'] = _finding(code, status, score, words=word_count)
+    content_score += score; content_items += 1
+
+    sentence_length = average_sentence_length(features.content_text)
+    if sentence_length is None:
+        results['details']['content']['readability'] = _finding('content.readability.not_assessed', 'info', 70)
+        score = 70
+    else:
+        if sentence_length <= 20: status, score, code = 'good', 100, 'content.readability.easy'
+        elif sentence_length <= 25: status, score, code = 'warning', 70, 'content.readability.long'
+        else: status, score, code = 'error', 40, 'content.readability.too_long'
+        results['details']['content']['readability'] = _finding(code, status, score, words_per_sentence=f"{sentence_length:.0f}")
     content_score += score; content_items += 1
 
-    images = soup.find_all('img')
-    img_alts = sum(1 for img in images if img.get('alt', '').strip())
-    if not images: status, score, recommendation = 'info', 70, "No images found. Consider adding relevant images."
-    elif img_alts == len(images): status, score, recommendation = 'good', 100, "All images have alt text."
-    else: status, score, recommendation = 'warning', 60, f"{len(images) - img_alts} images missing alt text."
-    results['details']['content']['image_alt'] = {'status': status, 'score': score, 'description': f"{img_alts}/{len(images)} images with alt text.", 'recommendation': recommendation}
+    image_count = features.image_count
+    img_alts = features.images_with_alt
+    if not image_count: status, score, code = 'info', 70, 'content.image_alt.no_images'
+    elif img_alts == image_count: status, score, code = 'good', 100, 'content.image_alt.all'
+    else: status, score, code = 'warning', 60, 'content.image_alt.missing'
+    results['details']['content']['image_alt'] = _finding(code, status, score, with_alt=img_alts, total=image_count, missing=image_count - img_alts)
     content_score += score; content_items += 1
     
     results['scores']['content'] = content_score // content_items if content_items > 0 else 0
 
-def analyze_technical(soup, url, results):
+def analyze_technical(features, url, results, site=None):
     technical_score = 0; technical_items = 0
     
-    viewport = soup.find('meta', attrs={'name': 'viewport'})
-    if viewport and 'width=device-width' in viewport.get('content', ''): status, score, recommendation = 'good', 100, "Viewport meta tag present."
-    else: status, score, recommendation = 'error', 20, "Missing viewport meta tag."
-    results['details']['technical']['viewport'] = {'status': status, 'score': score, 'description': "Viewport " + ("present" if viewport else "missing"), 'recommendation': recommendation}
+    viewport = features.metas_by_name.get('viewport')
+    if viewport is not None and 'width=device-width' in viewport: status, score, code = 'good', 100, 'technical.viewport.present'
+    else: status, score, code = 'error', 20, 'technical.viewport.invalid' if viewport is not None else 'technical.viewport.missing'
+    results['details']['technical']['viewport'] = _finding(code, status, score)
     technical_score += score; technical_items += 1
 
-    if url.startswith('https://'): status, score, recommendation = 'good', 100, "Site uses HTTPS."
-    else: status, score, recommendation = 'error', 0, "Site does not use HTTPS."
-    results['details']['technical']['https'] = {'status': status, 'score': score, 'description': "HTTPS " + ("enabled" if url.startswith('https') else "disabled"), 'recommendation': recommendation}
+    if url.startswith('https://'): status, score, code = 'good', 100, 'technical.https.enabled'
+    else: status, score, code = 'error', 0, 'technical.https.disabled'
+    results['details']['technical']['https'] = _finding(code, status, score)
     technical_score += score; technical_items += 1
 
-    canonical = soup.find('link', rel='canonical')
-    if canonical and canonical.get('href'): status, score, recommendation = 'good', 100, "Canonical URL tag present."
-    else: status, score, recommendation = 'warning', 60, "No canonical URL tag. Consider adding one."
-    results['details']['technical']['canonical'] = {'status': status, 'score': score, 'description': "Canonical URL " + (canonical.get('href') if canonical else "missing"), 'recommendation': recommendation}
+    if features.canonical_href: status, score, code = 'good', 100, 'technical.canonical.present'
+    else: status, score, code = 'warning', 60, 'technical.canonical.empty' if features.has_canonical else 'technical.canonical.missing'
+    results['details']['technical']['canonical'] = _finding(code, status, score, href=features.canonical_href or '')
     technical_score += score; technical_items += 1
     
-    # Placeholders pour des analyses plus poussées
-    results['details']['technical']['robots_txt'] = {'status': 'info', 'score': 50, 'description': "robots.txt check: Not implemented.", 'recommendation': "Ensure robots.txt is configured."}
-    technical_score += 50; technical_items += 1
-    results['details']['technical']['sitemap'] = {'status': 'info', 'score': 50, 'description': "Sitemap check: Not implemented.", 'recommendation': "Ensure a sitemap exists."}
-    technical_score += 50; technical_items += 1
+    # Sans SiteFiles (appel direct, benchmark), robots.txt et sitemap restent neutres
+    for component, check in (('robots_txt', _robots_check), ('sitemap', _sitemap_check)):
+        if site is None:
+            finding = _finding(f'technical.{component}.not_checked', 'info', 50)
+        else:
+            finding = check(site, url, results)
+        results['details']['technical'][component] = finding
+        technical_score += finding['score']; technical_items += 1
     
     results['scores']['technical'] = technical_score // technical_items if technical_items > 0 else 0
+
+def _page_urls(url, results):
+    """The analyzed URL and, after redirects, the URL actually served."""
+    final_url = results.get('fetch', {}).get('url')
+    return [url, final_url] if final_url and normalize_url(final_url) != normalize_url(url) else [url]
+
+def _robots_check(site, url, results):
+    robots = site.robots
+    if robots.status == 'missing':
+        return _finding('technical.robots_txt.missing', 'warning', 70)
+    if robots.status == 'unreachable':
+        return _finding('technical.robots_txt.unreachable', 'error', 10, error=robots.error)
+    # Googlebot rules, or the '*' group if the file has none for it
+    if all(robots.can_fetch(page_url, 'Googlebot') for page_url in _page_urls(url, results)):
+        return _finding('technical.robots_txt.allowed', 'good', 100)
+    return _finding('technical.robots_txt.disallowed', 'error', 0)
+
+def _sitemap_check(site, url, results):
+    if not site.has_sitemap:
+        return _finding('technical.sitemap.missing_declared' if site.sitemap_declared else 'technical.sitemap.missing', 'error', 30)
+    params = {'files': site.sitemap_files, 'count': f"{site.url_count}+" if site.truncated else str(site.url_count)}
+    undeclared = '' if site.sitemap_declared else '_undeclared'
+    if any(site.lists(page_url) for page_url in _page_urls(url, results)):
+        return _finding(f'technical.sitemap.listed{undeclared}', 'good', 100 if site.sitemap_declared else 90, **params)
+    if site.truncated:
+        return _finding(f'technical.sitemap.not_in_first{undeclared}', 'warning', 70, read=site.url_count, **params)
+    return _finding(f'technical.sitemap.not_listed{undeclared}', 'warning', 60, **params)
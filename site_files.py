@@ -0,0 +1,274 @@
+import os
+import time
+import zlib
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, urljoin
+from urllib.robotparser import RobotFileParser
+from xml.etree.ElementTree import XMLPullParser, ParseError
+import requests
+from fetcher import fetch_page, get_session, FETCH_TIMEOUT
+from page_cache import normalize_url
+
+logger = logging.getLogger(__name__)
+
+# robots.txt et sitemaps d'un site (crawler, et vérifications techniques de analyze_technical)
+CRAWLER_USER_AGENT = os.environ.get('CRAWLER_USER_AGENT', 'OptAIBot')  # Token matched against robots.txt groups
+ROBOTS_MAX_BYTES = 500 * 1024  # Limit of RFC 9309: the rest of the file is ignored
+SITEMAP_MAX_BYTES = int(os.environ.get('SITEMAP_MAX_BYTES', 50 * 1024 * 1024))  # Per sitemap file, after decompression
+SITEMAP_MAX_DEPTH = 1  # Sitemap index -> sitemaps; the protocol does not allow indexes of indexes
+SITEMAP_READ_SIZE = 64 * 1024
+SITEMAP_MAX_URLS = int(os.environ.get('SITEMAP_MAX_URLS', 50000))  # URLs remembered per site for the "listed in sitemap" check
+SITE_FILES_TTL = int(os.environ.get('SITE_FILES_TTL', 3600))  # Seconds robots.txt and sitemaps of a site are reused
+SITE_FILES_CACHE_SIZE = 256  # Sites kept in memory per process
+
+def site_origin(url):
+    """scheme://host[:port] of a URL, where robots.txt and sitemap.xml live."""
+    parts = urlsplit(url)
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}"
+
+class RobotsFile:
+    """
+    Parsed robots.txt of an origin.
+
+    status is 'ok', 'missing' (4xx: everything is allowed) or 'unreachable' (5xx or network
+    error: everything is disallowed, as RFC 9309 requires).
+    """
+
+    def __init__(self, origin, status, parser=None, error=None):
+        self.origin = origin
+        self.status = status
+        self.parser = parser
+        self.error = error
+
+    def can_fetch(self, url, user_agent=CRAWLER_USER_AGENT):
+        if self.status == 'missing':
+            return True
+        if self.status == 'unreachable':
+            return False
+        return self.parser.can_fetch(user_agent, url)
+
+    def crawl_delay(self, user_agent=CRAWLER_USER_AGENT):
+        """Crawl-delay of the group matching user_agent, in seconds, or None."""
+        if self.status != 'ok':
+            return None
+        delay = self.parser.crawl_delay(user_agent)
+        return float(delay) if delay is not None else None
+
+    @property
+    def sitemaps(self):
+        """Sitemap URLs declared in the file."""
+        if self.status != 'ok':
+            return []
+        return self.parser.site_maps() or []
+
+def fetch_robots(origin):
+    """
+    Fetch and parse origin/robots.txt.
+
+    Returns:
+    - RobotsFile (never raises: fetch errors end up in its status)
+    """
+    robots_url = urljoin(origin + '/', 'robots.txt')
+    try:
+        page = fetch_page(robots_url, max_bytes=ROBOTS_MAX_BYTES)
+    except requests.exceptions.HTTPError as e:
+        status_code = e.response.status_code
+        if status_code < 500:
+            return RobotsFile(origin, 'missing')
+        return RobotsFile(origin, 'unreachable', error=f"HTTP {status_code}")
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Could not fetch {robots_url}: {str(e)}")
+        return RobotsFile(origin, 'unreachable', error=str(e))
+
+    parser = RobotFileParser(robots_url)
+    parser.parse(page.content.decode('utf-8', errors='replace').splitlines())
+    logger.debug(f"Parsed {robots_url} ({page.size} bytes)")
+    return RobotsFile(origin, 'ok', parser=parser)
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+def _decompressed_chunks(chunks, sitemap_url):
+    """Body chunks, gunzipped on the fly if the body is gzip data (.xml.gz), cut at SITEMAP_MAX_BYTES."""
+    decompressor = None
+    size = 0
+    for index, chunk in enumerate(chunks):
+        if index == 0 and chunk[:2] == b'\x1f\x8b':
+            decompressor = zlib.decompressobj(wbits=31)
+        if decompressor is not None:
+            # max_length bounds the output of a gzip bomb; the rest of this chunk is dropped with the file
+            chunk = decompressor.decompress(chunk, SITEMAP_MAX_BYTES - size + 1)
+        size += len(chunk)
+        if size > SITEMAP_MAX_BYTES:
+            logger.warning(f"Sitemap {sitemap_url} cut at {SITEMAP_MAX_BYTES} bytes")
+            yield chunk[:len(chunk) - (size - SITEMAP_MAX_BYTES)]
+            return
+        yield chunk
+
+def _parse_sitemap(chunks, sitemap_url):
+    """
+    Incrementally parse one sitemap or sitemap index, yielding ('url', loc) and ('sitemap', loc).
+    Each <url>/<sitemap> element is dropped once read, so memory stays flat on 50 MB files.
+    """
+    parser = XMLPullParser(events=('start', 'end'))
+    root = None
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                if event == 'start':
+                    if root is None:
+                        root = element
+                    continue
+                name = _local_name(element.tag)
+                if name in ('url', 'sitemap'):
+                    loc = next((child.text for child in element if _local_name(child.tag) == 'loc'), None)
+                    if loc and loc.strip():
+                        yield name, loc.strip()
+                    root.clear()
+        parser.close()
+    except ParseError as e:
+        # Truncated (SITEMAP_MAX_BYTES) or malformed: keep the entries read before the error
+        logger.warning(f"Sitemap {sitemap_url} stopped parsing: {str(e)}")
+
+def iter_sitemap_urls(sitemap_url, stats=None, _depth=0):
+    """
+    Page URLs listed by a sitemap, following sitemap indexes. Gzipped sitemaps (.xml.gz, or
+    gzip bodies whatever their name) are decompressed on the fly; nothing is fully loaded in memory.
+
+    Fetch and parse errors are logged and end the iteration of that sitemap.
+
+    Parameters:
+    - sitemap_url: URL of a sitemap or sitemap index
+    - stats: Optional dict; stats['files'] counts the sitemap files actually served (HTTP 200)
+    """
+    try:
+        response = get_session().get(sitemap_url, timeout=FETCH_TIMEOUT, stream=True)
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Could not fetch sitemap {sitemap_url}: {str(e)}")
+        return
+    child_sitemaps = []
+    try:
+        if response.status_code != 200:
+            logger.info(f"Sitemap {sitemap_url} returned HTTP {response.status_code}")
+            return
+        if stats is not None:
+            stats['files'] = stats.get('files', 0) + 1
+        # iter_content already undoes a Content-Encoding: gzip; a .xml.gz file is gunzipped here
+        chunks = _decompressed_chunks(response.iter_content(SITEMAP_READ_SIZE), sitemap_url)
+        for kind, loc in _parse_sitemap(chunks, sitemap_url):
+            if kind == 'url':
+                yield loc
+            elif _depth < SITEMAP_MAX_DEPTH:
+                child_sitemaps.append(loc)
+    except (zlib.error, requests.exceptions.RequestException) as e:
+        logger.warning(f"Error while reading sitemap {sitemap_url}: {str(e)}")
+    finally:
+        response.close()
+
+    # Child sitemaps are read once the index connection is released
+    for child_url in child_sitemaps:
+        yield from iter_sitemap_urls(child_url, stats, _depth + 1)
+
+def _url_key(url):
+    """8-byte digest of a normalized URL: 50,000 sitemap entries fit in a few megabytes."""
+    return hashlib.blake2b(normalize_url(url).encode('utf-8'), digest_size=8).digest()
+
+class SiteFiles:
+    """robots.txt and sitemap summary of one origin, as used by analyze_technical."""
+
+    def __init__(self, origin, robots, sitemap_urls, sitemap_declared, sitemap_files, url_count, truncated, url_keys):
+        self.origin = origin
+        self.robots = robots  # RobotsFile
+        self.sitemap_urls = sitemap_urls  # Sitemaps looked up: declared in robots.txt, or /sitemap.xml
+        self.sitemap_declared = sitemap_declared
+        self.sitemap_files = sitemap_files  # Sitemap files found (indexes and their children)
+        self.url_count = url_count  # Page URLs read, at most SITEMAP_MAX_URLS
+        self.truncated = truncated  # True if the sitemaps list more than SITEMAP_MAX_URLS URLs
+        self._url_keys = url_keys
+        self.loaded_at = time.monotonic()
+
+    @property
+    def has_sitemap(self):
+        return self.sitemap_files > 0
+
+    def lists(self, url):
+        """True if the sitemaps (their first SITEMAP_MAX_URLS entries) list this URL."""
+        return _url_key(url) in self._url_keys
+
+def load_site_files(origin):
+    """Fetch robots.txt and read the sitemaps of an origin (no cache: see get_site_files)."""
+    started = time.perf_counter()
+    robots = fetch_robots(origin)
+    declared = robots.sitemaps
+    sitemap_urls = declared or [origin + '/sitemap.xml']
+    stats = {}
+    url_keys = set()
+    truncated = False
+    for sitemap_url in sitemap_urls:
+        for loc in iter_sitemap_urls(sitemap_url, stats):
+            if len(url_keys) >= SITEMAP_MAX_URLS:
+                truncated = True
+                break
+            url_keys.add(_url_key(loc))
+        if truncated:
+            break
+    site = SiteFiles(origin, robots, sitemap_urls, bool(declared), stats.get('files', 0), len(url_keys), truncated, url_keys)
+    logger.info(f"Loaded site files of {origin} in {time.perf_counter() - started:.2f}s: robots.txt {robots.status}, "
+                f"{site.sitemap_files} sitemap file(s), {site.url_count} URLs{' (truncated)' if truncated else ''}")
+    return site
+
+class SiteFilesCache:
+    """
+    Per-process cache of SiteFiles by origin, with a TTL and LRU eviction.
+
+    Loads are single-flight: when 200 pages of one site are analyzed at once, the first one
+    fetches robots.txt and the sitemaps while the others wait for its result.
+    """
+
+    def __init__(self, ttl=SITE_FILES_TTL, max_entries=SITE_FILES_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._origin_locks = {}
+
+    def _fresh(self, origin):
+        with self._lock:
+            site = self._entries.get(origin)
+            if site is None:
+                return None
+            if time.monotonic() - site.loaded_at > self.ttl:
+                del self._entries[origin]
+                return None
+            self._entries.move_to_end(origin)
+            return site
+
+    def get(self, url):
+        origin = site_origin(url)
+        site = self._fresh(origin)
+        if site is not None:
+            return site
+        with self._lock:
+            origin_lock = self._origin_locks.setdefault(origin, threading.Lock())
+        with origin_lock:
+            site = self._fresh(origin)  # Loaded by another thread while we waited
+            if site is None:
+                site = load_site_files(origin)
+                with self._lock:
+                    self._entries[origin] = site
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        with self._lock:
+            if not origin_lock.locked():
+                self._origin_locks.pop(origin, None)
+        return site
+
+_site_files_cache = SiteFilesCache()
+
+def get_site_files(url):
+    """SiteFiles of the site of a URL, from the process-wide cache (loaded at most once per SITE_FILES_TTL)."""
+    return _site_files_cache.get(url)
@@ -97,6 +97,7 @@ function addUserMessage(message) {
 /**
  * Add a bot message to the chat
  * @param {String} message - Bot message text/HTML
+ * @returns {HTMLElement} The message element
  */
 function addBotMessage(message) {
   const chatMessages = document.getElementById('chat-messages');
@@ -118,6 +119,19 @@ function addBotMessage(message) {
   
   // Scroll to bottom
   chatMessages.scrollTop = chatMessages.scrollHeight;
+  
+  return messageElement;
+}
+
+/**
+ * Replace the text of a bot message (used while its reply is streamed)
+ * @param {HTMLElement} messageElement - Element returned by addBotMessage
+ * @param {String} message - Bot message text/HTML
+ */
+function updateBotMessage(messageElement, message) {
+  const chatMessages = document.getElementById('chat-messages');
+  messageElement.querySelector('.message-content p').innerHTML = message;
+  chatMessages.scrollTop = chatMessages.scrollHeight;
 }
 
 /**
@@ -158,14 +172,71 @@ function getBotResponse(message) {
   
   // Get context if available
   const analysisId = document.getElementById('analysis-id')?.value;
-  let apiUrl = '/api/chatbot';
+  const apiUrl = '/api/chatbot';
+  const query = analysisId ? `?analysis_id=${analysisId}` : '';
+  const showError = error => {
+    // Add error message - get from meta or use default
+    const errorText = document.querySelector('meta[name="error-message"]')?.getAttribute('content') || 
+      `I'm sorry, I encountered an error: ${error.message}. Please try again later.`;
+    addBotMessage(errorText);
+  };
   
-  if (analysisId) {
-    apiUrl += `?analysis_id=${analysisId}`;
+  if (!window.ReadableStream || !window.TextDecoder) {
+    requestBotResponse(`${apiUrl}${query}`, message, loadingMessage).catch(showError);
+    return;
   }
   
-  // Send request to API
-  fetch(apiUrl, {
+  // Streamed reply: shown as it is written instead of after the whole answer
+  let botMessage = null;
+  let reply = '';
+  const show = text => {
+    if (botMessage) {
+      updateBotMessage(botMessage, text);
+    } else {
+      loadingMessage.remove();
+      botMessage = addBotMessage(text);
+    }
+  };
+  
+  fetch(`${apiUrl}/stream${query}`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ message: message }),
+  })
+    .then(response => {
+      if (!response.ok || !response.body) {
+        throw new Error('Failed to get response');
+      }
+      return readEventStream(response, (event, data) => {
+        if (event === 'text') {
+          reply += data.delta;
+          show(reply);
+        } else if (event === 'done' || event === 'error') {
+          show(data.response);
+        }
+      });
+    })
+    .catch(error => {
+      if (botMessage) {
+        // Part of the reply is shown already: keep it
+        return;
+      }
+      // Stream not available (proxy, old browser): ask for the whole reply at once
+      return requestBotResponse(`${apiUrl}${query}`, message, loadingMessage).catch(showError);
+    });
+}
+
+/**
+ * Get the whole bot response in one JSON request
+ * @param {String} url - Chatbot API URL
+ * @param {String} message - User message
+ * @param {HTMLElement} loadingMessage - Loading message to remove once answered
+ * @returns {Promise} Resolved once the reply is shown
+ */
+function requestBotResponse(url, message, loadingMessage) {
+  return fetch(url, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
@@ -188,11 +259,7 @@ function getBotResponse(message) {
     .catch(error => {
       // Remove loading message
       loadingMessage.remove();
-      
-      // Add error message - get from meta or use default
-      const errorText = document.querySelector('meta[name="error-message"]')?.getAttribute('content') || 
-        `I'm sorry, I encountered an error: ${error.message}. Please try again later.`;
-      addBotMessage(errorText);
+      throw error;
     });
 }
 
@@ -36,14 +36,15 @@ function initializeAnalysisHistory() {
     </tr>
   `;
   
-  // Fetch analysis history
-  fetch('/api/analyses')
+  // Fetch analysis history (first page, newest first)
+  fetch('/api/analyses?limit=50&fields=id,url,analysis_type,created_at,overall_score')
     .then(response => {
       if (!response.ok) {
         throw new Error('Failed to load analysis history');
       }
       return response.json();
     })
+    .then(page => page.analyses)
     .then(data => {
       if (data.length === 0) {
         tableBody.innerHTML = `
@@ -120,13 +121,14 @@ function initializeScoreChart() {
   if (!chartCanvas) return;
   
   // Fetch data for chart
-  fetch('/api/analyses')
+  fetch('/api/analyses?limit=10&fields=url,overall_score')
     .then(response => {
       if (!response.ok) {
         throw new Error('Failed to load analysis data');
       }
       return response.json();
     })
+    .then(page => page.analyses)
     .then(data => {
       if (data.length === 0) {
         // No data to display
@@ -201,3 +201,47 @@ function showAlert(message, type = 'info', containerId = 'alert-container', dura
     }, duration);
   }
 }
+
+/**
+ * Read a Server-Sent Events response (fetch is used instead of EventSource, which cannot POST)
+ * @param {Response} response - Fetch response with a text/event-stream body
+ * @param {Function} onEvent - Called with (eventName, data) for each event; data is parsed JSON
+ * @returns {Promise} Resolved when the stream ends
+ */
+function readEventStream(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  
+  const dispatch = block => {
+    let eventName = 'message';
+    const dataLines = [];
+    block.split('\n').forEach(line => {
+      if (line.startsWith('event:')) {
+        eventName = line.slice(6).trim();
+      } else if (line.startsWith('data:')) {
+        dataLines.push(line.slice(5).trimStart());
+      }
+    });
+    // Comment-only blocks (keep-alives) carry no data
+    if (dataLines.length) {
+      onEvent(eventName, JSON.parse(dataLines.join('\n')));
+    }
+  };
+  
+  const read = () => reader.read().then(({ done, value }) => {
+    buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+    let separator;
+    while ((separator = buffer.indexOf('\n\n')) !== -1) {
+      dispatch(buffer.slice(0, separator));
+      buffer = buffer.slice(separator + 2);
+    }
+    if (done) {
+      if (buffer.trim()) dispatch(buffer);
+      return;
+    }
+    return read();
+  });
+  
+  return read();
+}
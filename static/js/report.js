@@ -4,6 +4,9 @@
  */
 
 document.addEventListener('DOMContentLoaded', () => {
+  // Follow the background analysis job if the report is not ready yet
+  initJobProgress();
+  
   // Initialize the AI recommendations section if present
   initAIRecommendations();
   
@@ -14,6 +17,68 @@ document.addEventListener('DOMContentLoaded', () => {
   }
 });
 
+// Approximate completion shown for each job stage
+const JOB_STAGE_PROGRESS = {
+  queued: 5,
+  fetching: 20,
+  parsing: 45,
+  scoring: 65,
+  ai: 85,
+  done: 100,
+  failed: 100
+};
+
+const JOB_POLL_INTERVAL_MS = 1500;
+
+/**
+ * Poll the background analysis job and reload the report once it is done
+ */
+function initJobProgress() {
+  const progressCard = document.getElementById('job-progress');
+  if (!progressCard) return;
+  
+  const statusUrl = progressCard.dataset.statusUrl;
+  const stageLabels = JSON.parse(progressCard.dataset.stageLabels || '{}');
+  const stageElement = document.getElementById('job-progress-stage');
+  const progressBar = document.getElementById('job-progress-bar');
+  const errorElement = document.getElementById('job-progress-error');
+  const spinner = document.getElementById('job-progress-spinner');
+  
+  const poll = () => {
+    fetch(statusUrl)
+      .then(response => {
+        if (!response.ok) {
+          throw new Error('Failed to load analysis status');
+        }
+        return response.json();
+      })
+      .then(job => {
+        const progress = JOB_STAGE_PROGRESS[job.status] || 5;
+        progressBar.style.width = `${progress}%`;
+        progressBar.setAttribute('aria-valuenow', progress);
+        stageElement.textContent = stageLabels[job.status] || job.status;
+        
+        if (job.status === 'done') {
+          window.location.reload();
+        } else if (job.status === 'failed') {
+          spinner?.classList.add('d-none');
+          progressBar.classList.remove('progress-bar-animated');
+          progressBar.classList.add('bg-danger');
+          errorElement.textContent = job.error || '';
+          errorElement.classList.remove('d-none');
+        } else {
+          setTimeout(poll, JOB_POLL_INTERVAL_MS);
+        }
+      })
+      .catch(() => {
+        // Transient network error: keep polling, a bit slower
+        setTimeout(poll, JOB_POLL_INTERVAL_MS * 2);
+      });
+  };
+  
+  poll();
+}
+
 /**
  * Initialize the AI recommendations section
  */
@@ -22,6 +87,8 @@ function initAIRecommendations() {
   const analysisId = document.getElementById('analysis-id')?.value;
   
   if (!aiRecommendationsContainer || !analysisId) return;
+  // The report template loads them itself (translated rendering): avoid a second generation stream
+  if (aiRecommendationsContainer.dataset.loader === 'inline') return;
   
   // Show loading state
   aiRecommendationsContainer.innerHTML = `
@@ -33,14 +100,8 @@ function initAIRecommendations() {
     </div>
   `;
   
-  // Fetch AI recommendations
-  fetch(`/api/ai-recommendations/${analysisId}`)
-    .then(response => {
-      if (!response.ok) {
-        throw new Error('Failed to load AI recommendations');
-      }
-      return response.json();
-    })
+  // Stream AI recommendations, rendering them as they are written
+  streamAIRecommendations(analysisId, false, partial => renderAIRecommendations(partial, aiRecommendationsContainer))
     .then(data => {
       renderAIRecommendations(data, aiRecommendationsContainer);
     })
@@ -55,7 +116,82 @@ function initAIRecommendations() {
 }
 
 /**
- * Render AI recommendations
+ * Fetch the stored AI recommendations of an analysis, waiting while the worker is still generating them
+ * @param {string} analysisId - Analysis ID
+ * @param {boolean} refresh - Ask for a new generation instead of the stored copy
+ * @returns {Promise<Object>} Recommendations data
+ */
+function fetchAIRecommendations(analysisId, refresh = false) {
+  return fetch(`/api/ai-recommendations/${analysisId}${refresh ? '?refresh=1' : ''}`)
+    .then(response => {
+      if (response.status === 202) {
+        const retryAfter = parseInt(response.headers.get('Retry-After') || '3', 10);
+        return new Promise(resolve => setTimeout(resolve, retryAfter * 1000))
+          .then(() => fetchAIRecommendations(analysisId));
+      }
+      if (!response.ok) {
+        throw new Error('Failed to load AI recommendations');
+      }
+      return response.json();
+    });
+}
+
+/**
+ * Stream the AI recommendations of an analysis (Server-Sent Events), falling back to fetchAIRecommendations
+ * when the browser cannot read a response stream or the stream breaks
+ * @param {string} analysisId - Analysis ID
+ * @param {boolean} refresh - Ask for a new generation instead of the stored copy
+ * @param {Function} onUpdate - Called with the partial recommendations each time a part arrives
+ * @returns {Promise<Object>} Complete recommendations data
+ */
+function streamAIRecommendations(analysisId, refresh = false, onUpdate = null) {
+  if (!window.ReadableStream || !window.TextDecoder) {
+    return fetchAIRecommendations(analysisId, refresh);
+  }
+  
+  const partial = { summary: '', priorities: [], recommendations: [], insights: '' };
+  let result = null;
+  let retryAfter = null;
+  let streamStarted = false;
+  
+  return fetch(`/api/ai-recommendations/${analysisId}/stream${refresh ? '?refresh=1' : ''}`)
+    .then(response => {
+      if (!response.ok || !response.body) {
+        throw new Error('Failed to load AI recommendations');
+      }
+      streamStarted = true;
+      return readEventStream(response, (event, data) => {
+        if (event === 'text') {
+          partial[data.field] += data.delta;
+        } else if (event === 'item') {
+          partial[data.field][data.index] = data.value;
+        } else if (event === 'done') {
+          result = data;
+          return;
+        } else if (event === 'pending') {
+          retryAfter = data.retry_after;
+          return;
+        } else if (event === 'error') {
+          throw new Error(data.error);
+        }
+        if (onUpdate) onUpdate(partial);
+      });
+    })
+    .then(() => {
+      if (result) return result;
+      if (retryAfter !== null) {
+        // The background worker is still generating them
+        return new Promise(resolve => setTimeout(resolve, retryAfter * 1000))
+          .then(() => streamAIRecommendations(analysisId, false, onUpdate));
+      }
+      throw new Error('AI recommendations stream ended early');
+    })
+    // A started generation is finished and stored by the server even if the stream broke: do not start another one
+    .catch(() => fetchAIRecommendations(analysisId, refresh && !streamStarted));
+}
+
+/**
+ * Render AI recommendations (also called with partial recommendations while they are streamed)
  * @param {Object} data - Recommendations data
  * @param {HTMLElement} container - Container element
  */
@@ -72,7 +208,7 @@ function renderAIRecommendations(data, container) {
   `;
   
   // Add priorities
-  data.priorities.forEach(priority => {
+  (data.priorities || []).forEach(priority => {
     html += `<li class="list-group-item"><i class="fas fa-arrow-right text-primary me-2"></i> ${priority}</li>`;
   });
   
@@ -85,7 +221,7 @@ function renderAIRecommendations(data, container) {
   `;
   
   // Add recommendations
-  data.recommendations.forEach(rec => {
+  (data.recommendations || []).forEach(rec => {
     html += `
       <div class="card mb-3">
         <div class="card-header bg-light">
@@ -97,7 +233,7 @@ function renderAIRecommendations(data, container) {
           <ol>
     `;
     
-    rec.steps.forEach(step => {
+    (rec.steps || []).forEach(step => {
       html += `<li>${step}</li>`;
     });
     
@@ -113,7 +249,7 @@ function renderAIRecommendations(data, container) {
     
     <div>
       <h5 class="fw-bold">Additional Insights</h5>
-      <p>${data.insights}</p>
+      <p>${data.insights || ''}</p>
     </div>
   `;
   
@@ -0,0 +1,200 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Server-Sent Events helpers shared by the streaming endpoints (AI recommendations, chatbot)
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',  # Nginx/Railway proxies must not buffer the stream
+}
+
+def sse_event(event, data):
+    """Format one SSE event; data is sent as JSON on a single line."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def sse_comment(text=''):
+    """SSE comment line: ignored by clients, used to flush the headers right away."""
+    return f": {text}\n\n"
+
+class _Incomplete(Exception):
+    pass
+
+class _PartialJSONParser:
+    """
+    Parser for a JSON document cut at an arbitrary byte, as produced by a streamed response.
+
+    Returns what can be read so far: objects and arrays without their closing bracket, a string
+    cut in the middle (its decoded prefix), and no value at all for a number or literal that may
+    still grow. Each value also reports whether it is complete; the keys of the outermost object
+    whose value is complete are collected in complete_keys.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+        self.depth = 0
+        self.complete_keys = set()
+
+    def _skip_whitespace(self):
+        while self.pos < len(self.text) and self.text[self.pos] in ' \t\r\n':
+            self.pos += 1
+
+    def _peek(self):
+        self._skip_whitespace()
+        if self.pos >= len(self.text):
+            raise _Incomplete()
+        return self.text[self.pos]
+
+    def parse_value(self):
+        """Returns (value, complete)."""
+        char = self._peek()
+        if char == '{':
+            return self._parse_object()
+        if char == '[':
+            return self._parse_array()
+        if char == '"':
+            return self._parse_string()
+        return self._parse_scalar()
+
+    def _parse_object(self):
+        self.pos += 1
+        self.depth += 1
+        result = {}
+        try:
+            while True:
+                char = self._peek()
+                if char == '}':
+                    self.pos += 1
+                    return result, True
+                if char == ',':
+                    self.pos += 1
+                    continue
+                key, key_complete = self._parse_string()
+                if not key_complete or self._peek() != ':':
+                    return result, False
+                self.pos += 1
+                value, complete = self.parse_value()
+                result[key] = value
+                if not complete:
+                    return result, False
+                if self.depth == 1:
+                    self.complete_keys.add(key)
+        except _Incomplete:
+            return result, False
+        finally:
+            self.depth -= 1
+
+    def _parse_array(self):
+        self.pos += 1
+        result = []
+        try:
+            while True:
+                char = self._peek()
+                if char == ']':
+                    self.pos += 1
+                    return result, True
+                if char == ',':
+                    self.pos += 1
+                    continue
+                value, complete = self.parse_value()
+                result.append(value)
+                if not complete:
+                    return result, False
+        except _Incomplete:
+            return result, False
+
+    def _parse_string(self):
+        if self._peek() != '"':
+            raise ValueError(f"Expected a string at position {self.pos}")
+        start = self.pos
+        self.pos += 1
+        while self.pos < len(self.text):
+            char = self.text[self.pos]
+            if char == '\\':
+                self.pos += 2
+                continue
+            if char == '"':
+                self.pos += 1
+                return json.loads(self.text[start:self.pos]), True
+            self.pos += 1
+        # Cut inside the string: decode what is there, minus a trailing partial escape
+        body = self.text[start + 1:]
+        for cut in range(0, 7):
+            try:
+                value = json.loads('"' + body[:len(body) - cut] + '"')
+                if value and '\ud800' <= value[-1] <= '\udbff':
+                    value = value[:-1]  # First half of an escaped surrogate pair
+                return value, False
+            except ValueError:
+                continue
+        return '', False
+
+    def _parse_scalar(self):
+        start = self.pos
+        while self.pos < len(self.text) and self.text[self.pos] not in ',]} \t\r\n':
+            self.pos += 1
+        if self.pos >= len(self.text):
+            raise _Incomplete()  # The number or literal may still grow
+        return json.loads(self.text[start:self.pos]), True
+
+def parse_partial_json(text):
+    """
+    Best-effort value of a truncated JSON document (see _PartialJSONParser).
+
+    Returns:
+    - (value, complete_keys); value is None if nothing can be read yet
+    """
+    parser = _PartialJSONParser(text)
+    try:
+        value, _ = parser.parse_value()
+    except _Incomplete:
+        return None, set()
+    return value, parser.complete_keys
+
+class RecommendationStreamAssembler:
+    """
+    Turns the streamed JSON of get_seo_recommendations into display events as soon as each part is known.
+
+    feed() takes the next text delta and returns a list of (event, data):
+    - ('text', {'field', 'delta'}): more text of 'summary' or 'insights'
+    - ('item', {'field', 'index', 'value'}): a finished entry of 'priorities' or 'recommendations'
+    Array entries are only sent once closed, so a recommendation never shows up half written.
+    The document is re-parsed on every delta: it stays a few kilobytes long.
+    """
+
+    TEXT_FIELDS = ('summary', 'insights')
+    ARRAY_FIELDS = ('priorities', 'recommendations')
+
+    def __init__(self):
+        self.buffer = ''
+        self.sent_text = {field: 0 for field in self.TEXT_FIELDS}
+        self.sent_items = {field: 0 for field in self.ARRAY_FIELDS}
+
+    def feed(self, delta):
+        self.buffer += delta
+        try:
+            document, complete_keys = parse_partial_json(self.buffer)
+        except ValueError as e:
+            logger.debug(f"Unparsable streamed recommendations so far: {str(e)}")
+            return []
+        if not isinstance(document, dict):
+            return []
+
+        events = []
+        for field in self.TEXT_FIELDS:
+            value = document.get(field)
+            if isinstance(value, str) and len(value) > self.sent_text[field]:
+                events.append(('text', {'field': field, 'delta': value[self.sent_text[field]:]}))
+                self.sent_text[field] = len(value)
+        for field in self.ARRAY_FIELDS:
+            items = document.get(field)
+            if not isinstance(items, list):
+                continue
+            # The last entry may still be being written until the array is closed
+            finished = items if field in complete_keys else items[:-1]
+            for index in range(self.sent_items[field], len(finished)):
+                events.append(('item', {'field': field, 'index': index, 'value': finished[index]}))
+            self.sent_items[field] = max(self.sent_items[field], len(finished))
+        return events
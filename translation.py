@@ -1,24 +1,158 @@
-import json
 import os
-from flask import request, session, g, redirect
+import json
+import time
+import logging
+import threading
+from flask import request, session, g, redirect, has_request_context
+
+logger = logging.getLogger(__name__)
+
+# Catalogues de traduction : translations/<lang>/messages.json, chargés et aplatis une seule fois
+# ({'report.title': '...'}) ; la recherche d'une clé est un simple accès au dictionnaire.
+TRANSLATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'translations')
+DEFAULT_LANGUAGE = 'fr'
+LANGUAGE_NAMES = {'fr': 'Français', 'en': 'English'}
+# Rechargement à chaud si un fichier change (défaut : en mode debug uniquement)
+TRANSLATIONS_AUTO_RELOAD = os.environ.get('TRANSLATIONS_AUTO_RELOAD', os.environ.get('FLASK_DEBUG', 'false')).lower() in ('1', 'true', 'yes')
+RELOAD_CHECK_INTERVAL = 1.0  # Seconds between two mtime checks when auto-reload is on
 
-def load_translations(lang_code):
+def flatten(messages, prefix=''):
+    """{'a': {'b': 'x'}} -> {'a.b': 'x'}"""
+    flat = {}
+    for key, value in messages.items():
+        dotted = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, dotted + '.'))
+        else:
+            flat[dotted] = value
+    return flat
+
+class Catalogs:
     """
-    Load translations for the given language code
-    
+    Flattened translation catalogs of every language found in TRANSLATIONS_DIR.
+
+    Keys missing from a catalog are answered from the DEFAULT_LANGUAGE one and reported once each
+    (log warning, and missing_keys() for the CLI report).
+    """
+
+    def __init__(self, directory=TRANSLATIONS_DIR, auto_reload=TRANSLATIONS_AUTO_RELOAD):
+        self.directory = directory
+        self.auto_reload = auto_reload
+        self._catalogs = {}
+        self._mtimes = {}
+        self._missing = set()  # (lang, key) already reported
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self.load()
+
+    def _paths(self):
+        paths = {}
+        for lang in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, lang, 'messages.json')
+            if os.path.isfile(path):
+                paths[lang] = path
+        return paths
+
+    def load(self):
+        """(Re)load every catalog. A catalog that fails to parse keeps its previous version."""
+        catalogs, mtimes = dict(self._catalogs), {}
+        for lang, path in self._paths().items():
+            mtimes[lang] = os.path.getmtime(path)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    catalogs[lang] = flatten(json.load(f))
+            except (OSError, json.JSONDecodeError) as e:
+                logger.error(f"Could not load translations {path}: {str(e)}")
+        self._catalogs, self._mtimes = catalogs, mtimes
+        self._missing = set()
+        logger.info(f"Loaded translation catalogs: {', '.join(f'{lang} ({len(keys)} keys)' for lang, keys in catalogs.items())}")
+
+    def _reload_if_changed(self):
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return
+        with self._lock:
+            if now - self._checked_at < RELOAD_CHECK_INTERVAL:
+                return
+            self._checked_at = now
+            try:
+                changed = {lang: os.path.getmtime(path) for lang, path in self._paths().items()} != self._mtimes
+            except OSError:
+                return
+            if changed:
+                logger.info("Translation files changed, reloading")
+                self.load()
+
+    @property
+    def languages(self):
+        return list(self._catalogs)
+
+    def lookup(self, lang, key):
+        """Translation of a dotted key, from the lang catalog, else the DEFAULT_LANGUAGE one, else None."""
+        if self.auto_reload:
+            self._reload_if_changed()
+        catalog = self._catalogs.get(lang) or self._catalogs.get(DEFAULT_LANGUAGE, {})
+        value = catalog.get(key)
+        if value is not None:
+            return value
+        if (lang, key) not in self._missing:
+            self._missing.add((lang, key))
+            logger.warning(f"Missing translation '{key}' for '{lang}'")
+        return self._catalogs.get(DEFAULT_LANGUAGE, {}).get(key)
+
+    def get(self, lang, key, default=None):
+        """Like lookup, but default or the key itself when no catalog has it."""
+        value = self.lookup(lang, key)
+        return value if value is not None else (default or key)
+
+    def messages(self, lang, prefix=''):
+        """{dotted key: text} of the lang catalog whose keys start with prefix."""
+        return {key: value for key, value in self._catalogs.get(lang, {}).items() if key.startswith(prefix)}
+
+    def missing_keys(self):
+        """{lang: sorted keys present in another catalog but not in this one}"""
+        all_keys = set().union(*self._catalogs.values()) if self._catalogs else set()
+        return {lang: sorted(all_keys - set(catalog)) for lang, catalog in self._catalogs.items()}
+
+_catalogs = None
+
+def get_catalogs():
+    """Process-wide Catalogs, loaded on first use."""
+    global _catalogs
+    if _catalogs is None:
+        _catalogs = Catalogs()
+    return _catalogs
+
+def translate(key, default=None, lang_code=None):
+    """Translate a dotted key into lang_code (default: the locale of the current request)."""
+    if lang_code is None:
+        lang_code = g.get('locale', DEFAULT_LANGUAGE) if has_request_context() else DEFAULT_LANGUAGE
+    return get_catalogs().get(lang_code, key, default)
+
+def render_finding(code, part, params=None, lang_code=None, fallback=None):
+    """
+    Text of an analyzer finding from its message code and parameters (catalog key findings.<code>.<part>).
+
     Parameters:
-    - lang_code: Language code (e.g., 'fr', 'en')
-    
+    - code: Message code emitted by seo_analyzer (e.g. 'meta.title.too_long')
+    - part: 'description' or 'recommendation'
+    - params: Values of the {placeholders} of the message
+    - lang_code: Language (default: the locale of the current request)
+    - fallback: Returned if the code is unknown or its message does not format
+
     Returns:
-    - Dictionary with translations
+    - The text
     """
+    if lang_code is None:
+        lang_code = g.get('locale', DEFAULT_LANGUAGE) if has_request_context() else DEFAULT_LANGUAGE
+    template = get_catalogs().lookup(lang_code, f"findings.{code}.{part}")
+    if template is None:
+        return fallback
     try:
-        with open(f'translations/{lang_code}/messages.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        # Fallback to French if translation file is not found or invalid
-        with open('translations/fr/messages.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return template.format(**(params or {}))
+    except (KeyError, IndexError, ValueError) as e:
+        logger.warning(f"Could not format finding {code}.{part} with {params}: {str(e)}")
+        return fallback
 
 def get_locale():
     """
@@ -50,18 +184,7 @@ def get_supported_languages():
     Returns:
     - List of dictionaries with language code and name
     """
-    languages = []
-    for lang_dir in os.listdir('translations'):
-        path = os.path.join('translations', lang_dir)
-        if os.path.isdir(path):
-            if lang_dir == 'fr':
-                name = 'Français'
-            elif lang_dir == 'en':
-                name = 'English'
-            else:
-                name = lang_dir.upper()
-            languages.append({'code': lang_dir, 'name': name})
-    return languages
+    return [{'code': lang, 'name': LANGUAGE_NAMES.get(lang, lang.upper())} for lang in get_catalogs().languages]
 
 def init_app(app):
     """
@@ -70,11 +193,14 @@ def init_app(app):
     Parameters:
     - app: Flask application instance
     """
+    catalogs = get_catalogs()
+    for lang, keys in catalogs.missing_keys().items():
+        if keys:
+            logger.warning(f"Translation catalog '{lang}' lacks {len(keys)} keys (python translation.py lists them)")
+
     @app.before_request
     def set_locale():
         g.locale = get_locale()
-        g.translations = load_translations(g.locale)
-        g.languages = get_supported_languages()
     
     @app.route('/set-language/<lang_code>')
     def set_language(lang_code):
@@ -87,67 +213,44 @@ def init_app(app):
     # Add a translation function to Jinja templates
     @app.template_filter('translate')
     def translate_filter(key, default=None):
-        keys = key.split('.')
-        value = g.translations
-        for k in keys:
-            if k in value:
-                value = value[k]
-            else:
-                return default or key
-        return value
+        return translate(key, default)
     
     # Add a shorter alias for translate
     app.jinja_env.globals['_'] = translate_filter
+    app.jinja_env.globals['languages'] = get_supported_languages()
     
-    # Add a filter for translating SEO recommendations
-    @app.template_filter('translate_recommendation')
-    def translate_recommendation(recommendation):
-        # Title recommendations
-        if recommendation == "Your title is too long. Keep it under 60 characters for better visibility in search results.":
-            return translate_filter("report.your_title_is_too_long")
-        elif recommendation == "Your title is too short. Make it more descriptive.":
-            return "Votre titre est trop court. Rendez-le plus descriptif."
-        elif recommendation == "Your title is the optimal length.":
-            return "Votre titre a une longueur optimale."
-        elif recommendation == "Add a descriptive title tag to your page. This is crucial for SEO.":
-            return "Ajoutez une balise titre descriptive à votre page. C'est crucial pour le SEO."
-            
-        # Meta description recommendations
-        elif recommendation == "Add a meta description to improve CTR from search results.":
-            return translate_filter("report.add_meta_description")
-        elif recommendation == "Your meta description is the optimal length.":
-            return "Votre meta description a une longueur optimale."
-        elif recommendation == "Your meta description is too short. Aim for 50-160 characters.":
-            return "Votre meta description est trop courte. Visez entre 50 et 160 caractères."
-        elif recommendation == "Your meta description is too long. Keep it under 160 characters.":
-            return "Votre meta description est trop longue. Gardez-la sous 160 caractères."
-            
-        # Keywords recommendations
-        elif recommendation == "While not critical for SEO, meta keywords can help with site organization.":
-            return translate_filter("report.while_not_critical")
-        elif recommendation == "Your keyword count is good, though search engines give less weight to the keywords meta tag now.":
-            return "Votre nombre de mots-clés est bon, bien que les moteurs de recherche accordent maintenant moins d'importance à la balise meta keywords."
-        elif recommendation == "Consider adding more keywords, although this tag has diminished SEO value.":
-            return "Envisagez d'ajouter plus de mots-clés, bien que cette balise ait une valeur SEO diminuée."
-        elif recommendation == "Too many keywords may appear as keyword stuffing.":
-            return "Trop de mots-clés peuvent apparaître comme du bourrage de mots-clés."
-            
-        # Open Graph recommendations
-        elif recommendation == "Missing Open Graph tags. Add them to improve appearance when shared on social media.":
-            return "Balises Open Graph manquantes. Ajoutez-les pour améliorer l'apparence lors du partage sur les réseaux sociaux."
-        elif recommendation == "Some Open Graph tags are missing. Complete them for better social media sharing.":
-            return "Certaines balises Open Graph sont manquantes. Complétez-les pour un meilleur partage sur les réseaux sociaux."
-        elif recommendation == "Your Open Graph tags are complete, good for social sharing.":
-            return "Vos balises Open Graph sont complètes, idéales pour le partage social."
-        
-        # Content recommendations
-        elif recommendation == "Add more content to your page.":
-            return "Ajoutez plus de contenu à votre page."
-        elif recommendation == "Add an H1 tag to your page.":
-            return "Ajoutez une balise H1 à votre page."
-        elif recommendation == "Improve your heading structure.":
-            return "Améliorez la structure de vos titres."
-        
-        # Default fallback for non-matched recommendations
-        else:
-            return recommendation
\ No newline at end of file
+    # Description / recommendation of a detail (analysis_details.Finding) in the current language, from its
+    # message code. Details without a code (not backfilled yet, see schema.py) keep their stored English text.
+    @app.template_filter('finding')
+    def finding_filter(detail, part):
+        stored = getattr(detail, part)
+        if not detail.message_code:
+            return stored
+        return render_finding(detail.message_code, part, detail.params, fallback=stored)
+
+def _template_keys(templates_dir):
+    """Static translation keys used by the templates: _('a.b') and 'a.b'|translate."""
+    import re
+    import glob
+    pattern = re.compile(r"""_\(\s*['"]([^'"]+)['"]|['"]([^'"]+)['"]\s*\|\s*translate""")
+    keys = set()
+    for path in glob.glob(os.path.join(templates_dir, '**', '*.html'), recursive=True):
+        with open(path, 'r', encoding='utf-8') as f:
+            for match in pattern.finditer(f.read()):
+                key = match.group(1) or match.group(2)
+                if not key.endswith('.'):  # Prefix of a key built at render time ('pricing.' ~ plan)
+                    keys.add(key)
+    return keys
+
+if __name__ == '__main__':
+    # Rapport des clés manquantes : python translation.py
+    catalogs = Catalogs(auto_reload=False)
+    used = _template_keys(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates'))
+    exit_code = 0
+    for lang, keys in catalogs.missing_keys().items():
+        keys = sorted(set(keys) | (used - set(catalogs._catalogs[lang])))
+        print(f"{lang}: {len(keys)} missing keys")
+        for key in keys:
+            print(f"  {key}")
+        exit_code = exit_code or (1 if keys else 0)
+    raise SystemExit(exit_code)
@@ -0,0 +1,125 @@
+import sys
+import logging
+from datetime import date, datetime
+from sqlalchemy import select, func, update, literal_column
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from models import Analysis, UsageCounter
+
+logger = logging.getLogger(__name__)
+
+# Compteurs d'usage par utilisateur et par mois (table usage_counter) : le quota mensuel d'analyses se lit par
+# clé primaire au lieu d'un COUNT sur analysis. Le compteur est incrémenté dans la transaction qui crée les
+# analyses, sous verrou de ligne, ce qui empêche deux requêtes simultanées de dépasser ensemble le quota.
+# `python usage.py reconcile` recalcule les analyses depuis l'historique.
+
+class QuotaExceededError(Exception):
+    """Raised by reserve_analyses when the analyses would go over the monthly limit."""
+
+    def __init__(self, limit, used):
+        super().__init__(f"Monthly analysis limit of {limit} reached ({used} used).")
+        self.limit = limit
+        self.used = used
+
+def period_of(moment=None):
+    """Usage period (first day of the month) of a datetime, now (UTC) by default."""
+    moment = moment or datetime.utcnow()
+    return date(moment.year, moment.month, 1)
+
+def _upsert(values, set_):
+    """INSERT a usage_counter row, or apply set_ ({column: expression of the existing row and `excluded`}) to it."""
+    dialect = db.engine.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        stmt = (postgresql if dialect == 'postgresql' else sqlite).insert(UsageCounter).values(**values)
+        stmt = stmt.on_conflict_do_update(index_elements=[UsageCounter.user_id, UsageCounter.period],
+                                          set_=set_(stmt.excluded))
+        db.session.execute(stmt)
+        return
+    counter = db.session.get(UsageCounter, (values['user_id'], values['period']), with_for_update=True)
+    if counter is None:
+        db.session.add(UsageCounter(**values))
+    else:
+        for column, value in set_(UsageCounter(**values)).items():
+            setattr(counter, column, value)
+        db.session.flush()
+
+def _add(user_id, period, **amounts):
+    """Add amounts (analyses, ai_calls, tokens) to a counter, creating it if needed. Caller commits."""
+    values = {'user_id': user_id, 'period': period, 'analyses': 0, 'ai_calls': 0, 'tokens': 0, **amounts}
+    _upsert(values, lambda excluded: {column: getattr(UsageCounter, column) + getattr(excluded, column)
+                                      for column in ('analyses', 'ai_calls', 'tokens')})
+
+def monthly_analyses(user_id):
+    """Analyses counted for a user this month: one primary-key read."""
+    counter = db.session.get(UsageCounter, (user_id, period_of()))
+    return counter.analyses if counter else 0
+
+def reserve_analyses(user_id, count=1, limit=None):
+    """
+    Count new analyses of a user, in the transaction that creates them (the caller commits, or rolls
+    back on error, which gives them back).
+
+    The counter row is locked until the commit (the upsert takes the row lock in PostgreSQL, and the
+    write lock of the database in SQLite): concurrent reservations of the same user wait for each
+    other, so the limit cannot be overrun.
+
+    Raises QuotaExceededError (nothing is counted) if limit is given and would be exceeded.
+    """
+    period = period_of()
+    _add(user_id, period)
+    counter = db.session.get(UsageCounter, (user_id, period), with_for_update=True, populate_existing=True)
+    if limit is not None and counter.analyses + count > limit:
+        raise QuotaExceededError(limit, counter.analyses)
+    counter.analyses = UsageCounter.analyses + count
+
+def release_analysis(user_id, created_at):
+    """Give back the analysis of a failed job (failed analyses do not count against the quota). Caller commits."""
+    if user_id is None:
+        return
+    db.session.execute(
+        update(UsageCounter)
+        .where(UsageCounter.user_id == user_id, UsageCounter.period == period_of(created_at), UsageCounter.analyses > 0)
+        .values(analyses=UsageCounter.analyses - 1))
+
+def record_ai_usage(user_id, usage):
+    """Charge the DeepSeek calls and tokens of an AIUsage (ai_integration.metered_ai_usage) to a user. Caller commits."""
+    if user_id is None or usage is None or not usage.calls:
+        return
+    _add(user_id, period_of(), ai_calls=usage.calls, tokens=usage.tokens)
+
+def _month_expression():
+    """SQL expression of the first day of the month of Analysis.created_at."""
+    if db.engine.dialect.name == 'postgresql':
+        # Literal SQL, so that the GROUP BY expression is identical to the selected one
+        return literal_column("date(date_trunc('month', analysis.created_at))")
+    return func.date(Analysis.created_at, 'start of month')
+
+def reconcile_usage():
+    """
+    Recompute the analyses of every counter from the analysis table (AI calls and tokens have no
+    history to be rebuilt from: they are kept). Returns the number of user-months with analyses.
+    """
+    month = _month_expression().label('month')
+    rows = db.session.execute(
+        select(Analysis.user_id, month, func.count())
+        .where(Analysis.user_id.isnot(None))
+        .group_by(Analysis.user_id, month)).all()
+    db.session.execute(update(UsageCounter).values(analyses=0))
+    for user_id, month, count in rows:
+        if isinstance(month, str):
+            month = date.fromisoformat(month)  # SQLite returns date() as an ISO string
+        _upsert({'user_id': user_id, 'period': month, 'analyses': count, 'ai_calls': 0, 'tokens': 0},
+                lambda excluded: {'analyses': excluded.analyses})
+    db.session.commit()
+    logger.info(f"Reconciled usage counters: {len(rows)} user-months")
+    return len(rows)
+
+if __name__ == '__main__':
+    # python usage.py reconcile : recalcule les compteurs d'analyses depuis l'historique
+    if sys.argv[1:] != ['reconcile']:
+        print("Usage: python usage.py reconcile")
+        raise SystemExit(2)
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        print(f"{reconcile_usage()} user-months reconciled")
@@ -9,6 +9,8 @@ def requires_subscription(plans, is_api_route=False): # Ajout du paramètre is_a
     Parameters:
     - plans: List of allowed subscription plans.
     - is_api_route: Boolean, if True, returns JSON error on failure, else flashes and redirects.
+
+    The plan is resolved once per request by entitlements.get_entitlements (cached in g and in the session).
     """
     def decorator(f):
         @functools.wraps(f)
@@ -20,79 +22,33 @@ def requires_subscription(plans, is_api_route=False): # Ajout du paramètre is_a
                 else:
                     flash('Please log in to access this feature.', 'warning')
                     return redirect(url_for('auth.login'))
-                
-            # Admin access (applies to both)
-            if hasattr(current_user, 'is_admin') and current_user.is_admin:
-                return f(*args, **kwargs)
-            
-            user_sub_obj = getattr(current_user, 'subscription', None) # Renamed to avoid confusion
-            required_plans_str = ", ".join(plans)
-
-            effective_plan = None
-            is_considered_active = False # More descriptive name
 
-            # Priority to Subscription object if it exists and is active
-            if user_sub_obj and user_sub_obj.status == 'active':
-                effective_plan = user_sub_obj.plan
-                is_considered_active = True
-            # Fallback to User.subscription_status if Subscription object is not conclusive
-            elif hasattr(current_user, 'subscription_status') and current_user.subscription_status:
-                effective_plan = current_user.subscription_status
-                # Assume 'free' is always active-like, and any other plan string implies it should be active
-                # This is a simplification. A robust check for paid plans from User.subscription_status
-                # would ideally involve checking current_user.subscription_ends_at > datetime.utcnow()
-                if effective_plan == 'free' or (user_sub_obj is None and effective_plan not in ['free', None]):
-                    is_considered_active = True
-                elif user_sub_obj and user_sub_obj.status != 'active' and effective_plan not in ['free', None]:
-                    # If sub_obj exists but not active, but subscription_status is a paid plan,
-                    # we might still consider it active based on subscription_status for this fallback.
-                    # This depends on how strictly 'active' status from sub_obj should be enforced.
-                    # For now, let's assume subscription_status takes precedence if sub_obj isn't 'active'.
-                    is_considered_active = True
-
-
-            if is_considered_active:
-                if effective_plan in plans:
-                    return f(*args, **kwargs)  # Access granted
-                else:
-                    # Considered active, but not the right plan
-                    message = f'This feature requires a "{required_plans_str}" subscription. Your current plan is "{effective_plan}".'
-                    if is_api_route:
-                        return jsonify({'error': 'Subscription plan insufficient', 'message': message}), 403
-                    else:
-                        flash(message, 'warning')
-                        return redirect(url_for('main.pricing'))
-            
-            # Handle 'free' plan access specifically if not covered by the general logic above
-            # This is important if 'free' is in plans and effective_plan ended up as None or not 'free'
-            # but the user should be considered 'free' by default.
-            if 'free' in plans:
-                # A user is 'free' if no specific plan is found or explicitly set to 'free'
-                is_default_free = not effective_plan or effective_plan == 'free'
-                if hasattr(current_user, 'subscription_status') and current_user.subscription_status == 'free':
-                    is_default_free = True # Explicitly free
+            from entitlements import get_entitlements
+            entitlements = get_entitlements()
+            if entitlements.has_plan(plans):
+                return f(*args, **kwargs)  # Access granted (admins always are)
 
-                if is_default_free:
-                     return f(*args, **kwargs)
-
-            # CASE 3: Access denied
-            denial_message = ""
-            if effective_plan: 
-                denial_message = f'Access denied. This feature requires a "{required_plans_str}" subscription. Your current plan is "{effective_plan}". The plan may not be active or sufficient.'
-            elif user_sub_obj: # Has a subscription object, but it wasn't deemed active or plan was None
-                 denial_message = f'Access denied. This feature requires a "{required_plans_str}" subscription. Your subscription (Plan: {user_sub_obj.plan}, Status: {user_sub_obj.status}) is not sufficient or not active.'
-            else: # No plan information found at all
-                denial_message = f'Access denied. This feature requires a "{required_plans_str}" subscription. No active or known subscription found.'
-            
+            message = entitlements.denial_message(plans)
             if is_api_route:
-                return jsonify({'error': 'Subscription required or insufficient', 'message': denial_message}), 403
+                error = 'Subscription plan insufficient' if entitlements.active else 'Subscription required or insufficient'
+                return jsonify({'error': error, 'message': message}), 403
             else:
-                flash(denial_message, 'warning')
+                flash(message, 'warning')
                 return redirect(url_for('main.pricing'))
                 
         return wrapped
     return decorator
 
+def release_db_connection():
+    """
+    End the current read transaction before a slow outbound call (DeepSeek, webhook...).
+
+    The session gives its pooled connection back until the next query, instead of holding it for
+    the whole call; loaded objects stay usable (they are reloaded on next access).
+    """
+    from app import db
+    db.session.commit()
+
 def calculate_seo_health(score):
     """
     Calculate SEO health status based on score